@@ -1,16 +1,17 @@
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_marshmallow import Marshmallow
 from flask_cors import CORS
-from flask_migrate import Migrate
 from config import Config
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager, get_jwt_identity, verify_jwt_in_request 
-from flasgger import Swagger
 from flask_compress import Compress
 from sqlalchemy import event 
+from app.utils import tracing
+from app.utils.db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 # --- BLOQUE DE AUDITORÍA CENTRALIZADA ---
 @event.listens_for(db.session, "after_begin")
@@ -20,16 +21,16 @@ def set_audit_user_context(session, transaction, connection):
     comienza una transacción de SQLAlchemy.
     """
     try:
-  
-        verify_jwt_in_request(optional=True)
-        user_id = get_jwt_identity()
-
-        if user_id:
-           
-            connection.execute(
-                db.text("SET LOCAL app.current_user_id = :uid"), 
-                {"uid": str(user_id)}
-            )
+        with tracing.span("db.audit_context"):
+            verify_jwt_in_request(optional=True)
+            user_id = get_jwt_identity()
+
+            if user_id:
+
+                connection.execute(
+                    db.text("SET LOCAL app.current_user_id = :uid"), 
+                    {"uid": str(user_id)}
+                )
     except Exception:
       
         pass
@@ -60,8 +61,6 @@ template = {
     ]
 }
 
-swagger = Swagger(template=template)
-
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
@@ -70,43 +69,51 @@ def create_app():
     ma.init_app(app)
     bcrypt.init_app(app)
     jwt.init_app(app)
-    swagger.init_app(app)
+    if app.config['SWAGGER_UI']:
+        from flasgger import Swagger
+        Swagger(template=template).init_app(app)
     compress.init_app(app)
 
-    CORS(app)  # luego puedes restringir
-
-    Migrate(app, db)
-
-    from app.routes.user_routes import user_bp
-    from app.routes.role_routes import role_bp
-    from app.routes.course_routes import course_bp
-    from app.routes.course_instance_routes import course_instance_bp
-    from app.routes.enrollment_routes import enrollment_bp
-    from app.routes.domain_routes import domain_bp
-    from app.routes.subtopic_routes import subtopic_bp
-    from app.routes.learning_resource_routes import learning_resource_bp
-    from app.routes.exercise_routes import exercise_bp
-    from app.routes.assessment_routes import assessment_bp
-    from app.routes.assessment_exercise_routes import assessment_exercise_bp
-    from app.routes.diagnostic_session_routes import diagnostic_bp
-    from app.routes.attempt_routes import attempt_bp
-    from app.routes.exercise_attempt_routes import attempt_exercise_bp
-    from app.routes.audit_routes import audit_bp
-
-    app.register_blueprint(user_bp, url_prefix="/api/users")
-    app.register_blueprint(role_bp, url_prefix="/api/roles")
-    app.register_blueprint(course_bp, url_prefix="/api/courses")
-    app.register_blueprint(course_instance_bp, url_prefix="/api/course_instances")
-    app.register_blueprint(enrollment_bp, url_prefix="/api/enrollments")
-    app.register_blueprint(domain_bp, url_prefix="/api/domains")
-    app.register_blueprint(subtopic_bp, url_prefix="/api/subtopics")
-    app.register_blueprint(learning_resource_bp, url_prefix="/api/learning_resources")
-    app.register_blueprint(exercise_bp, url_prefix="/api/exercises")
-    app.register_blueprint(assessment_bp, url_prefix="/api/assessment")
-    app.register_blueprint(assessment_exercise_bp, url_prefix="/api/assessment_exercise")
-    app.register_blueprint(diagnostic_bp, url_prefix="/api/diagnostic")
-    app.register_blueprint(attempt_bp, url_prefix="/api/attempts")
-    app.register_blueprint(attempt_exercise_bp, url_prefix="/api/exercise-attempts")
-    app.register_blueprint(audit_bp, url_prefix="/api/audits")
+    from app.utils.db_routing import init_db_routing
+    init_db_routing(app)
+
+    from app.utils.request_id import init_request_id
+    init_request_id(app)
+    tracing.init_tracing(app, db.session)
+
+    # El frontend lee X-DB-Primary-Until y la devuelve para leer sus propias escrituras
+    CORS(app, expose_headers=['X-DB-Route', 'X-DB-Primary-Until'])  # luego puedes restringir
+
+    # Flask-Migrate solo hace falta para los comandos `flask db ...`
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    from app.utils.lazy_routes import register_blueprints
+    register_blueprints(app)
+
+    from app.routes.health_routes import health_bp
+    app.register_blueprint(health_bp)
+
+    from app.utils.openapi import init_openapi
+    init_openapi(app)
+
+    from app.commands import register_commands
+    register_commands(app)
+
+    from app.utils.metrics import init_metrics
+    init_metrics(app)
+
+    from app.utils.memory_accounting import init_memory_accounting
+    init_memory_accounting(app)
+
+    from app.utils.query_inspector import init_query_inspector
+    init_query_inspector(app)
+
+    from app.utils.slow_query_log import init_slow_query_log
+    init_slow_query_log(app)
+
+    from app.utils.request_profiler import init_request_profiler
+    init_request_profiler(app)
 
     return app
@@ -0,0 +1,12 @@
+def register_commands(app):
+    from app.commands.analytics_commands import analytics_cli
+    from app.commands.content_commands import content_cli
+    from app.commands.openapi_commands import openapi_cli
+    from app.commands.startup_commands import startup_cli
+    from app.commands.user_commands import users_cli
+
+    app.cli.add_command(analytics_cli)
+    app.cli.add_command(content_cli)
+    app.cli.add_command(openapi_cli)
+    app.cli.add_command(startup_cli)
+    app.cli.add_command(users_cli)
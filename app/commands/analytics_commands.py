@@ -0,0 +1,33 @@
+import click
+from flask.cli import AppGroup
+
+analytics_cli = AppGroup('analytics', help='Exportaciones para analítica fuera de línea.')
+
+
+@analytics_cli.command('export')
+@click.argument('out_dir', type=click.Path(file_okay=False))
+@click.option('--table', 'tables', multiple=True,
+              type=click.Choice(['diagnostic_question_log', 'diagnostic_probability', 'exercise_attempt']),
+              help='Tabla a exportar (repetible; por defecto todas).')
+@click.option('--format', 'fmt', type=click.Choice(['parquet', 'arrow']), default='parquet', show_default=True)
+@click.option('--bind', default=None, help='Bind de SQLAlchemy del que leer (por defecto la primera réplica, si hay).')
+@click.option('--batch-rows', type=int, default=None, help='Filas por RecordBatch (por defecto EXPORT_BATCH_ROWS).')
+@click.option('--lag-seconds', type=int, default=None,
+              help='Margen por detrás del reloj de la base (por defecto EXPORT_WATERMARK_LAG_SECONDS).')
+@click.option('--full', is_flag=True, help='Ignora las marcas de agua y exporta todo de nuevo.')
+def export(out_dir, tables, fmt, bind, batch_rows, lag_seconds, full):
+    """Exporta los logs del diagnóstico y los intentos a Parquet/Arrow particionado por día."""
+    # Importación diferida: los modelos (y pyarrow) no se cargan en el arranque de la app
+    from app.services import columnar_export
+
+    try:
+        summary = columnar_export.export(
+            out_dir, tables=tables or columnar_export.TABLES, fmt=fmt, bind=bind, full=full,
+            batch_rows=batch_rows, lag_seconds=lag_seconds
+        )
+    except columnar_export.ExportError as e:
+        raise click.ClickException(str(e))
+
+    for table, result in summary.items():
+        since = result['since'].isoformat() if result['since'] else 'inicio'
+        click.echo(f"{table}: {result['rows']} filas en {len(result['files'])} ficheros ({since} -> {result['until'].isoformat()})")
@@ -0,0 +1,53 @@
+import json
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from app.utils.openapi import build_spec, spec_path, validate_spec, write_spec
+
+openapi_cli = AppGroup('openapi', help='Genera y valida la especificación OpenAPI estática.')
+
+
+def _build():
+    if current_app.extensions.get('lazy_routes'):
+        raise click.ClickException("Con LAZY_BLUEPRINTS las vistas no están cargadas; usa LAZY_BLUEPRINTS=False")
+    return build_spec(current_app._get_current_object())
+
+
+def _check(spec, strict):
+    errors, warnings = validate_spec(spec)
+    for warning in warnings:
+        click.echo(f"  aviso: {warning}", err=True)
+    for error in errors:
+        click.echo(f"  error: {error}", err=True)
+    if errors or (strict and warnings):
+        raise click.ClickException(
+            f"La especificación tiene {len(errors)} errores y {len(warnings)} avisos"
+        )
+
+
+@openapi_cli.command('build')
+@click.option('--output', default=None, help='Ruta de salida (por defecto OPENAPI_SPEC_PATH).')
+@click.option('--strict', is_flag=True, help='Trata los avisos como errores.')
+def build(output, strict):
+    """Genera el documento a partir de los docstrings, lo valida y lo guarda."""
+    spec = _build()
+    _check(spec, strict)
+
+    path = output or spec_path(current_app)
+    etag = write_spec(spec, path)
+    click.echo(f"{len(spec['paths'])} rutas escritas en {path} (ETag {etag})")
+
+
+@openapi_cli.command('validate')
+@click.argument('path', required=False)
+@click.option('--strict', is_flag=True, help='Trata los avisos como errores.')
+def validate(path, strict):
+    """Valida un documento ya generado (o el que produciría el código actual)."""
+    if path:
+        with open(path, encoding='utf-8') as fh:
+            spec = json.load(fh)
+    else:
+        spec = _build()
+
+    _check(spec, strict)
+    click.echo("Especificación válida")
@@ -0,0 +1,105 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from app.utils.lazy_routes import build_manifest, manifest_path
+
+startup_cli = AppGroup('startup', help='Diagnóstico y preparación del arranque de los workers.')
+
+# Se ejecuta en un proceso nuevo para medir un arranque en frío real
+_BOOT_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app()
+done = time.perf_counter()
+print(json.dumps({"import_s": imported - start, "create_app_s": done - imported}))
+"""
+
+
+def _parse_importtime(stderr):
+    """Líneas 'import time: self | cumulative | name' -> [(módulo, self_us, cumulative_us)]."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+@startup_cli.command('imports', with_appcontext=False)
+@click.option('--top', default=20, show_default=True, help='Módulos a mostrar.')
+@click.option('--lazy/--eager', default=None, help='Fuerza LAZY_BLUEPRINTS en la medición.')
+def imports(top, lazy):
+    """Mide el coste de importación por módulo de un arranque en frío."""
+    env = dict(os.environ)
+    if lazy is not None:
+        env['LAZY_BLUEPRINTS'] = 'True' if lazy else 'False'
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _BOOT_SCRIPT],
+        capture_output=True, text=True, env=env
+    )
+    if result.returncode != 0:
+        raise click.ClickException(result.stderr.strip().splitlines()[-1])
+
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    modules = _parse_importtime(result.stderr)
+
+    packages = defaultdict(int)
+    for name, self_us, _ in modules:
+        packages[name.split('.')[0]] += self_us
+
+    click.echo(f"Importar app: {timings['import_s'] * 1000:.0f} ms   "
+               f"create_app(): {timings['create_app_s'] * 1000:.0f} ms   "
+               f"módulos importados: {len(modules)}")
+
+    click.echo("\nPaquetes por tiempo propio acumulado:")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        click.echo(f"  {self_us / 1000:8.1f} ms  {package}")
+
+    click.echo("\nMódulos por tiempo acumulado (incluye sus importaciones):")
+    for name, _, cumulative_us in sorted(modules, key=lambda item: -item[2])[:top]:
+        click.echo(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+@startup_cli.command('manifest')
+def manifest():
+    """Genera el manifiesto de rutas que usa LAZY_BLUEPRINTS."""
+    data = build_manifest()
+    path = manifest_path(current_app)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(data, fh, indent=1, ensure_ascii=False)
+    click.echo(f"{len(data['rules'])} reglas escritas en {path}")
+
+
+@startup_cli.command('schema')
+@click.option('--apply', 'apply_', is_flag=True, help='Aplica las migraciones pendientes de sql/migrations/.')
+def schema(apply_):
+    """Comprueba (o aplica) las tablas y restricciones que el código necesita."""
+    from app import db
+    from app.utils import schema_check
+
+    with db.engine.connect() as connection:
+        missing = schema_check.pending(connection)
+    if not missing:
+        click.echo("Esquema al día")
+        return
+
+    for name in missing:
+        click.echo(f"  pendiente: {name}")
+    if not apply_:
+        raise click.ClickException(f"{len(missing)} migraciones pendientes (flask startup schema --apply)")
+
+    # Todas en una transacción: o quedan todas o ninguna
+    with db.engine.begin() as connection:
+        for name in missing:
+            connection.exec_driver_sql(schema_check.migration_sql(name))
+    click.echo(f"{len(missing)} migraciones aplicadas")
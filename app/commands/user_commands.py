@@ -0,0 +1,44 @@
+import codecs
+import csv
+import click
+from flask.cli import AppGroup
+from app import db
+
+users_cli = AppGroup('users', help='Gestión masiva de cuentas de usuario.')
+
+
+@users_cli.command('import')
+@click.argument('source', type=click.File('rb'))
+@click.option('--credentials', type=click.File('w'), default=None,
+              help='CSV donde se escriben las contraseñas generadas (por defecto, la salida estándar).')
+@click.option('--batch-size', type=int, default=None, help='Filas por COPY (por defecto USER_IMPORT_BATCH_SIZE).')
+@click.option('--threads', is_flag=True, help='Hash con hilos en lugar de procesos.')
+@click.option('--dry-run', is_flag=True, help='Valida e inserta, pero deshace la transacción.')
+def import_users(source, credentials, batch_size, threads, dry_run):
+    """Da de alta los usuarios de un CSV (hash bcrypt en paralelo y COPY por lotes)."""
+    # Importación diferida: los modelos no se cargan en el arranque de la app
+    from app.services import user_import
+
+    try:
+        summary = user_import.import_users(
+            codecs.iterdecode(source, 'utf-8-sig'), processes=not threads, batch_size=batch_size
+        )
+    except user_import.UserImportError as e:
+        db.session.rollback()
+        raise click.ClickException(str(e))
+
+    for error in summary['errors']:
+        click.echo(f"  línea {error['line']} ({error['usr_email']}): {error['error']}", err=True)
+
+    result = f"{summary['inserted']} usuarios, {summary['duplicates']} duplicados, {summary['invalid']} inválidos"
+    if dry_run:
+        db.session.rollback()
+        click.echo(f"{result}; no se ha guardado nada")
+        return
+
+    db.session.commit()
+    click.echo(f"Importados {result}")
+    if summary['credentials']:
+        writer = csv.DictWriter(credentials or click.get_text_stream('stdout'), fieldnames=['usr_email', 'usr_password'])
+        writer.writeheader()
+        writer.writerows(summary['credentials'])
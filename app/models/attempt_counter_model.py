@@ -0,0 +1,14 @@
+from app import db
+
+class AttemptCounter(db.Model):
+    """Último número de intento asignado por (tipo, matrícula, ejercicio/evaluación)."""
+    __tablename__ = 'attempt_counter'
+
+    kind = db.Column(db.String(20), primary_key=True)  # 'exercise' o 'assessment'
+    enr_id = db.Column(
+        db.Integer,
+        db.ForeignKey('enrollment.enr_id', ondelete='CASCADE'),
+        primary_key=True
+    )
+    item_id = db.Column(db.Integer, primary_key=True)
+    last_no = db.Column(db.Integer, nullable=False, default=0)
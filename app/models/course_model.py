@@ -18,6 +18,8 @@ class Course(db.Model):
 
     cou_thumbnail = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, server_default=db.func.now())
+    # La suben los triggers de sql/migrations/004 al cambiar el contenido (grafo cacheado)
+    cou_content_version = db.Column(db.Integer, nullable=False, server_default='0')
 
     def __repr__(self):
         return f"<Course {self.cou_course_name}>"
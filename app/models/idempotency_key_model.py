@@ -0,0 +1,19 @@
+from app import db
+from sqlalchemy.dialects.postgresql import JSONB
+
+class IdempotencyKey(db.Model):
+    """Primera respuesta de cada Idempotency-Key, compartida entre workers."""
+    __tablename__ = 'idempotency_key'
+
+    endpoint = db.Column(db.String(100), primary_key=True)
+    scope = db.Column(db.String(200), primary_key=True)  # usuario del JWT o matrículas del cuerpo
+    key = db.Column(db.String(128), primary_key=True)
+    body_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer)  # NULL mientras la primera petición sigue en curso
+    headers = db.Column(JSONB)
+    body = db.Column(db.LargeBinary)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+    __table_args__ = (
+        db.Index('ix_idempotency_key_created_at', 'created_at'),
+    )
@@ -10,4 +10,9 @@ class StudentDomainProgress(db.Model):
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relación para obtener el nombre del dominio fácilmente
-    domain = db.relationship('Domain', backref='domain_progress_entries')
\ No newline at end of file
+    domain = db.relationship('Domain', backref='domain_progress_entries')
+
+    # Un progreso por dominio y matrícula (necesario para el upsert de finish_diagnostic)
+    __table_args__ = (
+        db.UniqueConstraint('enr_id', 'dom_id', name='uq_sdp_enrollment_domain'),
+    )
\ No newline at end of file
@@ -12,3 +12,8 @@ class StudentKnowledgeState(db.Model):
     # Relación para obtener el nombre del subtema fácilmente
     subtopic = db.relationship('Subtopic', backref='knowledge_states')
 
+    # Un estado por subtema y matrícula (necesario para el upsert de finish_diagnostic)
+    __table_args__ = (
+        db.UniqueConstraint('enr_id', 'sub_id', name='uq_sks_enrollment_subtopic'),
+    )
+
@@ -14,6 +14,10 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     updated_at = db.Column(db.DateTime, server_default=db.func.now())
 
+    __table_args__ = (
+        db.Index('uq_users_email_lower', db.func.lower(usr_email), unique=True),
+    )
+
 
 
     def __repr__(self):
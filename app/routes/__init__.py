@@ -0,0 +1,19 @@
+# (módulo, blueprint, prefijo). Se importan al crear la app o, con
+# LAZY_BLUEPRINTS, en la primera petición que llega a cada módulo.
+BLUEPRINTS = (
+    ("app.routes.user_routes", "user_bp", "/api/users"),
+    ("app.routes.role_routes", "role_bp", "/api/roles"),
+    ("app.routes.course_routes", "course_bp", "/api/courses"),
+    ("app.routes.course_instance_routes", "course_instance_bp", "/api/course_instances"),
+    ("app.routes.enrollment_routes", "enrollment_bp", "/api/enrollments"),
+    ("app.routes.domain_routes", "domain_bp", "/api/domains"),
+    ("app.routes.subtopic_routes", "subtopic_bp", "/api/subtopics"),
+    ("app.routes.learning_resource_routes", "learning_resource_bp", "/api/learning_resources"),
+    ("app.routes.exercise_routes", "exercise_bp", "/api/exercises"),
+    ("app.routes.assessment_routes", "assessment_bp", "/api/assessment"),
+    ("app.routes.assessment_exercise_routes", "assessment_exercise_bp", "/api/assessment_exercise"),
+    ("app.routes.diagnostic_session_routes", "diagnostic_bp", "/api/diagnostic"),
+    ("app.routes.attempt_routes", "attempt_bp", "/api/attempts"),
+    ("app.routes.exercise_attempt_routes", "attempt_exercise_bp", "/api/exercise-attempts"),
+    ("app.routes.audit_routes", "audit_bp", "/api/audits"),
+)
@@ -12,6 +12,7 @@ from app.schemas.assessment_exercise_schema import (
 )
 from flask_jwt_extended import jwt_required
 from sqlalchemy.exc import IntegrityError
+from app.services import catalog_cache
 
 assessment_exercise_bp = Blueprint('assessment_exercise_bp', __name__)
 
@@ -92,6 +93,7 @@ def add_exercise_to_assessment():
         )
         db.session.add(new_relation)
         db.session.commit()
+        catalog_cache.invalidate_assessment(new_relation.asm_id)
         return assessment_exercise_schema.jsonify(new_relation), 201
     
     except IntegrityError:
@@ -125,8 +127,10 @@ def remove_exercise(ase_id):
         description: No se encontró la relación
     """
     relation = AssessmentExercise.query.get_or_404(ase_id)
+    asm_id = relation.asm_id
     db.session.delete(relation)
     db.session.commit()
+    catalog_cache.invalidate_assessment(asm_id)
     return jsonify({'message': 'Ejercicio quitado de la evaluación correctamente'}), 200
 
 @assessment_exercise_bp.route('/instance/<int:coi_id>/diagnostic', methods=['GET'])
@@ -211,6 +215,7 @@ def remove_exercise_from_assessment(asm_id, ex_id):
         if rel:
             db.session.delete(rel)
             db.session.commit()
+            catalog_cache.invalidate_assessment(asm_id)
             return jsonify({"message": "Relación eliminada"}), 200
             
         return jsonify({"error": "No encontrado"}), 404
@@ -2,7 +2,7 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.models.assessment_attempt_model import AssessmentAttempt
 from app.schemas.assessment_attempt_schema import assessment_attempt_schema, assessment_attempts_schema
-from sqlalchemy import func
+from app.services import attempt_numbering
 from datetime import datetime
 
 attempt_bp = Blueprint("attempt_bp", __name__, url_prefix="/api/attempts")
@@ -27,17 +27,11 @@ def start_attempt():
     asm_id = data.get('asm_id')
     enr_id = data.get('enr_id')
 
-    # Calcular el número de intento automáticamente
-    last_attempt = db.session.query(func.max(AssessmentAttempt.attempt_no))\
-        .filter_by(asm_id=asm_id, enr_id=enr_id).scalar() or 0
-    
-    new_attempt = AssessmentAttempt(
-        asm_id=asm_id,
-        enr_id=enr_id,
-        attempt_no=last_attempt + 1
-    )
-    
-    db.session.add(new_attempt)
+    # Número de intento reservado en la misma sentencia del INSERT
+    new_attempt = attempt_numbering.insert_attempt(AssessmentAttempt, {
+        'asm_id': asm_id,
+        'enr_id': enr_id,
+    })
     db.session.commit()
     return assessment_attempt_schema.jsonify(new_attempt), 201
 
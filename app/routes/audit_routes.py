@@ -2,11 +2,16 @@ from flask import Blueprint, jsonify, request
 from app.models.audit_model import AuditLog
 from app.schemas.audit_schema import audit_schema, audits_schema
 from flask_jwt_extended import jwt_required
+from sqlalchemy.orm import joinedload
+from app import db
+from app.utils import streaming
+from app.utils.db_routing import replica_read
 
 
 audit_bp = Blueprint('audit_bp', __name__)
 @audit_bp.route('/', methods=['GET'])
 @jwt_required()
+@replica_read
 def get_audit_logs():
     """
     Obtener lista de logs de auditoría
@@ -24,9 +29,18 @@ def get_audit_logs():
         in: query
         type: string
         description: Filtrar por acción (INSERT, UPDATE, DELETE)
+      - name: limit
+        in: query
+        type: integer
+        description: Máximo de logs en modo NDJSON (por defecto, todos)
+    produces:
+      - application/json
+      - application/x-ndjson
     responses:
       200:
-        description: Lista de logs recuperada exitosamente
+        description: >
+          Los 200 logs más recientes. Con `Accept: application/x-ndjson` se
+          envían en streaming todos los que cumplan el filtro, uno por línea
         schema:
           type: array
           items:
@@ -35,14 +49,22 @@ def get_audit_logs():
     table = request.args.get('table')
     action = request.args.get('action')
     
-    query = AuditLog.query
+    # user_name necesita el usuario: se trae en el mismo SELECT
+    query = AuditLog.query.options(joinedload(AuditLog.user))
 
     if table:
         query = query.filter(AuditLog.table_name == table)
     if action:
         query = query.filter(AuditLog.action == action)
+    query = query.order_by(AuditLog.changed_at.desc())
+
+    if streaming.requested_format() == 'ndjson':
+        limit = request.args.get('limit', type=int)
+        if limit:
+            query = query.limit(limit)
+        return streaming.ndjson_response(db.session, query.statement, audit_schema)
 
-    logs = query.order_by(AuditLog.changed_at.desc()).limit(200).all()
+    logs = query.limit(200).all()
     return jsonify(audits_schema.dump(logs)), 200
 
 @audit_bp.route('/<int:id>', methods=['GET'])
@@ -3,6 +3,9 @@ from app import db
 from app.models.course_instance_model import CourseInstance
 from app.schemas.course_instance_schema import course_instance_schema, course_instances_schema, course_instances_detail_schema
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.services import gradebook
+from app.utils import streaming
+from app.utils.db_routing import replica_read
 
 course_instance_bp = Blueprint('course_instance_bp', __name__)
 
@@ -213,3 +216,62 @@ def delete_course_instance(coi_id):
 
     return jsonify({'message': 'Instancia eliminada correctamente'}), 200
 
+
+
+@course_instance_bp.route('/<int:coi_id>/gradebook', methods=['GET'])
+@jwt_required()
+@replica_read
+def export_gradebook(coi_id):
+    """
+    Exportar el libro de calificaciones de una instancia (CSV o NDJSON, en streaming)
+    ---
+    tags:
+      - Instancias de Cursos
+    security:
+      - Bearer: []
+    produces:
+      - text/csv
+      - application/x-ndjson
+    parameters:
+      - in: path
+        name: coi_id
+        type: integer
+        required: true
+      - in: query
+        name: format
+        type: string
+        enum: [csv, ndjson]
+        required: false
+        description: Formato de salida; si falta se usa la cabecera Accept (CSV por defecto)
+    responses:
+      200:
+        description: >
+          Una fila por alumno con su matrícula, el dominio de cada subtema, el
+          mejor resultado e intentos de cada evaluación y el rendimiento semanal
+      403:
+        description: La instancia no pertenece al docente autenticado
+      404:
+        description: Instancia no encontrada
+      500:
+        description: Error interno
+    """
+    instance = db.session.get(CourseInstance, coi_id)
+    if instance is None:
+        return jsonify({'error': 'Instancia no encontrada'}), 404
+    if str(instance.coi_created_by) != str(get_jwt_identity()):
+        return jsonify({'error': 'Solo el docente de la instancia puede exportar sus calificaciones'}), 403
+
+    fmt = streaming.requested_format(default='csv')
+    try:
+        subtopics, assessments = gradebook.course_items(instance.cou_id)
+        rows = streaming.stream_results(db.session, gradebook.ROWS, {'coi_id': coi_id})
+        if fmt == 'csv':
+            lines = streaming.csv_lines(
+                gradebook.csv_records(rows, subtopics, assessments), gradebook.csv_columns(subtopics, assessments)
+            )
+        else:
+            lines = streaming.ndjson_lines(gradebook.ndjson_records(rows, subtopics, assessments))
+        return streaming.stream_response(lines, fmt, filename=f"gradebook-{instance.coi_ins_code}")
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
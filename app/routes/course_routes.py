@@ -1,8 +1,12 @@
+import codecs
+from datetime import date
 from flask import Blueprint, request, jsonify
 from app import db
 from app.models.course_model import Course
 from app.schemas.course_schema import course_schema, courses_schema
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.schemas.course_instance_schema import course_instance_schema
+from app.services import course_clone, course_import
 
 
 course_bp = Blueprint('course_bp', __name__)
@@ -212,3 +216,163 @@ def delete_course(course_id):
     except Exception as e:
         return jsonify({'error': f'Error al eliminar curso: {str(e)}'}), 500
 
+
+@course_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_course():
+    """
+    Importar un curso completo (dominios, subtemas, prerrequisitos, ejercicios, recursos y evaluaciones)
+    ---
+    tags:
+      - Cursos
+    security:
+      - Bearer: []
+    consumes:
+      - application/json
+      - application/x-ndjson
+      - text/csv
+    parameters:
+      - in: body
+        name: body
+        required: true
+        description: >
+          JSON anidado {"course", "domains", "assessments"} o registros planos
+          (NDJSON/CSV) con las columnas record, key, parent y las del modelo.
+          Con course.cou_id se importa en un curso existente (solo su autor).
+        schema:
+          type: object
+    responses:
+      201:
+        description: Curso importado; incluye el mapa de claves del paquete a IDs generados
+      400:
+        description: Paquete inválido (lista de errores en 'details')
+      403:
+        description: El curso indicado en course.cou_id no pertenece al usuario
+      500:
+        description: Error interno
+    """
+    fmt = course_import.format_for(request.mimetype)
+    try:
+        # NDJSON y CSV se leen del cuerpo línea a línea, sin cargarlo entero
+        records = course_import.read_bundle(codecs.iterdecode(request.stream, 'utf-8-sig'), fmt)
+        course, counts, ids = course_import.import_course(records, created_by=get_jwt_identity())
+        cou_id = course.cou_id
+        db.session.commit()
+
+        return jsonify({
+            'cou_id': cou_id,
+            'created': counts,
+            'ids': ids
+        }), 201
+
+    except course_import.CourseImportForbidden as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 403
+    except course_import.CourseImportError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'details': e.errors}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@course_bp.route('/<int:course_id>/clone', methods=['POST'])
+@jwt_required()
+def clone_course(course_id):
+    """
+    Clonar un curso con todo su contenido (para un nuevo periodo)
+    ---
+    tags:
+      - Cursos
+    security:
+      - Bearer: []
+    parameters:
+      - name: course_id
+        in: path
+        type: integer
+        required: true
+      - in: body
+        name: body
+        required: false
+        schema:
+          type: object
+          properties:
+            cou_course_name:
+              type: string
+              maxLength: 100
+              description: Nombre del curso nuevo (por defecto "<nombre> (copia)")
+            instance:
+              type: object
+              description: Si se envía, crea también una instancia del curso nuevo
+              required:
+                - coi_name
+                - coi_ins_code
+              properties:
+                coi_name:
+                  type: string
+                  maxLength: 100
+                coi_ins_code:
+                  type: string
+                  maxLength: 10
+                coi_start_date:
+                  type: string
+                  format: date
+                coi_end_date:
+                  type: string
+                  format: date
+    responses:
+      201:
+        description: Curso clonado; incluye las filas copiadas por tabla
+      400:
+        description: Nombre o datos de la instancia inválidos (vacíos, demasiado largos o fechas que no son AAAA-MM-DD)
+      403:
+        description: Solo el autor del curso puede clonarlo
+      404:
+        description: Curso no encontrado
+      500:
+        description: Error interno
+    """
+    data = request.get_json(silent=True) or {}
+    name = data.get('cou_course_name')
+    if name is not None:
+        if not isinstance(name, str) or not name.strip():
+            return jsonify({'error': 'cou_course_name debe ser un texto no vacío'}), 400
+        if len(name) > 100:
+            return jsonify({'error': 'cou_course_name admite como máximo 100 caracteres'}), 400
+
+    instance = data.get('instance')
+    if instance is not None:
+        if not isinstance(instance, dict) or not instance.get('coi_name') or not instance.get('coi_ins_code'):
+            return jsonify({'error': 'instance requiere coi_name y coi_ins_code'}), 400
+        for field, max_length in (('coi_name', 100), ('coi_ins_code', 10)):
+            if not isinstance(instance[field], str) or len(instance[field]) > max_length:
+                return jsonify({'error': f'{field} debe ser un texto de como máximo {max_length} caracteres'}), 400
+        for field in ('coi_start_date', 'coi_end_date'):
+            if instance.get(field) is None:
+                continue
+            try:
+                date.fromisoformat(instance[field])
+            except (TypeError, ValueError):
+                return jsonify({'error': f'{field} debe ser una fecha AAAA-MM-DD'}), 400
+
+    try:
+        course, new_instance, counts = course_clone.clone_course(
+            course_id, created_by=get_jwt_identity(), name=name, instance=instance
+        )
+        result = {
+            'course': course_schema.dump(course),
+            'instance': course_instance_schema.dump(new_instance) if new_instance else None,
+            'copied': counts
+        }
+        db.session.commit()
+        return jsonify(result), 201
+
+    except course_clone.CourseCloneForbidden as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 403
+    except course_clone.CourseCloneError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
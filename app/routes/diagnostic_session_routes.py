@@ -20,6 +20,17 @@ from app.models.exercise_model import Exercise
 from app.schemas.exercise_schema import exercise_schema
 from app.models.diagnostic_session_model import DiagnosticSession
 from app.models.diagnostic_question_log_model import DiagnosticQuestionLog 
+from app.utils.request_loader import get_loader
+from app.utils.query_inspector import query_budget
+from app.utils.tracing import traced
+from app.utils.db_routing import replica_read
+from app.utils.idempotency import idempotent
+from app.services import attempt_numbering, diagnostic_prefetch
+from app.services.diagnostic_engine import bkt_update
+from app.services import diagnostic_state
+from app.services.diagnostic_state import InvalidDiagnosticState, StaleDiagnosticState
+from app.services import knowledge_graph, learning_path
+from flask import current_app
 from datetime import datetime
 import random
 
@@ -56,6 +67,10 @@ def start_diagnostic():
             max_questions:
               type: integer
               default: 30
+            stateless:
+              type: boolean
+              default: false
+              description: El estado viaja en un token firmado (requiere DIAGNOSTIC_STATELESS)
     responses:
       201:
         description: Sesión e Intento creados exitosamente
@@ -72,6 +87,7 @@ def start_diagnostic():
     asm_id = data.get('asm_id')
     coi_id = data.get('course_instance_id')
     max_q = data.get('max_questions', 30)
+    stateless = bool(data.get('stateless')) and current_app.config.get('DIAGNOSTIC_STATELESS', False)
 
     if not asm_id or not coi_id:
         return jsonify({"error": "asm_id y course_instance_id son requeridos"}), 400
@@ -98,17 +114,11 @@ def start_diagnostic():
             }), 200
 
         # 3. Registrar el Intento Administrativo (AssessmentAttempt)
-        last_attempt_no = db.session.query(func.max(AssessmentAttempt.attempt_no))\
-            .filter_by(asm_id=asm_id, enr_id=enrollment.enr_id).scalar() or 0
-        
-        new_attempt = AssessmentAttempt(
-            asm_id=asm_id,
-            enr_id=enrollment.enr_id,
-            attempt_no=last_attempt_no + 1,
-            started_at=func.now()
-        )
-        db.session.add(new_attempt)
-        db.session.flush() # Para generar asma_id
+        new_attempt = attempt_numbering.insert_attempt(AssessmentAttempt, {
+            'asm_id': asm_id,
+            'enr_id': enrollment.enr_id,
+            'started_at': func.now(),
+        })
 
         # 4. Crear la Sesión KST
         new_session = DiagnosticSession(
@@ -130,6 +140,20 @@ def start_diagnostic():
         if not subtopics:
             return jsonify({"error": "Este curso no tiene contenidos configurados para evaluar"}), 400
 
+        if stateless:
+            # Las probabilidades se materializan al finalizar, no ahora
+            db.session.commit()
+            state = diagnostic_state.initial_state(
+                new_session, user_id, instance.cou_id, [sub.sub_id for sub in subtopics]
+            )
+            return jsonify({
+                "session_id": str(new_session.session_id),
+                "asma_id": new_attempt.asma_id,
+                "enr_id": enrollment.enr_id,
+                "state_token": diagnostic_state.encode_state(state),
+                "message": "Sesión e intento iniciados"
+            }), 201
+
         for sub in subtopics:
             prob = DiagnosticProbability(
                 session_id=new_session.session_id,
@@ -200,18 +224,20 @@ def get_session_probabilities(session_id):
 
 @diagnostic_bp.route('/session/<uuid:session_id>/next-question', methods=['GET'])
 @jwt_required()
-
-
+@traced("diagnostic.next_question")
 def _get_next_logic(session_id):
-    # 1. Obtener datos de la sesión
-    session_data = DiagnosticSession.query.get(session_id)
+    loader = get_loader()
+
+    # 1. Obtener datos de la sesión (reutiliza la instancia si el handler ya la cargó)
+    session_data = loader.get(DiagnosticSession, session_id)
     if not session_data or session_data.current_question_count >= session_data.max_questions:
         return {"message": "finalizado"}, 200
 
     # 2. Verificar si hay una pregunta ya enviada pero no respondida (evita saltar preguntas al recargar)
     pending_log = DiagnosticQuestionLog.query.filter_by(session_id=session_id, status='asked').first()
     if pending_log:
-        exercise = Exercise.query.get(pending_log.exercise_id)
+        exercise = loader.get(Exercise, pending_log.exercise_id)
+        diagnostic_prefetch.schedule(session_id, exercise.ex_id, pending_log.sub_id)
         return {
             "session_id": str(session_id),
             "exercise": exercise_schema.dump(exercise),
@@ -289,15 +315,54 @@ def _get_next_logic(session_id):
         status='asked'
     )
     db.session.add(new_log)
-    db.session.commit()
+    loader.prime(exercise)
+    loader.commit(keep=(DiagnosticSession, Exercise))
+    diagnostic_prefetch.schedule(session_id, exercise.ex_id, exercise.sub_id)
+
+    return {
+        "session_id": str(session_id),
+        "exercise": exercise_schema.dump(exercise),
+        "current_count": session_data.current_question_count
+    }, 200
+
+
+def _serve_prefetched(session_data, asked_ex_id, is_correct):
+    """
+    Entrega la siguiente pregunta precalculada para el resultado obtenido.
+    Devuelve None si no hay rama en caché y se debe usar _get_next_logic.
+    """
+    session_id = session_data.session_id
+    next_ex_id = diagnostic_prefetch.take(session_id, asked_ex_id, is_correct)
+    if next_ex_id is diagnostic_prefetch.MISS:
+        return None
+
+    if next_ex_id is None or session_data.current_question_count >= session_data.max_questions:
+        return {"message": "finalizado"}, 200
+
+    loader = get_loader()
+    exercise = loader.get(Exercise, next_ex_id)
+    if not exercise:
+        return None
+
+    db.session.add(DiagnosticQuestionLog(
+        session_id=session_id,
+        sub_id=exercise.sub_id,
+        exercise_id=exercise.ex_id,
+        status='asked'
+    ))
+    loader.commit(keep=(DiagnosticSession, Exercise))
+    diagnostic_prefetch.schedule(session_id, exercise.ex_id, exercise.sub_id)
 
     return {
         "session_id": str(session_id),
         "exercise": exercise_schema.dump(exercise),
         "current_count": session_data.current_question_count
     }, 200
+
 @diagnostic_bp.route('/session/<uuid:session_id>/submit-answer', methods=['POST'])
 @jwt_required()
+@idempotent
+@query_budget(16)
 def submit_answer(session_id):
     data = request.get_json()
     ex_id = data.get('exercise_id')
@@ -305,8 +370,9 @@ def submit_answer(session_id):
     dont_know = data.get('dont_know', False)
 
     try:
+        loader = get_loader()
         log = DiagnosticQuestionLog.query.filter_by(session_id=session_id, exercise_id=ex_id, status='asked').first_or_404()
-        exercise = Exercise.query.get(ex_id)
+        exercise = loader.get(Exercise, ex_id)
         
         is_correct = False
         if not dont_know:
@@ -317,16 +383,8 @@ def submit_answer(session_id):
         log.status = 'answered'
         log.answered_at = datetime.utcnow()
 
-        prob_record = DiagnosticProbability.query.filter_by(session_id=session_id, sub_id=log.sub_id).first()
-        p_old = float(prob_record.p_mastery)
-        slip, guess = 0.1, 0.2
-
-        if is_correct:
-            p_new = (p_old * (1 - slip)) / ((p_old * (1 - slip)) + ((1 - p_old) * guess))
-        else:
-            p_new = (p_old * slip) / ((p_old * slip) + ((1 - p_old) * (1 - guess)))
-
-        prob_record.p_mastery = min(max(p_new, 0.01), 0.99)
+        prob_record = loader.get(DiagnosticProbability, (session_id, log.sub_id))
+        prob_record.p_mastery = bkt_update(prob_record.p_mastery, is_correct)
 
         if is_correct:
             db.session.execute(text("""
@@ -339,11 +397,16 @@ def submit_answer(session_id):
                 WHERE session_id = :sid AND sub_id IN (SELECT sub_id FROM subtopic_dependency WHERE prerequisite_id = :sub_id)
             """), {"sid": session_id, "sub_id": log.sub_id})
 
-        session_data = DiagnosticSession.query.get(session_id)
+        session_data = loader.get(DiagnosticSession, session_id)
         session_data.current_question_count = (session_data.current_question_count or 0) + 1
-        db.session.commit()
-
-        next_data, status_code = _get_next_logic(session_id)
+        # La sesión y el ejercicio siguen siendo válidos tras el commit:
+        # _get_next_logic los reutiliza sin volver a consultarlos
+        loader.commit(keep=(DiagnosticSession, Exercise))
+
+        # Rama precalculada mientras el estudiante leía la pregunta; si no
+        # está lista, se calcula en línea como siempre
+        next_result = _serve_prefetched(session_data, exercise.ex_id, is_correct)
+        next_data, status_code = next_result or _get_next_logic(session_id)
         
         return jsonify({
             "is_correct": is_correct,
@@ -355,6 +418,180 @@ def submit_answer(session_id):
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+@diagnostic_bp.route('/session/<uuid:session_id>/stateless/next-question', methods=['POST'])
+@jwt_required()
+def get_next_question_stateless(session_id):
+    """
+    Obtener la siguiente pregunta en modo stateless (sin escrituras)
+    ---
+    tags: [Diagnóstico]
+    security: [{Bearer: []}]
+    parameters:
+      - in: path
+        name: session_id
+        type: string
+        format: uuid
+        required: true
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required: [state_token]
+          properties:
+            state_token: {type: string}
+    responses:
+      200:
+        description: Pregunta pendiente y token actualizado, o mensaje "finalizado"
+      400:
+        description: Token inválido
+    """
+    data = request.get_json() or {}
+    try:
+        state = diagnostic_state.decode_state(data.get('state_token'), session_id, get_jwt_identity())
+        ex_id = diagnostic_state.next_question(state)
+        if ex_id is None:
+            return jsonify({"message": "finalizado", "state_token": diagnostic_state.encode_state(state)}), 200
+
+        exercise = get_loader().get(Exercise, ex_id)
+        return jsonify({
+            "session_id": str(session_id),
+            "exercise": exercise_schema.dump(exercise),
+            "current_count": state['n'],
+            "state_token": diagnostic_state.encode_state(state)
+        }), 200
+
+    except InvalidDiagnosticState as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@diagnostic_bp.route('/session/<uuid:session_id>/stateless/submit-answer', methods=['POST'])
+@jwt_required()
+def submit_answer_stateless(session_id):
+    """
+    Responder en modo stateless: solo se agrega la respuesta al log
+    ---
+    tags: [Diagnóstico]
+    security: [{Bearer: []}]
+    parameters:
+      - in: path
+        name: session_id
+        type: string
+        format: uuid
+        required: true
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required: [state_token, exercise_id]
+          properties:
+            state_token: {type: string}
+            exercise_id: {type: integer}
+            user_answer: {type: string}
+            dont_know: {type: boolean}
+    responses:
+      200:
+        description: Resultado, siguiente pregunta y token actualizado
+      400:
+        description: Token inválido o caducado
+      409:
+        description: El ejercicio no es la pregunta pendiente, el token ya se usó o la sesión no está en curso
+    """
+    data = request.get_json() or {}
+    ex_id = data.get('exercise_id')
+    user_ans_raw = data.get('user_answer', "")
+    dont_know = data.get('dont_know', False)
+
+    try:
+        state = diagnostic_state.decode_state(data.get('state_token'), session_id, get_jwt_identity())
+        if not state['q'] or state['q'][0] != ex_id:
+            return jsonify({"error": "El ejercicio no corresponde a la pregunta pendiente"}), 409
+        # Bloquea la sesión hasta el commit: un token ya usado no vuelve a escribir
+        diagnostic_state.lock_current(state, session_id)
+
+        loader = get_loader()
+        exercise = loader.get(Exercise, ex_id)
+
+        is_correct = False
+        if not dont_know:
+            is_correct = (user_ans_raw.strip().lower() == exercise.ex_expected_answer.strip().lower())
+
+        student_answer = "SABE_NO_SABE" if dont_know else user_ans_raw
+        diagnostic_state.record_answer(state, session_id, exercise, student_answer, is_correct)
+        loader.commit(keep=(Exercise,))
+
+        next_question = None
+        next_ex_id = diagnostic_state.next_question(state)
+        if next_ex_id is not None:
+            next_question = {
+                "session_id": str(session_id),
+                "exercise": exercise_schema.dump(loader.get(Exercise, next_ex_id)),
+                "current_count": state['n']
+            }
+
+        return jsonify({
+            "is_correct": is_correct,
+            "next_question": next_question or {"message": "finalizado"},
+            "finished": next_question is None,
+            "state_token": diagnostic_state.encode_state(state)
+        }), 200
+
+    except StaleDiagnosticState as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 409
+    except InvalidDiagnosticState as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+def _upsert_knowledge_state(session_id, enr_id, now):
+    """
+    Inserta o actualiza el SKS de todos los subtemas de la sesión a partir de
+    diagnostic_probability. Devuelve el nivel asignado a cada subtema.
+    """
+    result = db.session.execute(text("""
+        INSERT INTO student_knowledge_state (enr_id, sub_id, mastery_level, last_updated)
+        SELECT :eid, dp.sub_id,
+               CASE WHEN dp.p_mastery >= 0.85 THEN 'dominado'
+                    WHEN dp.p_mastery >= 0.50 THEN 'aprendido'
+                    ELSE 'no_dominado' END,
+               :now
+        FROM diagnostic_probability dp
+        WHERE dp.session_id = :sid
+        ON CONFLICT (enr_id, sub_id) DO UPDATE
+        SET mastery_level = EXCLUDED.mastery_level,
+            last_updated = EXCLUDED.last_updated
+        RETURNING mastery_level
+    """), {"eid": enr_id, "sid": session_id, "now": now})
+    return [row.mastery_level for row in result]
+
+
+def _upsert_domain_progress(enr_id, coi_id, now):
+    """Recalcula el estado de todos los dominios del curso (mismo criterio que complete_subtopic)."""
+    db.session.execute(text("""
+        INSERT INTO student_domain_progress (enr_id, dom_id, progress_status, last_updated)
+        SELECT :eid, d.dom_id,
+               CASE WHEN COUNT(*) FILTER (WHERE sks.mastery_level = 'dominado') >= COUNT(s.sub_id) THEN 'dominado'
+                    WHEN COUNT(*) FILTER (WHERE sks.mastery_level = 'dominado') > 0 THEN 'aprendido'
+                    ELSE 'no_dominado' END,
+               :now
+        FROM course_instance ci
+        JOIN domain d ON d.cou_id = ci.cou_id
+        JOIN subtopic s ON s.dom_id = d.dom_id
+        LEFT JOIN student_knowledge_state sks ON sks.sub_id = s.sub_id AND sks.enr_id = :eid
+        WHERE ci.coi_id = :coi_id
+        GROUP BY d.dom_id
+        ON CONFLICT (enr_id, dom_id) DO UPDATE
+        SET progress_status = EXCLUDED.progress_status,
+            last_updated = EXCLUDED.last_updated
+    """), {"eid": enr_id, "coi_id": coi_id, "now": now})
+
+
 @diagnostic_bp.route('/session/<uuid:session_id>/finish', methods=['POST'])
 @jwt_required()
 def finish_diagnostic(session_id):
@@ -370,6 +607,15 @@ def finish_diagnostic(session_id):
         format: uuid
         required: true
         description: ID de la sesión diagnóstica a cerrar
+      - in: body
+        name: body
+        required: false
+        schema:
+          type: object
+          properties:
+            state_token:
+              type: string
+              description: Token final de una sesión stateless, obligatorio en ese modo (se verifica contra el log)
     responses:
       200:
         description: Evaluación finalizada con éxito. Tablas de progreso y matrícula actualizadas.
@@ -386,14 +632,18 @@ def finish_diagnostic(session_id):
                 learned: {type: integer}
                 remaining: {type: integer}
             enr_progress: {type: number, description: "Nuevo progreso de la matrícula"}
+      400:
+        description: Falta el state_token de una sesión stateless
       404:
         description: No se encontró la sesión o la matrícula
+      409:
+        description: El token stateless no coincide con el registro de respuestas
       500:
         description: Error interno al procesar los datos
     """
     try:
         # 1. Obtener sesión y usuario
-        session_data = DiagnosticSession.query.get_or_404(session_id)
+        session_data = get_loader().get_or_404(DiagnosticSession, session_id)
         user_id = get_jwt_identity()
         
         if session_data.status == 'COMPLETED':
@@ -412,42 +662,36 @@ def finish_diagnostic(session_id):
         session_data.status = 'COMPLETED'
         session_data.ended_at = datetime.utcnow()
 
-        # 4. Obtener todas las probabilidades del motor KST
-        probs = DiagnosticProbability.query.filter_by(session_id=session_id).all()
-        if not probs:
+        # 4 y 5. Volcar las probabilidades del motor KST a SKS en una sola sentencia
+        now = datetime.utcnow()
+        levels = _upsert_knowledge_state(session_id, enrollment.enr_id, now)
+
+        if not levels:
+            # Sesión stateless: se materializan ahora reproduciendo el log
+            state_token = (request.get_json(silent=True) or {}).get('state_token')
+            if not state_token:
+                db.session.rollback()
+                return jsonify({"error": "Las sesiones stateless se finalizan con su state_token"}), 400
+            cou_id = knowledge_graph.get_course_id(session_data.course_instance_id)
+            try:
+                diagnostic_state.materialize(session_data, cou_id, state_token, user_id)
+            except InvalidDiagnosticState as e:
+                db.session.rollback()
+                return jsonify({"error": str(e)}), 409
+            levels = _upsert_knowledge_state(session_id, enrollment.enr_id, now)
+
+        if not levels:
             return jsonify({"error": "No se encontraron datos de progreso"}), 400
 
-        # 5. ACTUALIZACIÓN DE TABLAS PERMANENTES POR SUBTEMA (SKS)
-        count_mastered = 0
-        count_learned = 0
-
-        for p in probs:
-            status = 'no_dominado'
-            if p.p_mastery >= 0.85:
-                status = 'dominado'
-                count_mastered += 1
-            elif p.p_mastery >= 0.50:
-                status = 'aprendido'
-                count_learned += 1
-
-            sks_record = StudentKnowledgeState.query.filter_by(
-                enr_id=enrollment.enr_id, 
-                sub_id=p.sub_id
-            ).first()
-            
-            if sks_record:
-                sks_record.mastery_level = status
-                sks_record.last_updated = datetime.utcnow()
-
-        # 6. Actualizar fecha de progreso en Dominios (SDP)
-        db.session.execute(text("""
-            UPDATE student_domain_progress 
-            SET last_updated = :now 
-            WHERE enr_id = :eid
-        """), {"now": datetime.utcnow(), "eid": enrollment.enr_id})
+        count_mastered = levels.count('dominado')
+        count_learned = levels.count('aprendido')
+
+        # 6. Recalcular el progreso de cada Dominio (SDP) con el SKS recién escrito
+        _upsert_domain_progress(enrollment.enr_id, session_data.course_instance_id, now)
+
+        total_topics = len(levels)
 
         # 7. Sincronizar Puntaje en el registro de intento (AssessmentAttempt)
-        total_topics = len(probs)
         final_score = (count_mastered / total_topics) * 100 if total_topics > 0 else 0
         
         attempt = AssessmentAttempt.query.filter_by(
@@ -622,46 +866,16 @@ def check_course_access(coi_id):
 # En tu archivo de rutas de Flask
 @diagnostic_bp.route('/course/topics-status/<int:coi_id>', methods=['GET'])
 @jwt_required()
+@query_budget(6)
 def get_learning_path(coi_id):
     try:
         user_id = get_jwt_identity()
         enrollment = Enrollment.query.filter_by(usr_id=user_id, coi_id=coi_id).first()
-        
-        query = text("""
-            SELECT 
-                s.sub_id as id,
-                s.sub_name as name,
-                d.dom_name as domain_name,
-                COALESCE(sks.mastery_level, 'no_dominado') as status,
-                -- Obtenemos los nombres de los prerrequisitos no cumplidos en un solo string
-                (SELECT string_agg(p.sub_name, ', ')
-                 FROM subtopic_dependency sd
-                 JOIN subtopic p ON sd.prerequisite_id = p.sub_id
-                 LEFT JOIN student_knowledge_state sks_p 
-                    ON p.sub_id = sks_p.sub_id AND sks_p.enr_id = :enr_id
-                 WHERE sd.sub_id = s.sub_id 
-                   AND (sks_p.mastery_level IS NULL OR sks_p.mastery_level != 'dominado')
-                ) as missing_prerequisites
-            FROM subtopic s
-            JOIN domain d ON s.dom_id = d.dom_id
-            JOIN course_instance ci ON d.cou_id = ci.cou_id
-            LEFT JOIN student_knowledge_state sks ON s.sub_id = sks.sub_id AND sks.enr_id = :enr_id
-            WHERE ci.coi_id = :coi_id
-            ORDER BY d.dom_id, s.sub_id
-        """)
-
-        result = db.session.execute(query, {"enr_id": enrollment.enr_id, "coi_id": coi_id})
-        
-        topics = []
-        for row in result:
-            topics.append({
-                "id": row.id,
-                "name": row.name,
-                "domain_name": row.domain_name,
-                "status": row.status,
-                "is_locked": bool(row.missing_prerequisites),
-                "prerequisites": row.missing_prerequisites # Aquí van los nombres
-            })
+        if not enrollment:
+            return jsonify({"error": "No enrolado"}), 404
+
+        # Grafo del curso cacheado + una consulta de SKS (cacheada hasta que cambie)
+        topics = learning_path.get_topics(enrollment.enr_id, knowledge_graph.get_course_id(coi_id))
 
         return jsonify({"topics": topics}), 200
     except Exception as e:
@@ -669,6 +883,7 @@ def get_learning_path(coi_id):
 
 @diagnostic_bp.route('/progress-report/<int:coi_id>', methods=['GET'])
 @jwt_required()
+@replica_read
 def get_progress_report_by_coi(coi_id):
     try:
         user_id = get_jwt_identity()
@@ -3,6 +3,7 @@ from app import db
 from app.models.domain_model import Domain
 from app.models.student_knowledge_state_model import StudentKnowledgeState
 from app.schemas.domain_schema import domain_schema, domains_schema 
+from app.services import knowledge_graph
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 domain_bp = Blueprint("domain_bp", __name__, url_prefix="/api/domains")
@@ -184,6 +185,7 @@ def update_domain(dom_id):
         domain.cou_id = data.get("cou_id", domain.cou_id)
 
         db.session.commit()
+        knowledge_graph.invalidate_course()
         return domain_schema.jsonify(domain), 200
     except Exception as e:
         db.session.rollback()
@@ -217,8 +219,10 @@ def delete_domain(dom_id):
     try:
         domain = Domain.query.get_or_404(dom_id)
         
+        cou_id = domain.cou_id
         db.session.delete(domain)
         db.session.commit()
+        knowledge_graph.invalidate_course(cou_id)
         
         return jsonify({"message": f"Dominio {dom_id} eliminado correctamente"}), 200
     except Exception as e:
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy.orm import joinedload
 from app import db
@@ -6,6 +6,9 @@ from app.models.enrollment_model import Enrollment
 from app.schemas.enrollment_schema import enrollment_schema, enrollments_schema, enrollment_detail_schema, enrollments_detail_schema, enrollment_basic_schema, enrollments_student_list_schema 
 from app.models.course_instance_model import CourseInstance
 from datetime import datetime
+from app.utils.db_routing import replica_read
+from app.services import roster
+from app.utils import streaming
 
 enrollment_bp = Blueprint('enrollment', __name__)  
 
@@ -19,9 +22,14 @@ def get_all_enrollments():
       - Inscripciones
     security:
       - Bearer: []
+    produces:
+      - application/json
+      - application/x-ndjson
     responses:
       200:
-        description: Lista de todas las inscripciones
+        description: >
+          Lista de todas las inscripciones. Con `Accept: application/x-ndjson`
+          se envía en streaming, una inscripción por línea
         schema:
           type: array
           items:
@@ -36,6 +44,9 @@ def get_all_enrollments():
               example: Error al obtener inscripciones
     """
     try:
+        if streaming.requested_format() == 'ndjson':
+            return streaming.ndjson_response(db.session, db.select(Enrollment), enrollment_schema)
+
         enrollments = Enrollment.query.all()
         return enrollments_schema.jsonify(enrollments), 200
     except Exception as e:
@@ -85,7 +96,7 @@ def create_enrollment():
         return jsonify({'error': 'coi_ins_code es obligatorio'}), 400
 
     try:
-        query = text("SELECT public.enroll_student_by_code(:usr_id, :code)")
+        query = text("SELECT public.enroll_student_by_code(:usr_id, :code)").execution_options(writes=True)
         
         result = db.session.execute(query, {
             "usr_id": user_id,
@@ -99,13 +110,117 @@ def create_enrollment():
 
     except Exception as e:
         db.session.rollback()
-        
-        raw_error = str(e.orig) if hasattr(e, 'orig') else str(e)
-        clean_error = "Error al inscribirse"
-        if "RAISE EXCEPTION" in raw_error or "P0001" in raw_error:
-            clean_error = raw_error.split('\n')[0].replace('P0001:', '').strip()
+        return jsonify({'error': roster.function_error(e)}), 400
+
 
-        return jsonify({'error': clean_error}), 400
+@enrollment_bp.route('/roster', methods=['POST'])
+@jwt_required()
+def enroll_roster():
+    """
+    Matricular una lista de alumnos en una instancia (solo su docente)
+    ---
+    tags:
+      - Inscripciones
+    security:
+      - Bearer: []
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required:
+            - coi_id
+            - students
+          properties:
+            coi_id:
+              type: integer
+              example: 4
+            students:
+              type: array
+              description: IDs de usuario, emails u objetos con los datos para crear la cuenta
+              items: {}
+              example: [12, "ana@example.com", {"usr_email": "luis@example.com", "usr_first_name": "Luis", "usr_last_name": "Pérez"}]
+            create_missing:
+              type: boolean
+              default: false
+              description: >
+                Crea las cuentas de los emails que no existen (contraseña temporal si no se indica).
+                Como máximo ROSTER_MAX_NEW_ACCOUNTS por petición (200 por defecto): cada alta es un
+                hash bcrypt y la petición debe terminar dentro del timeout del worker
+    responses:
+      200:
+        description: Resultado por alumno, en el orden del roster
+        schema:
+          type: object
+          properties:
+            coi_id:
+              type: integer
+            enrolled:
+              type: integer
+            results:
+              type: array
+              items:
+                type: object
+                properties:
+                  index:
+                    type: integer
+                  status:
+                    type: string
+                    enum: [enrolled, created_and_enrolled, already_enrolled, duplicate, not_found, error]
+                  usr_id:
+                    type: integer
+                  enr_id:
+                    type: integer
+                  temporary_password:
+                    type: string
+                  error:
+                    type: string
+      400:
+        description: Cuerpo inválido
+      403:
+        description: La instancia no pertenece al docente autenticado
+      404:
+        description: Instancia no encontrada
+      413:
+        description: Demasiados alumnos o cuentas nuevas en una petición (no se matricula a nadie)
+      500:
+        description: Error interno
+    """
+    data = request.get_json(silent=True) or {}
+    coi_id = data.get('coi_id')
+    students = data.get('students')
+    if not isinstance(coi_id, int) or not isinstance(students, list):
+        return jsonify({'error': 'coi_id (entero) y students (lista) son obligatorios'}), 400
+
+    max_students = current_app.config['ROSTER_MAX_STUDENTS']
+    if len(students) > max_students:
+        return jsonify({'error': f'Máximo {max_students} alumnos por petición'}), 413
+
+    instance = db.session.get(CourseInstance, coi_id)
+    if instance is None:
+        return jsonify({'error': 'Instancia no encontrada'}), 404
+    if str(instance.coi_created_by) != str(get_jwt_identity()):
+        return jsonify({'error': 'Solo el docente de la instancia puede matricular alumnos'}), 403
+
+    try:
+        _, results = roster.enroll_roster(
+            coi_id, students, create_missing=bool(data.get('create_missing')),
+            max_new_accounts=current_app.config['ROSTER_MAX_NEW_ACCOUNTS']
+        )
+        db.session.commit()
+        enrolled = sum(1 for result in results if result['status'] in ('enrolled', 'created_and_enrolled'))
+        return jsonify({'coi_id': coi_id, 'enrolled': enrolled, 'results': results}), 200
+
+    except roster.RosterTooLarge as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 413
+    except roster.RosterError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
 
 
 @enrollment_bp.route('/my', methods=['GET'])
@@ -226,6 +341,7 @@ def withdraw_enrollment(enr_id):
 
 
 @enrollment_bp.route('/api/course-instance/<int:coi_id>/students', methods=['GET'])
+@replica_read
 def get_instance_students(coi_id):
     """
     Obtener lista optimizada de estudiantes por instancia
@@ -374,6 +490,7 @@ def get_enrollment_by_id(enr_id):
     
 @enrollment_bp.route('/<int:enr_id>/performance', methods=['GET'])
 @jwt_required()
+@replica_read
 def get_weekly_performance(enr_id):
     """
     Obtener el histórico de rendimiento semanal para la gráfica
@@ -1,11 +1,14 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from app import db
 from app.models.exercise_attempt_model import ExerciseAttempt
 from app.schemas.exercise_attempt_schema import exercise_attempt_schema
+from app.services import attempt_batch, attempt_numbering
+from app.utils.idempotency import idempotent
 
 attempt_exercise_bp = Blueprint('attempt_exercise_bp', __name__, url_prefix='/api/exercise-attempts')
 
 @attempt_exercise_bp.route('/', methods=['POST'])
+@idempotent
 def save_attempt():
     """
     Registrar un intento de ejercicio
@@ -36,11 +39,20 @@ def save_attempt():
             exa_is_correct:
               type: boolean
               example: true
+      - in: header
+        name: Idempotency-Key
+        type: string
+        required: false
+        description: Los reintentos con la misma clave reciben la primera respuesta sin registrar otro intento
     responses:
       201:
         description: Intento registrado con éxito
       400:
         description: Datos inválidos
+      409:
+        description: El primer envío con esta Idempotency-Key sigue en curso
+      422:
+        description: Idempotency-Key reutilizada con otro cuerpo
       500:
         description: Error interno del servidor
     """
@@ -52,21 +64,94 @@ def save_attempt():
     if not ex_id or not enr_id:
         return jsonify({'error': 'ex_id y enr_id son obligatorios'}), 400
 
-    # Lógica de autoincremento para el número de intento
-    last_attempt_no = db.session.query(db.func.max(ExerciseAttempt.exa_attempt_no))\
-        .filter_by(ex_id=ex_id, enr_id=enr_id).scalar()
-    
-    # Si no hay intentos previos, el escalar devuelve None
-    data['exa_attempt_no'] = (last_attempt_no + 1) if last_attempt_no else 1
-
     try:
-        # Usamos el esquema para cargar/validar o directamente el modelo como en tus ejemplos
-        attempt = ExerciseAttempt(**data)
-        db.session.add(attempt)
+        # El número de intento se reserva en la misma sentencia del INSERT
+        data.pop('exa_attempt_no', None)
+        attempt = attempt_numbering.insert_attempt(ExerciseAttempt, data)
         db.session.commit()
         
         return exercise_attempt_schema.jsonify(attempt), 201
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+
+@attempt_exercise_bp.route('/batch', methods=['POST'])
+@idempotent
+def save_attempts_batch():
+    """
+    Registrar en lote intentos hechos sin conexión
+    ---
+    tags:
+      - Estudiante - Intentos
+    consumes:
+      - application/json
+      - application/x-ndjson
+    parameters:
+      - in: body
+        name: body
+        required: true
+        description: Lista JSON de intentos o un intento por línea (NDJSON). La corrección se hace en el servidor.
+        schema:
+          type: array
+          items:
+            type: object
+            required:
+              - ex_id
+              - enr_id
+              - exa_answer
+            properties:
+              ex_id:
+                type: integer
+                example: 29
+              enr_id:
+                type: integer
+                example: 10
+              exa_answer:
+                type: string
+                example: "2"
+              exa_created_at:
+                type: string
+                format: date-time
+                description: Momento en que se respondió sin conexión
+              client_id:
+                type: string
+                description: Identificador del cliente, se devuelve en el resultado
+      - in: header
+        name: Idempotency-Key
+        type: string
+        required: false
+    responses:
+      200:
+        description: Resultado por intento, en el orden de entrada (status 201, 400 o 404)
+      400:
+        description: Cuerpo ilegible
+      413:
+        description: Demasiados intentos en un lote
+      500:
+        description: Error interno del servidor
+    """
+    try:
+        items = attempt_batch.parse_items(request.get_data(cache=True), request.mimetype)
+    except attempt_batch.BatchError as e:
+        return jsonify({'error': str(e)}), 400
+
+    max_items = current_app.config.get('ATTEMPT_BATCH_MAX_ITEMS', 500)
+    if len(items) > max_items:
+        return jsonify({'error': f'Máximo {max_items} intentos por lote'}), 413
+
+    try:
+        results = attempt_batch.ingest(items)
+        db.session.commit()
+
+        inserted = sum(1 for result in results if result['status'] == 201)
+        return jsonify({
+            'inserted': inserted,
+            'failed': len(results) - inserted,
+            'results': results
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -3,6 +3,7 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.models.exercise_model import Exercise
 from app.schemas.exercise_schema import exercise_schema, exercises_schema
+from app.services import catalog_cache
 
 exercise_bp = Blueprint('exercise_bp', __name__, url_prefix='/api/exercises')
 
@@ -96,6 +97,8 @@ def update_exercise(ex_id):
         setattr(exercise, key, value)
 
     db.session.commit()
+    # El ejercicio puede haber cambiado de subtema, de estado o de respuesta
+    catalog_cache.invalidate_assessment()
     return exercise_schema.jsonify(exercise), 200
 
 @exercise_bp.route('/<int:ex_id>/disable', methods=['PATCH'])
@@ -109,5 +112,6 @@ def disable_exercise(ex_id):
     exercise = Exercise.query.get_or_404(ex_id)
     exercise.ex_is_active = False
     db.session.commit()
+    catalog_cache.invalidate_assessment()
 
     return jsonify({'message': 'Ejercicio desactivado'}), 200
@@ -0,0 +1,46 @@
+from flask import Blueprint, jsonify
+from sqlalchemy import text
+from app import db
+from app.utils import prewarm, schema_check
+
+health_bp = Blueprint('health_bp', __name__)
+
+
+@health_bp.route('/ready', methods=['GET'])
+def ready():
+    """
+    Disponibilidad del worker para el balanceador
+    ---
+    tags:
+      - Observabilidad
+    responses:
+      200:
+        description: Precalentamiento terminado (u omitido), base de datos accesible y esquema al día
+      503:
+        description: El worker todavía no debe recibir tráfico
+    """
+    # Importación diferida: no cargar modelos al registrar esta ruta
+    from app.services import catalog_cache, knowledge_graph
+
+    state = prewarm.get_state()
+    missing = []
+    try:
+        db.session.execute(text("SELECT 1"))
+        database = "ok"
+        # Migraciones de sql/migrations/ sin aplicar: el código fallaría en ON CONFLICT
+        missing = schema_check.pending(db.session.connection())
+    except Exception as e:
+        database = str(e)
+
+    # Un precalentamiento fallido no bloquea: decide la comprobación de la base
+    is_ready = state['status'] != 'running' and database == "ok" and not missing
+    return jsonify({
+        "ready": is_ready,
+        "prewarm": state,
+        "database": database,
+        "pending_migrations": missing,
+        "cache": {
+            "course_graphs": knowledge_graph.cached_courses(),
+            "assessments": catalog_cache.cached_assessments()
+        }
+    }), 200 if is_ready else 503
@@ -0,0 +1,33 @@
+import hmac
+from flask import Blueprint, Response, current_app, jsonify, request
+from app.utils.metrics import registry
+
+metrics_bp = Blueprint('metrics_bp', __name__)
+
+
+@metrics_bp.route('', methods=['GET'])
+def get_metrics():
+    """
+    Métricas de latencia, SQL y serialización en formato Prometheus
+    ---
+    tags:
+      - Observabilidad
+    produces:
+      - text/plain
+    parameters:
+      - in: header
+        name: Authorization
+        type: string
+        required: true
+        description: "Bearer <METRICS_TOKEN>"
+    responses:
+      200:
+        description: Exposición en formato de texto de Prometheus
+      401:
+        description: Falta el token de métricas o no es válido
+    """
+    token = current_app.config.get('METRICS_TOKEN') or ''
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not token or not hmac.compare_digest(supplied.encode(), token.encode()):
+        return jsonify({'error': 'Token de métricas inválido'}), 401
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -7,6 +7,7 @@ from sqlalchemy.exc import IntegrityError
 from psycopg2.errors import RaiseException
 from flask import jsonify
 from sqlalchemy.exc import DBAPIError
+from app.services import knowledge_graph
 
 
 
@@ -124,6 +125,7 @@ def create_subtopic():
 
     db.session.add(subtopic)
     db.session.commit()
+    knowledge_graph.invalidate_course()
 
     return subtopic_schema.jsonify(subtopic), 201
 
@@ -151,6 +153,7 @@ def update_subtopic(sub_id):
             subtopic.prerequisites = new_prerequisites
 
         db.session.commit()
+        knowledge_graph.invalidate_course()
 
         return subtopic_schema.jsonify(subtopic), 200
 
@@ -220,6 +223,7 @@ def update_subtopic_dependencies(sub_id):
 
     subtopic.prerequisites = prerequisites
     db.session.commit()
+    knowledge_graph.invalidate_course()
 
     return subtopic_schema.jsonify(subtopic), 200
 
@@ -1,10 +1,14 @@
-from flask import Blueprint, jsonify, request
+import codecs
+from flask import Blueprint, current_app, jsonify, request
 from sqlalchemy import func
+from app.models.role_model import Role
 from app.models.user_model import User
 from app.schemas.user_schema import users_schema, user_schema, user_create_schema  
 from app import db
 from app import bcrypt 
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from app.services import user_import
+from app.utils import streaming
 from datetime import timedelta
 
 user_bp = Blueprint('user_bp', __name__)
@@ -23,9 +27,14 @@ def get_all_users():
       - Usuarios
     security:
       - Bearer: []
+    produces:
+      - application/json
+      - application/x-ndjson
     responses:
       200:
-        description: Lista de usuarios
+        description: >
+          Lista de usuarios. Con `Accept: application/x-ndjson` se envía en
+          streaming, un usuario por línea
         schema:
           type: array
           items:
@@ -37,6 +46,9 @@ def get_all_users():
     """
 
     try:
+        if streaming.requested_format() == 'ndjson':
+            return streaming.ndjson_response(db.session, db.select(User), user_schema)
+
         users = User.query.all()                   
         result = users_schema.dump(users)         
         return jsonify(result), 200              
@@ -141,6 +153,95 @@ def create_user():
             
         return jsonify({'error': 'Error interno del servidor'}), 500
 
+
+@user_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_users():
+    """
+    Alta masiva de usuarios desde un CSV (solo administradores)
+    ---
+    tags:
+      - Usuarios
+    security:
+      - Bearer: []
+    consumes:
+      - text/csv
+    parameters:
+      - in: body
+        name: body
+        required: true
+        description: >
+          CSV con cabecera: usr_email, usr_first_name, usr_last_name y,
+          opcionalmente, usr_password, rol_id o rol_name y usr_status. Si falta
+          la contraseña se genera una temporal. Como máximo
+          USER_IMPORT_MAX_ROWS cuentas nuevas (200 por defecto), para que la
+          petición termine dentro del timeout del worker; los ficheros más
+          grandes se importan con `flask users import`.
+        schema:
+          type: string
+    responses:
+      201:
+        description: Usuarios importados
+        schema:
+          type: object
+          properties:
+            inserted:
+              type: integer
+            duplicates:
+              type: integer
+            invalid:
+              type: integer
+            errors:
+              type: array
+              items:
+                type: object
+                properties:
+                  line:
+                    type: integer
+                  usr_email:
+                    type: string
+                  error:
+                    type: string
+            credentials:
+              type: array
+              description: Contraseñas generadas (solo se muestran esta vez)
+              items:
+                type: object
+      400:
+        description: CSV inválido
+      403:
+        description: Solo los administradores pueden importar usuarios
+      413:
+        description: Más cuentas nuevas de las permitidas por petición (no se importa nada)
+      500:
+        description: Error interno
+    """
+    rol_name = db.session.scalar(
+        db.select(Role.rol_name).join(User, User.rol_id == Role.rol_id).where(User.usr_id == get_jwt_identity())
+    )
+    if rol_name != current_app.config['ADMIN_ROLE']:
+        return jsonify({'error': 'Solo los administradores pueden importar usuarios'}), 403
+
+    try:
+        # El CSV se lee del cuerpo línea a línea y se inserta por lotes
+        summary = user_import.import_users(
+            codecs.iterdecode(request.stream, 'utf-8-sig'), max_rows=current_app.config['USER_IMPORT_MAX_ROWS']
+        )
+        db.session.commit()
+        return jsonify(summary), 201
+
+    except user_import.UserImportTooLarge as e:
+        db.session.rollback()
+        return jsonify({'error': f"{e}; use `flask users import` para ficheros grandes"}), 413
+    except (user_import.UserImportError, UnicodeDecodeError) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        if "UniqueViolation" in str(e) or "already exists" in str(e):
+            return jsonify({'error': 'Algún correo se registró durante la importación; vuelva a intentarlo'}), 400
+        return jsonify({'error': str(e)}), 500
+
 from app import bcrypt
 
 @user_bp.route('/<int:user_id>', methods=['PUT'])
@@ -0,0 +1,162 @@
+"""
+Ingesta por lotes de intentos de práctica hechos sin conexión.
+
+El cliente envía de una vez lo que antes eran decenas de
+POST /api/exercise-attempts/. Cada intento se corrige contra la respuesta
+esperada (leída en una consulta por lote), los números de intento se reservan en bloque con una
+sola sentencia y todas las filas se insertan con un único INSERT
+multi-fila. El resultado indica, en el orden de entrada, qué pasó con
+cada elemento.
+"""
+import json
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import DateTime, bindparam, func, insert
+from app import db
+from app.models.enrollment_model import Enrollment
+from app.models.exercise_attempt_model import ExerciseAttempt
+from app.models.exercise_model import Exercise
+from app.services import attempt_numbering
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-seq')
+
+
+class BatchError(ValueError):
+    pass
+
+
+def parse_items(body, mimetype):
+    """Lista de elementos (o excepciones de parseo por línea) desde JSON o NDJSON."""
+    try:
+        text = body.decode('utf-8')
+    except UnicodeDecodeError:
+        raise BatchError("El cuerpo debe estar en UTF-8")
+    if mimetype in NDJSON_TYPES:
+        items = []
+        for line in text.splitlines():
+            line = line.strip().lstrip('\x1e')
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                items.append(BatchError(f"Línea JSON inválida: {e}"))
+        return items
+
+    try:
+        items = json.loads(text)
+    except ValueError as e:
+        raise BatchError(f"JSON inválido: {e}")
+    if not isinstance(items, list):
+        raise BatchError("Se esperaba una lista de intentos")
+    return items
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _validate(item):
+    """Devuelve la fila a insertar o lanza BatchError."""
+    if isinstance(item, BatchError):
+        raise item
+    if not isinstance(item, dict):
+        raise BatchError("Cada intento debe ser un objeto")
+    if not _is_int(item.get('ex_id')) or not _is_int(item.get('enr_id')):
+        raise BatchError("ex_id y enr_id son obligatorios y enteros")
+    if not isinstance(item.get('exa_answer'), str):
+        raise BatchError("exa_answer es obligatorio")
+
+    created_at = item.get('exa_created_at')
+    if created_at is not None:
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            raise BatchError("exa_created_at debe ser una fecha ISO 8601")
+
+    return {
+        'ex_id': item['ex_id'],
+        'enr_id': item['enr_id'],
+        'exa_answer': item['exa_answer'],
+        'created_at': created_at,
+    }
+
+
+def normalize_answer(answer):
+    return (answer or '').strip().lower()
+
+
+def _expected_answers(ex_ids):
+    """
+    {ex_id: respuesta esperada normalizada} de los ejercicios activos, leída
+    en cada lote (una consulta): un cambio de respuesta o una desactivación
+    se aplica enseguida en todos los workers.
+    """
+    if not ex_ids:
+        return {}
+    rows = db.session.execute(
+        db.select(Exercise.ex_id, Exercise.ex_expected_answer)
+        .where(Exercise.ex_id.in_(ex_ids), Exercise.ex_is_active.is_(True))
+    )
+    return {row.ex_id: normalize_answer(row.ex_expected_answer) for row in rows}
+
+
+def _result(index, item, status, **fields):
+    result = {'index': index, 'status': status, **fields}
+    if isinstance(item, dict) and 'client_id' in item:
+        result['client_id'] = item['client_id']
+    return result
+
+
+def ingest(items):
+    """
+    Corrige, numera e inserta los intentos válidos (sin commit). Devuelve
+    los resultados por elemento en el orden de entrada.
+    """
+    results = [None] * len(items)
+    rows = []
+    for index, item in enumerate(items):
+        try:
+            rows.append((index, _validate(item)))
+        except BatchError as e:
+            results[index] = _result(index, item, 400, error=str(e))
+
+    expected = _expected_answers({row['ex_id'] for _, row in rows})
+    enrollments = {row['enr_id'] for _, row in rows}
+    if enrollments:
+        enrollments = set(db.session.scalars(
+            db.select(Enrollment.enr_id).where(Enrollment.enr_id.in_(enrollments))
+        ))
+
+    valid = []
+    for index, row in rows:
+        if row['ex_id'] not in expected:
+            results[index] = _result(index, items[index], 404, error="Ejercicio no encontrado o inactivo")
+        elif row['enr_id'] not in enrollments:
+            results[index] = _result(index, items[index], 404, error="Matrícula no encontrada")
+        else:
+            row['exa_is_correct'] = normalize_answer(row['exa_answer']) == expected[row['ex_id']]
+            valid.append((index, row))
+
+    if not valid:
+        return results
+
+    # Números consecutivos por (matrícula, ejercicio) en el orden de llegada
+    counts = Counter((row['enr_id'], row['ex_id']) for _, row in valid)
+    next_no = attempt_numbering.reserve_many(ExerciseAttempt, counts)
+    for _, row in valid:
+        key = (row['enr_id'], row['ex_id'])
+        row['exa_attempt_no'] = next_no[key]
+        next_no[key] += 1
+
+    stmt = insert(ExerciseAttempt).values(
+        exa_created_at=func.coalesce(bindparam('created_at', type_=DateTime), func.now())
+    ).returning(ExerciseAttempt.exa_id, sort_by_parameter_order=True)
+    inserted = db.session.execute(stmt, [row for _, row in valid]).scalars().all()
+
+    for (index, row), exa_id in zip(valid, inserted):
+        results[index] = _result(
+            index, items[index], 201,
+            exa_id=exa_id, exa_attempt_no=row['exa_attempt_no'], exa_is_correct=row['exa_is_correct']
+        )
+    return results
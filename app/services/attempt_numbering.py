@@ -0,0 +1,122 @@
+"""
+Numeración de intentos sin carreras.
+
+En lugar de `max(attempt_no) + 1` seguido de un INSERT (dos viajes y
+colisiones con uq_exa_attempt cuando llegan dos envíos a la vez), cada
+(tipo, matrícula, ejercicio/evaluación) tiene una fila en `attempt_counter`
+que se incrementa con INSERT ... ON CONFLICT DO UPDATE ... RETURNING. El
+bloqueo de esa fila serializa a los concurrentes hasta el commit, así que
+ningún número se repite.
+
+`insert_attempt` reserva el número e inserta el intento en una única
+sentencia (CTE); `reserve` y `reserve_many` reservan bloques de números
+para inserciones masivas. La primera vez que se usa un contador se inicializa con el máximo
+existente en la tabla de intentos.
+"""
+from sqlalchemy import func, insert, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.sql.expression import ClauseElement
+from app import db
+from app.models.assessment_attempt_model import AssessmentAttempt
+from app.models.attempt_counter_model import AttemptCounter
+from app.models.exercise_attempt_model import ExerciseAttempt
+
+# modelo -> (tipo de contador, columna del ejercicio/evaluación, columna del número)
+NUMBERED = {
+    ExerciseAttempt: ('exercise', 'ex_id', 'exa_attempt_no'),
+    AssessmentAttempt: ('assessment', 'asm_id', 'attempt_no'),
+}
+
+
+def _existing(model, enr_id, item_id):
+    """Mayor número ya usado en la tabla de intentos (valor inicial del contador)."""
+    _, item_column, number_column = NUMBERED[model]
+    return select(func.coalesce(func.max(getattr(model, number_column)), 0))\
+        .where(model.enr_id == enr_id, getattr(model, item_column) == item_id)\
+        .scalar_subquery()
+
+
+def _allocate(model, enr_id, item_id, count):
+    """INSERT ... ON CONFLICT sobre attempt_counter que devuelve el último número reservado."""
+    kind = NUMBERED[model][0]
+    stmt = pg_insert(AttemptCounter).values(
+        kind=kind, enr_id=enr_id, item_id=item_id, last_no=_existing(model, enr_id, item_id) + count
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[AttemptCounter.kind, AttemptCounter.enr_id, AttemptCounter.item_id],
+        set_={'last_no': AttemptCounter.last_no + count},
+    ).returning(AttemptCounter.last_no)
+
+
+def reserve(model, enr_id, item_id, count=1):
+    """Reserva `count` números consecutivos y devuelve el primero."""
+    last_no = db.session.execute(_allocate(model, enr_id, item_id, count)).scalar_one()
+    return last_no - count + 1
+
+
+def reserve_many(model, counts):
+    """
+    Reserva bloques para varios contadores en una sola sentencia.
+    `counts` es {(enr_id, item_id): cantidad}; devuelve {(enr_id, item_id): primer número}.
+    """
+    if not counts:
+        return {}
+    kind = NUMBERED[model][0]
+    # Orden fijo: dos lotes concurrentes bloquean las filas en el mismo orden
+    keys = sorted(counts)
+    stmt = pg_insert(AttemptCounter).values([
+        {'kind': kind, 'enr_id': enr_id, 'item_id': item_id,
+         'last_no': _existing(model, enr_id, item_id) + counts[(enr_id, item_id)]}
+        for enr_id, item_id in keys
+    ])
+    # En conflicto, excluded.last_no - valor inicial es la cantidad pedida para esa fila
+    # (literal_column: `excluded` no debe acabar en el FROM de la subconsulta)
+    requested = stmt.excluded.last_no - _existing(
+        model, literal_column('excluded.enr_id'), literal_column('excluded.item_id'))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[AttemptCounter.kind, AttemptCounter.enr_id, AttemptCounter.item_id],
+        set_={'last_no': AttemptCounter.last_no + requested},
+    ).returning(AttemptCounter.enr_id, AttemptCounter.item_id, AttemptCounter.last_no)
+
+    return {
+        (row.enr_id, row.item_id): row.last_no - counts[(row.enr_id, row.item_id)] + 1
+        for row in db.session.execute(stmt)
+    }
+
+
+def _bind(model, name, value):
+    if isinstance(value, ClauseElement):
+        return value
+    return literal(value, model.__table__.c[name].type)
+
+
+def _defaults(model, values, number_column):
+    """Defaults de Python de las columnas omitidas (INSERT ... SELECT no los aplica)."""
+    defaults = {}
+    for column in model.__table__.c:
+        default = column.default
+        if column.name in values or column.name == number_column or default is None:
+            continue
+        if default.is_callable:
+            defaults[column.name] = default.arg(None)
+        elif default.is_scalar or default.is_clause_element:
+            defaults[column.name] = default.arg
+    return defaults
+
+
+def insert_attempt(model, values):
+    """
+    Inserta un intento con el siguiente número en una sola sentencia y lo
+    devuelve como instancia del modelo (ya en la sesión, sin commit).
+    """
+    _, item_column, number_column = NUMBERED[model]
+    counter = _allocate(model, values['enr_id'], values[item_column], 1).cte('next_attempt')
+
+    values = {**_defaults(model, values, number_column), **values}
+    columns = list(values)
+    row = select(*(_bind(model, name, values[name]) for name in columns), counter.c.last_no)
+    stmt = insert(model).add_cte(counter, nest_here=True)\
+        .from_select(columns + [number_column], row)\
+        .returning(*model.__table__.c)
+
+    return db.session.execute(select(model).from_statement(stmt)).scalar_one()
@@ -0,0 +1,45 @@
+"""
+Caché de catálogo: ejercicios asignados a cada evaluación, que cambian muy
+poco.
+
+Cada lista se guarda con la `cou_content_version` del curso, que suben los
+triggers de la base de datos al cambiar ejercicios o asignaciones
+(sql/migrations/005): un cambio hecho desde cualquier worker invalida la
+lista en todos. La versión es la misma que usa el grafo del curso y se lee
+una vez por petición.
+"""
+from app import db
+from app.models.assessment_exercise_model import AssessmentExercise
+from app.models.exercise_model import Exercise
+from app.services import knowledge_graph
+from app.utils.cache import TTLCache
+
+_assessment_exercises = TTLCache(ttl=300)
+
+
+def get_assessment_exercises(asm_id, cou_id):
+    """Pares (ex_id, sub_id) de los ejercicios activos de una evaluación del curso `cou_id`."""
+    version = knowledge_graph.content_version(cou_id)
+    cached = _assessment_exercises.get(asm_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    rows = db.session.query(Exercise.ex_id, Exercise.sub_id)\
+        .join(AssessmentExercise, AssessmentExercise.ex_id == Exercise.ex_id)\
+        .filter(AssessmentExercise.asm_id == asm_id, Exercise.ex_is_active.is_(True))\
+        .all()
+    exercises = tuple((row.ex_id, row.sub_id) for row in rows)
+    _assessment_exercises.set(asm_id, (version, exercises))
+    return exercises
+
+
+def invalidate_assessment(asm_id=None):
+    """Descarta la lista en este worker; los demás lo detectan por la versión del curso."""
+    if asm_id is None:
+        _assessment_exercises.clear()
+    else:
+        _assessment_exercises.delete(asm_id)
+
+
+def cached_assessments():
+    return len(_assessment_exercises)
@@ -0,0 +1,248 @@
+"""
+Exportación incremental de los registros del diagnóstico y de la práctica
+a ficheros columnares (Parquet o Arrow IPC) para analítica fuera de línea.
+
+Cada tabla avanza por su propia marca de agua (answered_at, exa_created_at
+o el ended_at de la sesión para las probabilidades finales) guardada en
+`_watermarks.json` dentro del directorio de salida, así que cada ejecución
+solo lee lo nuevo. Se lee con cursor de servidor en lotes de tamaño fijo,
+de la réplica si hay alguna configurada, y cada lote se escribe como un
+RecordBatch en la partición de su día:
+
+    <salida>/<tabla>/date=AAAA-MM-DD/part-<ejecución>.parquet
+
+El límite superior se queda EXPORT_WATERMARK_LAG_SECONDS por detrás del
+reloj de la base de datos para no saltarse filas de transacciones que aún
+no habían confirmado. Se toma en el mismo reloj con el que se escribió cada
+marca: UTC para answered_at y ended_at (datetime.utcnow() en la aplicación)
+y la hora local del servidor para exa_created_at (now() por defecto). La
+marca de agua solo avanza si todos los ficheros se cerraron bien.
+
+pyarrow es opcional: solo lo necesita este módulo.
+"""
+import itertools
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, Float, Integer, Numeric, func, select
+from app import db
+from app.models.diagnostic_probability_model import DiagnosticProbability
+from app.models.diagnostic_question_log_model import DiagnosticQuestionLog
+from app.models.diagnostic_session_model import DiagnosticSession
+from app.models.exercise_attempt_model import ExerciseAttempt
+from app.utils.db_routing import REPLICA_PREFIX
+
+WATERMARKS_FILE = '_watermarks.json'
+EXTENSIONS = {'parquet': 'parquet', 'arrow': 'arrow'}
+
+
+class ExportError(RuntimeError):
+    pass
+
+
+# Relojes en que se escriben las marcas de agua, para calcular su límite superior
+CLOCKS = {
+    'utc': func.timezone('utc', func.now()),
+    'local': func.localtimestamp(),
+}
+
+
+def _sources():
+    """tabla -> (SELECT de las columnas exportadas, columna de marca de agua, desempate, reloj)."""
+    return {
+        'diagnostic_question_log': (
+            select(DiagnosticQuestionLog.__table__),
+            DiagnosticQuestionLog.answered_at, DiagnosticQuestionLog.log_id, 'utc',
+        ),
+        'diagnostic_probability': (
+            select(
+                DiagnosticProbability.__table__, DiagnosticSession.asm_id, DiagnosticSession.student_id,
+                DiagnosticSession.course_instance_id, DiagnosticSession.ended_at,
+            ).join(DiagnosticSession, DiagnosticSession.session_id == DiagnosticProbability.session_id),
+            DiagnosticSession.ended_at, DiagnosticProbability.session_id, 'utc',
+        ),
+        'exercise_attempt': (
+            select(ExerciseAttempt.__table__),
+            ExerciseAttempt.exa_created_at, ExerciseAttempt.exa_id, 'local',
+        ),
+    }
+
+
+TABLES = ('diagnostic_question_log', 'diagnostic_probability', 'exercise_attempt')
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportError("La exportación columnar necesita pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def _arrow_type(pa, sql_type):
+    if isinstance(sql_type, Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, BigInteger):
+        return pa.int64()
+    if isinstance(sql_type, Integer):
+        return pa.int32()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, Numeric):
+        if sql_type.precision:
+            return pa.decimal128(sql_type.precision, sql_type.scale or 0)
+        return pa.float64()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp('us')
+    if isinstance(sql_type, Date):
+        return pa.date32()
+    # Texto, UUID y el resto se exportan como cadena
+    return pa.string()
+
+
+def _converter(arrow_type, pa):
+    if pa.types.is_string(arrow_type):
+        return lambda value: None if value is None else str(value)
+    return None
+
+
+class _PartitionWriter:
+    """Un fichero por partición (día) y ejecución; se escribe en .tmp y se renombra al cerrar."""
+
+    def __init__(self, pa, fmt, schema, directory, run_id, compression):
+        self.pa, self.fmt, self.schema = pa, fmt, schema
+        self.directory, self.run_id, self.compression = directory, run_id, compression
+        self.day, self.writer, self.sink, self.path = None, None, None, None
+        self.files = []
+
+    def write(self, day, batch):
+        if day != self.day:
+            self.close()
+            self._open(day)
+        self.writer.write_batch(batch)
+
+    def _open(self, day):
+        partition = os.path.join(self.directory, f"date={day.isoformat()}")
+        os.makedirs(partition, exist_ok=True)
+        self.day = day
+        self.path = os.path.join(partition, f"part-{self.run_id}.{EXTENSIONS[self.fmt]}")
+        if self.fmt == 'parquet':
+            self.writer = self.pa.parquet.ParquetWriter(self.path + '.tmp', self.schema, compression=self.compression)
+        else:
+            self.sink = self.pa.OSFile(self.path + '.tmp', 'wb')
+            self.writer = self.pa.ipc.new_file(self.sink, self.schema)
+
+    def close(self):
+        if self.writer is None:
+            return
+        self.writer.close()
+        if self.sink is not None:
+            self.sink.close()
+        os.replace(self.path + '.tmp', self.path)
+        self.files.append(self.path)
+        self.writer = self.sink = None
+
+    def discard(self):
+        """Tras un error: borra el fichero a medio escribir."""
+        if self.writer is not None:
+            try:
+                self.writer.close()
+                if self.sink is not None:
+                    self.sink.close()
+            finally:
+                os.remove(self.path + '.tmp')
+                self.writer = self.sink = None
+
+
+def load_watermarks(out_dir):
+    path = os.path.join(out_dir, WATERMARKS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return {table: datetime.fromisoformat(value) for table, value in json.load(f).items()}
+
+
+def save_watermarks(out_dir, watermarks):
+    path = os.path.join(out_dir, WATERMARKS_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({table: value.isoformat() for table, value in watermarks.items()}, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def default_bind():
+    """Primera réplica configurada o, si no hay, el primario (None)."""
+    replicas = sorted(key for key in db.engines if key and key.startswith(REPLICA_PREFIX))
+    return replicas[0] if replicas else None
+
+
+def export_table(connection, table, out_dir, fmt, since, until, run_id, batch_rows, compression):
+    """Exporta las filas con since < marca <= until. Devuelve (filas, ficheros)."""
+    pa = _pyarrow()
+    stmt, mark, tiebreak, _ = _sources()[table]
+    columns = list(stmt.selected_columns)
+    schema = pa.schema([pa.field(column.name, _arrow_type(pa, column.type)) for column in columns])
+    converters = [_converter(field.type, pa) for field in schema]
+    mark_index = [column.name for column in columns].index(mark.name)
+
+    stmt = stmt.where(mark.is_not(None), mark <= until).order_by(mark, tiebreak)
+    if since is not None:
+        stmt = stmt.where(mark > since)
+
+    writer = _PartitionWriter(pa, fmt, schema, os.path.join(out_dir, table), run_id, compression)
+    total = 0
+    try:
+        result = connection.execution_options(yield_per=batch_rows).execute(stmt)
+        for rows in result.partitions():
+            # Ordenado por la marca: cada lote se parte, como mucho, en días consecutivos
+            for day, group in itertools.groupby(rows, key=lambda row: row[mark_index].date()):
+                group = list(group)
+                arrays = [
+                    pa.array([convert(row[i]) if convert else row[i] for row in group], type=field.type)
+                    for i, (field, convert) in enumerate(zip(schema, converters))
+                ]
+                writer.write(day, pa.RecordBatch.from_arrays(arrays, schema=schema))
+                total += len(group)
+        writer.close()
+    except Exception:
+        writer.discard()
+        raise
+    return total, writer.files
+
+
+def export(out_dir, tables=TABLES, fmt='parquet', bind=None, full=False, batch_rows=None, lag_seconds=None,
+           compression='zstd'):
+    """
+    Exporta `tables` a `out_dir` desde su última marca de agua. Devuelve
+    {tabla: {'rows', 'files', 'since', 'until'}}.
+    """
+    _pyarrow()
+    if fmt not in EXTENSIONS:
+        raise ExportError(f"Formato no soportado: {fmt}")
+    batch_rows = batch_rows or current_app.config['EXPORT_BATCH_ROWS']
+    lag = timedelta(seconds=current_app.config['EXPORT_WATERMARK_LAG_SECONDS'] if lag_seconds is None else lag_seconds)
+    os.makedirs(out_dir, exist_ok=True)
+
+    watermarks = {} if full else load_watermarks(out_dir)
+    engine = db.engines[bind if bind is not None else default_bind()]
+    summary = {}
+    sources = _sources()
+    with engine.connect() as connection:
+        clocks = dict(zip(CLOCKS, connection.execute(select(*CLOCKS.values())).one()))
+        run_id = f"{clocks['utc']:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        for table in tables:
+            until = clocks[sources[table][3]] - lag
+            since = watermarks.get(table)
+            if since is not None and since >= until:
+                summary[table] = {'rows': 0, 'files': [], 'since': since, 'until': since}
+                continue
+            rows, files = export_table(connection, table, out_dir, fmt, since, until, run_id, batch_rows, compression)
+            watermarks[table] = until
+            save_watermarks(out_dir, watermarks)
+            summary[table] = {'rows': rows, 'files': files, 'since': since, 'until': until}
+            # Cierra la transacción de lectura entre tablas (no retiene snapshots en la réplica)
+            connection.rollback()
+    return summary
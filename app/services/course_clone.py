@@ -0,0 +1,177 @@
+"""
+Copia profunda de un curso dentro de la base de datos.
+
+Cada tabla del árbol (dominios, subtemas, prerrequisitos, ejercicios,
+recursos, evaluaciones y sus ejercicios) se copia con una única sentencia
+INSERT ... SELECT. Los IDs nuevos se reservan con nextval() en la misma
+sentencia y el par (antiguo, nuevo) queda en la tabla temporal `clone_map`,
+de donde lo toman las tablas hijas. El número de sentencias es fijo, sea
+cual sea el tamaño del curso, y ninguna fila viaja a Python.
+
+Los prerrequisitos y ejercicios que pertenecen a otro curso se mantienen
+apuntando al original.
+"""
+from datetime import date
+from sqlalchemy import Column, Integer, MetaData, String, Table, and_, cast, func, insert, literal, select, text
+from sqlalchemy.dialects.postgresql import REGCLASS
+from app import db
+from app.models.assessment_exercise_model import AssessmentExercise
+from app.models.assessment_model import Assessment
+from app.models.course_instance_model import CourseInstance
+from app.models.course_model import Course
+from app.models.domain_model import Domain
+from app.models.exercise_model import Exercise
+from app.models.learning_resource_model import LearningResource
+from app.models.subtopic_dependency_model import SubtopicDependency
+from app.models.subtopic_model import Subtopic
+from app.services import knowledge_graph
+
+# Tabla temporal de la sesión; no forma parte de db.metadata ni de create_all
+clone_map = Table(
+    'clone_map', MetaData(),
+    Column('kind', String(20)),
+    Column('old_id', Integer),
+    Column('new_id', Integer),
+    prefixes=['TEMPORARY'],
+)
+
+_CREATE_MAP = text(
+    "CREATE TEMPORARY TABLE IF NOT EXISTS clone_map "
+    "(kind varchar(20), old_id integer, new_id integer, PRIMARY KEY (kind, old_id)) ON COMMIT DROP; "
+    "TRUNCATE clone_map"
+)
+
+
+class CourseCloneError(ValueError):
+    pass
+
+
+class CourseCloneForbidden(PermissionError):
+    """El curso de origen es de otro autor."""
+
+
+def _copied_columns(table, *skip):
+    """Columnas que se copian tal cual: sin PK, sin timestamps del servidor."""
+    return [
+        column for column in table.c
+        if not column.primary_key and column.server_default is None and column.name not in skip
+    ]
+
+
+def _date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _mapped(column):
+    """Alias de clone_map para traducir una columna concreta."""
+    return clone_map.alias(f'{column}_map')
+
+
+def _copy(model, kind, parent, remap=(), overrides=None, keep_ids=False):
+    """
+    INSERT ... SELECT de las filas de `model`.
+
+    - parent: (columna, tipo mapeado) o (columna, (valor origen, valor nuevo))
+    - remap: [(columna, tipo)] con IDs que se traducen si están en clone_map
+    - keep_ids: reserva IDs nuevos y guarda el mapeo en clone_map
+    """
+    table = model.__table__
+    overrides = overrides or {}
+    parent_column, parent_source = parent
+    source = table
+    where = []
+
+    if isinstance(parent_source, str):
+        parent_map = _mapped(parent_column)
+        source = source.join(parent_map, and_(
+            parent_map.c.kind == parent_source, parent_map.c.old_id == table.c[parent_column]))
+        parent_value = parent_map.c.new_id
+    else:
+        old_value, new_value = parent_source
+        where.append(table.c[parent_column] == old_value)
+        parent_value = literal(new_value)
+
+    target = {parent_column: parent_value}
+    for column, remap_kind in remap:
+        remap_table = _mapped(column)
+        source = source.outerjoin(remap_table, and_(
+            remap_table.c.kind == remap_kind, remap_table.c.old_id == table.c[column]))
+        target[column] = func.coalesce(remap_table.c.new_id, table.c[column])
+
+    for column in _copied_columns(table, parent_column, *target):
+        target[column.name] = overrides.get(column.name, column)
+    for name, value in overrides.items():
+        target.setdefault(name, value)
+
+    if keep_ids:
+        pk = next(iter(table.primary_key.columns))
+        sequence = cast(func.pg_get_serial_sequence(table.name, pk.name), REGCLASS)
+        ids = select(literal(kind), pk, func.nextval(sequence)).select_from(source).where(*where)
+        reserved = insert(clone_map).from_select(['kind', 'old_id', 'new_id'], ids)\
+            .returning(clone_map.c.old_id, clone_map.c.new_id).cte(f'{kind}_ids')
+        source = source.join(reserved, reserved.c.old_id == pk)
+        target = {pk.name: reserved.c.new_id, **target}
+        stmt = insert(table).add_cte(reserved, nest_here=True)
+    else:
+        stmt = insert(table)
+
+    stmt = stmt.from_select(list(target), select(*target.values()).select_from(source).where(*where))
+    return db.session.execute(stmt).rowcount
+
+
+def clone_course(cou_id, created_by, name=None, instance=None):
+    """
+    Copia el curso `cou_id` con todo su contenido (sin commit). `instance`
+    (coi_name, coi_ins_code, coi_start_date, coi_end_date) crea además una
+    instancia del curso nuevo. Devuelve (curso, instancia, filas por tabla).
+    Solo el autor puede clonar su curso (CourseCloneForbidden si no).
+    """
+    created_by = int(created_by)
+    source = db.session.get(Course, cou_id)
+    if source is None:
+        raise CourseCloneError(f"El curso {cou_id} no existe")
+    if source.cou_created_by != created_by:
+        raise CourseCloneForbidden(f"Solo el autor del curso {cou_id} puede clonarlo")
+
+    new_id = db.session.execute(
+        insert(Course).from_select(
+            ['cou_course_name', 'cou_description', 'cou_duration', 'cou_difficulty',
+             'cou_visibility', 'cou_status', 'cou_created_by', 'cou_thumbnail'],
+            select(
+                literal(name or f"{source.cou_course_name} (copia)"[:100]),
+                Course.cou_description, Course.cou_duration, Course.cou_difficulty,
+                Course.cou_visibility, literal('borrador'), literal(created_by), Course.cou_thumbnail
+            ).where(Course.cou_id == cou_id)
+        ).returning(Course.cou_id)
+    ).scalar_one()
+
+    db.session.execute(_CREATE_MAP)
+    counts = {}
+    # Las tablas hijas se filtran por el curso de origen a través de los joins con clone_map
+    counts['domain'] = _copy(Domain, 'domain', ('cou_id', (cou_id, new_id)), keep_ids=True)
+    counts['subtopic'] = _copy(Subtopic, 'subtopic', ('dom_id', 'domain'), keep_ids=True)
+    counts['subtopic_dependency'] = _copy(
+        SubtopicDependency, 'dependency', ('sub_id', 'subtopic'), remap=[('prerequisite_id', 'subtopic')])
+    counts['exercise'] = _copy(Exercise, 'exercise', ('sub_id', 'subtopic'), keep_ids=True)
+    counts['learning_resource'] = _copy(LearningResource, 'resource', ('sub_id', 'subtopic'))
+    counts['assessment'] = _copy(
+        Assessment, 'assessment', ('cou_id', (cou_id, new_id)),
+        overrides={'asm_status': literal('borrador'), 'created_by': literal(created_by)}, keep_ids=True)
+    counts['assessment_exercise'] = _copy(
+        AssessmentExercise, 'assessment_exercise', ('asm_id', 'assessment'), remap=[('ex_id', 'exercise')])
+
+    new_instance = None
+    if instance:
+        new_instance = CourseInstance(
+            cou_id=new_id,
+            coi_name=instance['coi_name'],
+            coi_ins_code=instance['coi_ins_code'],
+            coi_start_date=_date(instance.get('coi_start_date')),
+            coi_end_date=_date(instance.get('coi_end_date')),
+            coi_created_by=created_by
+        )
+        db.session.add(new_instance)
+        db.session.flush()
+
+    knowledge_graph.invalidate_course(new_id)
+    return db.session.get(Course, new_id), new_instance, counts
@@ -0,0 +1,378 @@
+"""
+Importación de un curso completo en una sola transacción.
+
+El paquete describe dominios, subtemas con sus prerrequisitos, ejercicios,
+recursos y evaluaciones. Cada elemento lleva una clave del cliente (`key`)
+y apunta a su padre con `parent`; al insertar, las claves se traducen a los
+IDs generados. Formatos admitidos:
+
+- JSON anidado: {"course": {...}, "domains": [{..., "subtopics": [{...,
+  "prerequisites": [...], "exercises": [...], "resources": [...]}]}],
+  "assessments": [{..., "exercises": [claves]}]}
+- NDJSON o CSV plano: un registro por línea/fila con `record` (course,
+  domain, subtopic, dependency, exercise, resource, assessment,
+  assessment_exercise), `key`, `parent` y las columnas del modelo. En
+  `dependency` la clave es el subtema y `parent` su prerrequisito; en
+  `assessment_exercise` la clave es el ejercicio y `parent` la evaluación.
+
+Todo se valida antes de escribir (campos, claves y ciclos en el grafo de
+prerrequisitos) y cada tabla se carga con un único INSERT multi-fila.
+"""
+import csv
+import json
+from collections import defaultdict
+from sqlalchemy import Boolean, Integer, insert
+from app import db
+from app.models.assessment_exercise_model import AssessmentExercise
+from app.models.assessment_model import Assessment
+from app.models.course_model import Course
+from app.models.domain_model import Domain
+from app.models.exercise_model import Exercise
+from app.models.learning_resource_model import LearningResource
+from app.models.subtopic_dependency_model import SubtopicDependency
+from app.models.subtopic_model import Subtopic
+from app.services import knowledge_graph
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/jsonl')
+CSV_TYPES = ('text/csv', 'application/csv')
+
+# registro -> (modelo, tipo del padre, columna que recibe el ID del padre)
+RECORDS = {
+    'domain': (Domain, None, 'cou_id'),
+    'subtopic': (Subtopic, 'domain', 'dom_id'),
+    'exercise': (Exercise, 'subtopic', 'sub_id'),
+    'resource': (LearningResource, 'subtopic', 'sub_id'),
+    'assessment': (Assessment, None, 'cou_id'),
+    'assessment_exercise': (AssessmentExercise, 'assessment', 'asm_id'),
+}
+# registros cuya clave apunta a otro elemento: registro -> (tipo enlazado, columna)
+LINKS = {'assessment_exercise': ('exercise', 'ex_id')}
+KINDS = ('course', 'dependency') + tuple(RECORDS)
+
+_TRUE = ('1', 'true', 't', 'si', 'sí', 'yes', 'y')
+
+
+class CourseImportError(ValueError):
+
+    def __init__(self, errors):
+        super().__init__(f"El paquete tiene {len(errors)} errores")
+        self.errors = errors
+
+
+class CourseImportForbidden(PermissionError):
+    """El paquete apunta a un curso existente de otro autor."""
+
+
+def _editable_columns(model):
+    """Columnas que el paquete puede dar: sin PK, FKs ni timestamps del servidor."""
+    return {
+        column.name: column for column in model.__table__.c
+        if not column.primary_key and not column.foreign_keys and column.server_default is None
+    }
+
+
+# --- Lectura ---
+
+def _flatten(bundle):
+    """JSON anidado -> registros planos."""
+    if not isinstance(bundle, dict):
+        raise CourseImportError(["Se esperaba un objeto JSON con 'course', 'domains' y 'assessments'"])
+
+    if bundle.get('course') is not None:
+        yield {'record': 'course', **bundle['course']}
+
+    counter = defaultdict(int)
+
+    def key_of(kind, item):
+        counter[kind] += 1
+        return item.get('key') or f"#{kind}{counter[kind]}"
+
+    for domain in bundle.get('domains') or []:
+        domain = dict(domain)
+        subtopics = domain.pop('subtopics', None) or []
+        domain_key = key_of('domain', domain)
+        yield {'record': 'domain', **domain, 'key': domain_key}
+
+        for subtopic in subtopics:
+            subtopic = dict(subtopic)
+            prerequisites = subtopic.pop('prerequisites', None) or []
+            exercises = subtopic.pop('exercises', None) or []
+            resources = subtopic.pop('resources', None) or []
+            subtopic_key = key_of('subtopic', subtopic)
+            yield {'record': 'subtopic', **subtopic, 'key': subtopic_key, 'parent': domain_key}
+            for prerequisite in prerequisites:
+                yield {'record': 'dependency', 'key': subtopic_key, 'parent': prerequisite}
+            for exercise in exercises:
+                yield {'record': 'exercise', **exercise, 'key': key_of('exercise', exercise), 'parent': subtopic_key}
+            for resource in resources:
+                yield {'record': 'resource', **resource, 'key': key_of('resource', resource), 'parent': subtopic_key}
+
+    for assessment in bundle.get('assessments') or []:
+        assessment = dict(assessment)
+        exercises = assessment.pop('exercises', None) or []
+        assessment_key = key_of('assessment', assessment)
+        yield {'record': 'assessment', **assessment, 'key': assessment_key}
+        for position, exercise in enumerate(exercises, start=1):
+            yield {'record': 'assessment_exercise', 'key': exercise, 'parent': assessment_key,
+                   'ase_order_index': position}
+
+
+def read_bundle(lines, fmt):
+    """
+    Registros planos a partir de un iterable de líneas de texto. `fmt` es
+    'json', 'ndjson' o 'csv'; NDJSON y CSV se leen línea a línea.
+    """
+    if fmt == 'json':
+        try:
+            return list(_flatten(json.loads(''.join(lines))))
+        except ValueError as e:
+            if isinstance(e, CourseImportError):
+                raise
+            raise CourseImportError([f"JSON inválido: {e}"])
+
+    records = []
+    if fmt == 'ndjson':
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                raise CourseImportError([f"Línea {number}: JSON inválido: {e}"])
+    elif fmt == 'csv':
+        for row in csv.DictReader(lines):
+            # Las celdas vacías se tratan como columnas ausentes
+            records.append({name: value for name, value in row.items() if name and value not in (None, '')})
+    else:
+        raise CourseImportError([f"Formato no soportado: {fmt}"])
+    return records
+
+
+def format_for(mimetype=None, filename=None):
+    if mimetype in NDJSON_TYPES or (filename or '').endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if mimetype in CSV_TYPES or (filename or '').endswith('.csv'):
+        return 'csv'
+    return 'json'
+
+
+# --- Validación ---
+
+def _coerce(column, value):
+    """Convierte los textos del CSV al tipo de la columna."""
+    if not isinstance(value, str):
+        return value
+    if isinstance(column.type, Boolean):
+        return value.strip().lower() in _TRUE
+    if isinstance(column.type, Integer):
+        return int(value)
+    return value
+
+
+def _values(model, record, where, errors):
+    columns = _editable_columns(model)
+    values = {}
+    for name, value in record.items():
+        if name in ('record', 'key', 'parent'):
+            continue
+        if name not in columns:
+            errors.append(f"{where}: columna desconocida '{name}'")
+            continue
+        try:
+            values[name] = _coerce(columns[name], value)
+        except ValueError:
+            errors.append(f"{where}: valor inválido para '{name}': {value!r}")
+
+    for name, column in columns.items():
+        if not column.nullable and column.default is None and values.get(name) is None:
+            errors.append(f"{where}: falta '{name}'")
+    return values
+
+
+def find_cycle(edges):
+    """Un ciclo del grafo {nodo: {prerrequisitos}} como lista de nodos, o None."""
+    done, on_path = set(), set()
+    for root in sorted(edges, key=str):
+        if root in done:
+            continue
+        # DFS iterativa: (nodo, prerrequisitos pendientes)
+        path = [(root, iter(sorted(edges.get(root, ()), key=str)))]
+        on_path.add(root)
+        while path:
+            node, pending = path[-1]
+            prerequisite = next(pending, None)
+            if prerequisite is None:
+                path.pop()
+                on_path.discard(node)
+                done.add(node)
+            elif prerequisite in on_path:
+                nodes = [n for n, _ in path]
+                return nodes[nodes.index(prerequisite):] + [prerequisite]
+            elif prerequisite not in done:
+                path.append((prerequisite, iter(sorted(edges.get(prerequisite, ()), key=str))))
+                on_path.add(prerequisite)
+    return None
+
+
+def plan(records):
+    """
+    Valida los registros y los agrupa por tipo. Lanza CourseImportError con
+    todos los problemas encontrados.
+    """
+    errors = []
+    course = None
+    rows = {kind: [] for kind in RECORDS}
+    keys = {kind: set() for kind in RECORDS}
+    dependencies = []
+
+    for number, record in enumerate(records, start=1):
+        where = f"registro {number}"
+        if not isinstance(record, dict):
+            errors.append(f"{where}: se esperaba un objeto")
+            continue
+        kind = record.get('record')
+        if kind not in KINDS:
+            errors.append(f"{where}: tipo de registro desconocido {kind!r}")
+            continue
+        where = f"{where} ({kind})"
+
+        if kind == 'course':
+            if course is not None:
+                errors.append(f"{where}: el paquete solo puede describir un curso")
+            # Con cou_id se importa en un curso existente y el resto de campos se ignora
+            if record.get('cou_id') is not None:
+                course = {'cou_id': record['cou_id']}
+            else:
+                course = _values(Course, record, where, errors)
+            continue
+
+        key, parent = record.get('key'), record.get('parent')
+        if kind == 'dependency':
+            if not key or not parent:
+                errors.append(f"{where}: 'key' (subtema) y 'parent' (prerrequisito) son obligatorios")
+            elif key == parent:
+                errors.append(f"{where}: el subtema '{key}' no puede ser su propio prerrequisito")
+            else:
+                dependencies.append((key, parent, where))
+            continue
+
+        model, parent_kind, _ = RECORDS[kind]
+        if kind != 'assessment_exercise':
+            if key is not None:
+                if key in keys[kind]:
+                    errors.append(f"{where}: clave repetida '{key}'")
+                keys[kind].add(key)
+        if parent_kind is not None and not parent:
+            errors.append(f"{where}: falta 'parent' ({parent_kind})")
+        rows[kind].append((key, parent, _values(model, record, where, errors), where))
+
+    if course is None:
+        errors.append("Falta el registro 'course'")
+
+    # Las referencias se comprueban al final: el orden de los registros es libre
+    for kind, (_, parent_kind, _) in RECORDS.items():
+        for key, parent, _, where in rows[kind]:
+            if parent_kind is not None and parent and parent not in keys[parent_kind]:
+                errors.append(f"{where}: {parent_kind} '{parent}' no existe en el paquete")
+            if kind in LINKS and key not in keys[LINKS[kind][0]]:
+                errors.append(f"{where}: {LINKS[kind][0]} '{key}' no existe en el paquete")
+
+    graph = defaultdict(set)
+    for key, parent, where in dependencies:
+        for ref in (key, parent):
+            if ref not in keys['subtopic']:
+                errors.append(f"{where}: subtema '{ref}' no existe en el paquete")
+        graph[key].add(parent)
+
+    cycle = find_cycle(graph)
+    if cycle:
+        errors.append("Ciclo de prerrequisitos: " + ' -> '.join(map(str, cycle)))
+
+    if errors:
+        raise CourseImportError(errors)
+    return course, rows, sorted({(key, parent) for key, parent, _ in dependencies})
+
+
+# --- Escritura ---
+
+def _insert_many(model, rows, returning=None):
+    """
+    Un INSERT multi-fila. Las filas se completan con los defaults de cada
+    columna para que todas tengan las mismas claves.
+    """
+    if not rows:
+        return []
+    columns = _editable_columns(model)
+    names = set().union(*rows)
+    defaults = {
+        name: column.default.arg if column.default is not None and column.default.is_scalar else None
+        for name, column in columns.items() if name in names
+    }
+    params = [{**defaults, **row} for row in rows]
+
+    # Sobre la tabla (Core): el INSERT masivo del ORM separa las filas con valores None
+    stmt = insert(model.__table__)
+    if returning is None:
+        db.session.execute(stmt, params)
+        return []
+    return db.session.execute(stmt.returning(returning, sort_by_parameter_order=True), params).scalars().all()
+
+
+def _load(kind, rows, ids, parent_id=None):
+    """Inserta las filas de un tipo y registra clave -> ID generado."""
+    model, parent_kind, parent_column = RECORDS[kind]
+    params = []
+    for key, parent, values, _ in rows:
+        values = dict(values)
+        values[parent_column] = ids[parent_kind][parent] if parent_kind else parent_id
+        if kind in LINKS:
+            linked_kind, linked_column = LINKS[kind]
+            values[linked_column] = ids[linked_kind][key]
+        params.append(values)
+
+    pk = next(iter(model.__table__.primary_key.columns))
+    generated = _insert_many(model, params, returning=pk if kind not in LINKS else None)
+    for (key, _, _, _), new_id in zip(rows, generated):
+        if key is not None:
+            ids[kind][key] = new_id
+    return len(params)
+
+
+def import_course(records, created_by):
+    """
+    Valida e inserta el paquete (sin commit). Devuelve el curso, el número de
+    filas por tipo y el mapa clave -> ID generado. Solo el autor del curso
+    puede importar en un curso existente (CourseImportForbidden si no).
+    """
+    course_values, rows, dependencies = plan(records)
+
+    cou_id = course_values.pop('cou_id', None)
+    if cou_id is not None:
+        course = db.session.get(Course, cou_id)
+        if course is None:
+            raise CourseImportError([f"El curso {cou_id} no existe"])
+        if str(course.cou_created_by) != str(created_by):
+            raise CourseImportForbidden(f"Solo el autor del curso {cou_id} puede importar contenido en él")
+    else:
+        course = Course(**{**course_values, 'cou_status': 'borrador', 'cou_created_by': created_by})
+        db.session.add(course)
+        db.session.flush()
+
+    ids = {kind: {} for kind in RECORDS}
+    counts = {}
+    for kind in ('domain', 'subtopic', 'exercise', 'resource'):
+        counts[kind] = _load(kind, rows[kind], ids, course.cou_id)
+
+    _insert_many(SubtopicDependency, [
+        {'sub_id': ids['subtopic'][key], 'prerequisite_id': ids['subtopic'][parent]}
+        for key, parent in dependencies
+    ])
+    counts['dependency'] = len(dependencies)
+
+    for _, _, values, _ in rows['assessment']:
+        values.setdefault('created_by', created_by)
+    counts['assessment'] = _load('assessment', rows['assessment'], ids, course.cou_id)
+    counts['assessment_exercise'] = _load('assessment_exercise', rows['assessment_exercise'], ids)
+
+    knowledge_graph.invalidate_course(course.cou_id)
+    return course, counts, {kind: mapping for kind, mapping in ids.items() if mapping}
@@ -0,0 +1,87 @@
+"""
+Motor KST del diagnóstico en memoria.
+
+Replica las reglas que aplican `submit_answer` (actualización bayesiana y
+ajuste de vecinos) y `_get_next_logic` (selección de subtema y ejercicio)
+para poder evaluarlas sin tocar la base de datos.
+"""
+import random
+from decimal import Decimal, ROUND_HALF_UP
+
+SLIP = 0.1
+GUESS = 0.2
+MASTERY_CUTOFF = Decimal('0.85')
+TARGET_MASTERY = Decimal('0.7')
+CANDIDATE_POOL = 10
+
+_PRECISION = Decimal('0.001')  # diagnostic_probability.p_mastery es NUMERIC(4, 3)
+
+
+def to_mastery(value):
+    """Redondea igual que la columna NUMERIC(4, 3)."""
+    return Decimal(str(value)).quantize(_PRECISION, rounding=ROUND_HALF_UP)
+
+
+def bkt_update(p_old, is_correct):
+    p_old = float(p_old)
+    if is_correct:
+        p_new = (p_old * (1 - SLIP)) / ((p_old * (1 - SLIP)) + ((1 - p_old) * GUESS))
+    else:
+        p_new = (p_old * SLIP) / ((p_old * SLIP) + ((1 - p_old) * (1 - GUESS)))
+    return min(max(p_new, 0.01), 0.99)
+
+
+def apply_answer(probs, prerequisites, sub_id, is_correct):
+    """
+    Devuelve una copia de `probs` ({sub_id: Decimal}) tras responder `sub_id`.
+    `prerequisites` es {sub_id: set(prerequisite_id)}.
+    """
+    updated = dict(probs)
+    updated[sub_id] = to_mastery(bkt_update(probs[sub_id], is_correct))
+
+    if is_correct:
+        # Acierto: los prerrequisitos suben un poco
+        for pre in prerequisites.get(sub_id, ()):
+            if pre in updated:
+                updated[pre] = min(updated[pre] + Decimal('0.05'), Decimal('0.95'))
+    else:
+        # Error: los temas que dependen de este bajan
+        for dependent, pres in prerequisites.items():
+            if sub_id in pres and dependent in updated:
+                updated[dependent] = max(updated[dependent] - Decimal('0.1'), Decimal('0.05'))
+
+    return updated
+
+
+def candidate_subtopics(probs, prerequisites):
+    """Subtemas no dominados cuyos prerrequisitos sí lo están, del más cercano a 0.7."""
+    candidates = [
+        sub_id for sub_id, p in probs.items()
+        if p <= MASTERY_CUTOFF and not any(
+            probs[pre] <= MASTERY_CUTOFF
+            for pre in prerequisites.get(sub_id, ())
+            if pre in probs
+        )
+    ]
+    candidates.sort(key=lambda sub_id: abs(probs[sub_id] - TARGET_MASTERY))
+    return candidates[:CANDIDATE_POOL]
+
+
+def select_exercise(probs, prerequisites, exercises, answered):
+    """
+    Elige el siguiente ejercicio o None si el diagnóstico terminó.
+    `exercises` son pares (ex_id, sub_id) activos de la evaluación y
+    `answered` el conjunto de ex_id ya respondidos.
+    """
+    candidates = candidate_subtopics(probs, prerequisites)
+    if not candidates or not exercises:
+        return None
+
+    target_sub_id = random.choice(candidates)
+    available = [(ex_id, sub_id) for ex_id, sub_id in exercises if ex_id not in answered]
+
+    # Fallback: cualquier ejercicio disponible del examen
+    pool = [ex_id for ex_id, sub_id in available if sub_id == target_sub_id] \
+        or [ex_id for ex_id, _ in available]
+
+    return random.choice(pool) if pool else None
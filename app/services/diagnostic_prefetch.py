@@ -0,0 +1,94 @@
+"""
+Precálculo especulativo de la siguiente pregunta del diagnóstico.
+
+Cuando se entrega una pregunta, un hilo en segundo plano calcula cuál sería
+la siguiente tanto si el estudiante acierta como si falla, mientras todavía
+la está leyendo. `submit_answer` solo elige la rama que corresponde.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app import db
+from app.models.diagnostic_session_model import DiagnosticSession
+from app.models.diagnostic_probability_model import DiagnosticProbability
+from app.models.diagnostic_question_log_model import DiagnosticQuestionLog
+from app.services import catalog_cache, knowledge_graph
+from app.services.diagnostic_engine import apply_answer, select_exercise
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Centinela: no hay rama precalculada y hay que calcularla en línea
+MISS = object()
+
+_branches = TTLCache(ttl=1800)
+_inflight = set()
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='diagnostic-prefetch')
+
+
+def schedule(session_id, asked_ex_id, asked_sub_id):
+    """Encola el cálculo de ambas ramas para la pregunta recién entregada."""
+    app = current_app._get_current_object()
+    if not app.config.get('DIAGNOSTIC_PREFETCH', True):
+        return
+
+    key = (session_id, asked_ex_id)
+    if key in _inflight or key in _branches:
+        return
+
+    _inflight.add(key)
+    _executor.submit(_speculate, app, session_id, asked_ex_id, asked_sub_id)
+
+
+def take(session_id, asked_ex_id, is_correct):
+    """
+    Devuelve el ex_id precalculado para el resultado dado, None si el
+    diagnóstico termina en esa rama, o MISS si no hay nada en caché.
+    """
+    branches = _branches.pop((session_id, asked_ex_id))
+    if branches is None:
+        return MISS
+    return branches[bool(is_correct)]
+
+
+def _speculate(app, session_id, asked_ex_id, asked_sub_id):
+    key = (session_id, asked_ex_id)
+    try:
+        with app.app_context():
+            session_data = db.session.get(DiagnosticSession, session_id)
+            if not session_data:
+                return
+
+            probs = dict(
+                db.session.query(DiagnosticProbability.sub_id, DiagnosticProbability.p_mastery)
+                .filter_by(session_id=session_id)
+                .all()
+            )
+            if asked_sub_id not in probs:
+                return
+
+            cou_id = knowledge_graph.get_course_id(session_data.course_instance_id)
+            prerequisites = knowledge_graph.get_course_graph(cou_id).prerequisites
+
+            answered = {
+                row.exercise_id for row in
+                db.session.query(DiagnosticQuestionLog.exercise_id)
+                .filter_by(session_id=session_id, status='answered')
+            }
+            answered.add(asked_ex_id)
+
+            exercises = catalog_cache.get_assessment_exercises(session_data.asm_id, cou_id)
+
+            branches = {
+                outcome: select_exercise(
+                    apply_answer(probs, prerequisites, asked_sub_id, outcome),
+                    prerequisites, exercises, answered
+                )
+                for outcome in (True, False)
+            }
+            _branches.set(key, branches)
+    except Exception:
+        # La especulación nunca debe afectar al flujo normal
+        logger.exception("No se pudo precalcular la siguiente pregunta de %s", session_id)
+    finally:
+        _inflight.discard(key)
@@ -0,0 +1,182 @@
+"""
+Estado del diagnóstico sin persistencia intermedia (modo stateless).
+
+El vector de maestría, los ejercicios respondidos y la pregunta pendiente
+viajan en un token firmado y comprimido entre cliente y servidor. El servidor
+solo agrega la respuesta a `diagnostic_question_log`; las probabilidades se
+materializan una única vez en `finish_diagnostic`, reproduciendo el log.
+
+El token caduca a los DIAGNOSTIC_STATE_MAX_AGE segundos y solo vale el último
+emitido: al responder se bloquea la sesión y el número de respuestas del
+token debe coincidir con el del log, así que reenviar un token anterior no
+escribe respuestas duplicadas ni permite pasar de max_questions.
+"""
+import time
+from datetime import datetime
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from flask import current_app
+from sqlalchemy import func, insert, select
+from app import db
+from app.models.diagnostic_probability_model import DiagnosticProbability
+from app.models.diagnostic_question_log_model import DiagnosticQuestionLog
+from app.models.diagnostic_session_model import DiagnosticSession
+from app.services.diagnostic_engine import apply_answer, select_exercise, to_mastery
+from app.services import catalog_cache, knowledge_graph
+
+INITIAL_MASTERY = to_mastery(0.5)
+
+
+class InvalidDiagnosticState(ValueError):
+    pass
+
+
+class StaleDiagnosticState(InvalidDiagnosticState):
+    """Token válido pero superado: ya se respondió con él o la sesión no sigue en curso."""
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='diagnostic-state')
+
+
+def encode_state(state):
+    """Serializa el estado; las probabilidades viajan como milésimas enteras."""
+    payload = dict(state)
+    payload['p'] = [[sub_id, int(p * 1000)] for sub_id, p in state['p'].items()]
+    return _serializer().dumps(payload)
+
+
+def decode_state(token, session_id, user_id):
+    try:
+        payload = _serializer().loads(token, max_age=current_app.config['DIAGNOSTIC_STATE_MAX_AGE'])
+    except SignatureExpired:
+        raise InvalidDiagnosticState("El token de estado ha caducado")
+    except BadSignature:
+        raise InvalidDiagnosticState("Token de estado inválido")
+
+    if payload.get('sid') != str(session_id) or payload.get('u') != str(user_id):
+        raise InvalidDiagnosticState("El token no corresponde a esta sesión")
+
+    payload['p'] = {sub_id: to_mastery(milli / 1000) for sub_id, milli in payload['p']}
+    return payload
+
+
+def initial_state(session, user_id, cou_id, sub_ids):
+    return {
+        'sid': str(session.session_id),
+        'u': str(user_id),
+        'asm': session.asm_id,
+        'cou': cou_id,
+        'm': session.max_questions,
+        'n': 0,
+        'p': {sub_id: INITIAL_MASTERY for sub_id in sub_ids},
+        'a': [],
+        'q': None,
+    }
+
+
+def next_question(state):
+    """
+    Fija la pregunta pendiente del estado (si no la hay) y devuelve su ex_id,
+    o None si el diagnóstico terminó. No escribe en la base de datos.
+    """
+    if state['q']:
+        return state['q'][0]
+    if state['n'] >= state['m']:
+        return None
+
+    graph = knowledge_graph.get_course_graph(state['cou'])
+    exercises = catalog_cache.get_assessment_exercises(state['asm'], state['cou'])
+    ex_id = select_exercise(state['p'], graph.prerequisites, exercises, set(state['a']))
+    if ex_id is None:
+        return None
+
+    sub_id = dict(exercises)[ex_id]
+    state['q'] = [ex_id, sub_id, int(time.time())]
+    return ex_id
+
+
+def lock_current(state, session_id):
+    """
+    Bloquea la sesión hasta el commit y comprueba que el token es el último
+    emitido: sesión en curso, mismo número de respuestas que el log y
+    max_questions sin alcanzar. Lanza StaleDiagnosticState si no.
+    """
+    session = db.session.execute(
+        select(DiagnosticSession)
+        .where(DiagnosticSession.session_id == session_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).scalar_one_or_none()
+    if session is None or session.status != 'IN_PROGRESS':
+        raise StaleDiagnosticState("La sesión no está en curso")
+
+    answered = db.session.scalar(
+        select(func.count())
+        .select_from(DiagnosticQuestionLog)
+        .where(DiagnosticQuestionLog.session_id == session_id, DiagnosticQuestionLog.status == 'answered')
+    )
+    if state['n'] != answered:
+        raise StaleDiagnosticState("El token no es el último emitido para esta sesión")
+    if answered >= session.max_questions:
+        raise StaleDiagnosticState("Se alcanzó el número máximo de preguntas")
+
+
+def record_answer(state, session_id, exercise, student_answer, is_correct):
+    """Agrega la respuesta al log (única escritura) y actualiza el estado en memoria."""
+    _, sub_id, asked_ts = state['q']
+    db.session.add(DiagnosticQuestionLog(
+        session_id=session_id,
+        sub_id=sub_id,
+        exercise_id=exercise.ex_id,
+        status='answered',
+        asked_at=datetime.utcfromtimestamp(asked_ts),
+        answered_at=datetime.utcnow(),
+        student_answer=student_answer,
+        is_correct=is_correct
+    ))
+
+    graph = knowledge_graph.get_course_graph(state['cou'])
+    if sub_id in state['p']:
+        state['p'] = apply_answer(state['p'], graph.prerequisites, sub_id, is_correct)
+    state['a'].append(exercise.ex_id)
+    state['n'] += 1
+    state['q'] = None
+
+
+def replay(session_id, cou_id):
+    """Reconstruye las probabilidades y el número de respuestas a partir del log."""
+    graph = knowledge_graph.get_course_graph(cou_id)
+    probs = {sub_id: INITIAL_MASTERY for sub_id in graph.sub_ids}
+
+    logs = DiagnosticQuestionLog.query.filter_by(session_id=session_id, status='answered')\
+        .order_by(DiagnosticQuestionLog.log_id)\
+        .all()
+    for log in logs:
+        if log.sub_id in probs:
+            probs = apply_answer(probs, graph.prerequisites, log.sub_id, bool(log.is_correct))
+
+    return probs, len(logs)
+
+
+def materialize(session_data, cou_id, token, user_id):
+    """
+    Escribe de una vez las probabilidades de una sesión stateless. El token
+    final es obligatorio y debe coincidir con la reproducción del log.
+    """
+    if not token:
+        raise InvalidDiagnosticState("Falta el token final de la sesión")
+    probs, answered = replay(session_data.session_id, cou_id)
+
+    state = decode_state(token, session_data.session_id, user_id)
+    if state['n'] != answered or state['p'] != probs:
+        raise InvalidDiagnosticState("El estado del cliente no coincide con el registro de respuestas")
+
+    if probs:
+        db.session.execute(
+            insert(DiagnosticProbability),
+            [
+                {"session_id": session_data.session_id, "sub_id": sub_id, "p_mastery": p}
+                for sub_id, p in probs.items()
+            ]
+        )
+    session_data.current_question_count = answered
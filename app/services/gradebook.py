@@ -0,0 +1,124 @@
+"""
+Libro de calificaciones de una instancia de curso.
+
+Una fila por matrícula con los datos del alumno, el nivel de dominio (SKS)
+de cada subtema, el mejor resultado y número de intentos de cada
+evaluación y su rendimiento semanal. Todo sale de una única consulta
+(subconsultas LATERAL que agregan a JSON por matrícula) pensada para leerse
+con cursor de servidor; solo la lista de subtemas y evaluaciones, que da
+las columnas del CSV, va en una consulta previa.
+"""
+from sqlalchemy import text
+from app import db
+from app.models.assessment_model import Assessment
+from app.models.domain_model import Domain
+from app.models.subtopic_model import Subtopic
+
+ROWS = text("""
+    SELECT e.enr_id, u.usr_id, u.usr_first_name, u.usr_last_name, u.usr_email,
+           e.enr_status, e.enr_progress, e.enr_date, e.last_accessed_at,
+           COALESCE(m.mastery, '{}') AS mastery,
+           COALESCE(a.assessments, '{}') AS assessments,
+           COALESCE(w.weekly, '[]') AS weekly
+    FROM enrollment e
+    JOIN users u ON u.usr_id = e.usr_id
+    LEFT JOIN LATERAL (
+        SELECT jsonb_object_agg(sks.sub_id, sks.mastery_level) AS mastery
+        FROM student_knowledge_state sks
+        WHERE sks.enr_id = e.enr_id
+    ) m ON true
+    LEFT JOIN LATERAL (
+        SELECT jsonb_object_agg(x.asm_id, jsonb_build_object(
+                   'attempts', x.attempts, 'best_score', x.best_score, 'passed', x.passed)) AS assessments
+        FROM (
+            SELECT aa.asm_id, count(*) AS attempts, max(aa.score) AS best_score, bool_or(aa.is_passed) AS passed
+            FROM assessment_attempt aa
+            WHERE aa.enr_id = e.enr_id
+            GROUP BY aa.asm_id
+        ) x
+    ) a ON true
+    LEFT JOIN LATERAL (
+        SELECT jsonb_agg(jsonb_build_object(
+                   'week', p.week_start, 'score', p.swp_score,
+                   'exercises', p.swp_completed_exercises, 'correct', p.swp_correct_attempts
+               ) ORDER BY p.week_start) AS weekly
+        FROM student_weekly_performance p
+        WHERE p.enr_id = e.enr_id
+    ) w ON true
+    WHERE e.coi_id = :coi_id
+    ORDER BY u.usr_last_name, u.usr_first_name, e.enr_id
+""")
+
+STUDENT_COLUMNS = [
+    'enr_id', 'usr_id', 'usr_first_name', 'usr_last_name', 'usr_email',
+    'enr_status', 'enr_progress', 'enr_date', 'last_accessed_at',
+]
+WEEKLY_COLUMNS = ['weeks', 'avg_weekly_score', 'last_week_score', 'completed_exercises', 'correct_attempts']
+
+
+def course_items(cou_id):
+    """Subtemas y evaluaciones del curso, en el orden de las columnas."""
+    subtopics = db.session.execute(
+        db.select(Subtopic.sub_id, Subtopic.sub_name)
+        .join(Domain, Domain.dom_id == Subtopic.dom_id)
+        .where(Domain.cou_id == cou_id)
+        .order_by(Domain.dom_id, Subtopic.sub_id)
+    ).all()
+    assessments = db.session.execute(
+        db.select(Assessment.asm_id, Assessment.asm_title)
+        .where(Assessment.cou_id == cou_id)
+        .order_by(Assessment.asm_id)
+    ).all()
+    return subtopics, assessments
+
+
+def csv_columns(subtopics, assessments):
+    columns = STUDENT_COLUMNS + ['mastered_subtopics']
+    columns += [f"{sub.sub_name} [{sub.sub_id}]" for sub in subtopics]
+    for asm in assessments:
+        columns += [f"{asm.asm_title} [{asm.asm_id}] best_score", f"{asm.asm_title} [{asm.asm_id}] attempts"]
+    return columns + WEEKLY_COLUMNS
+
+
+def _weekly_summary(weekly):
+    scores = [week['score'] for week in weekly if week['score'] is not None]
+    return [
+        len(weekly),
+        round(sum(scores) / len(scores), 2) if scores else None,
+        weekly[-1]['score'] if weekly else None,
+        sum(week['exercises'] or 0 for week in weekly),
+        sum(week['correct'] or 0 for week in weekly),
+    ]
+
+
+def csv_records(rows, subtopics, assessments):
+    """Filas planas en el orden de csv_columns."""
+    for row in rows:
+        # Las claves de jsonb_object_agg llegan como texto
+        mastery, results = row.mastery, row.assessments
+        record = [getattr(row, column) for column in STUDENT_COLUMNS]
+        record.append(sum(1 for level in mastery.values() if level == 'dominado'))
+        record += [mastery.get(str(sub.sub_id), '') for sub in subtopics]
+        for asm in assessments:
+            result = results.get(str(asm.asm_id)) or {}
+            record += [result.get('best_score'), result.get('attempts', 0)]
+        yield record + _weekly_summary(row.weekly)
+
+
+def ndjson_records(rows, subtopics, assessments):
+    """Un objeto anidado por matrícula."""
+    for row in rows:
+        mastery, results = row.mastery, row.assessments
+        yield {
+            **{column: getattr(row, column) for column in STUDENT_COLUMNS},
+            'mastery': [
+                {'sub_id': sub.sub_id, 'sub_name': sub.sub_name, 'mastery_level': mastery.get(str(sub.sub_id))}
+                for sub in subtopics
+            ],
+            'assessments': [
+                {'asm_id': asm.asm_id, 'asm_title': asm.asm_title, 'attempts': 0, 'best_score': None, 'passed': False,
+                 **(results.get(str(asm.asm_id)) or {})}
+                for asm in assessments
+            ],
+            'weekly': row.weekly,
+        }
@@ -0,0 +1,145 @@
+"""
+Grafo de prerrequisitos por curso, cacheado en memoria.
+
+Cada subtema recibe una posición de bit; los prerrequisitos de un subtema se
+guardan como una máscara entera, de modo que "¿le falta algún prerrequisito?"
+se resuelve con un AND contra la máscara de subtemas dominados.
+
+Cada worker guarda el grafo junto con `cou_content_version`, que suben los
+triggers de la base de datos al cambiar dominios, subtemas o prerrequisitos:
+un cambio hecho desde cualquier worker invalida el grafo en todos. La
+versión se lee una vez por petición.
+"""
+from flask import g
+from app import db
+from app.models.course_model import Course
+from app.models.course_instance_model import CourseInstance
+from app.models.domain_model import Domain
+from app.models.subtopic_model import Subtopic
+from app.models.subtopic_dependency_model import SubtopicDependency
+from app.utils.cache import TTLCache
+
+_graphs = TTLCache(ttl=600)
+_instances = TTLCache(ttl=600)
+
+
+class CourseGraph:
+
+    def __init__(self, cou_id, subtopics, names, edges, version=None):
+        self.cou_id = cou_id
+        self.version = version
+        # (sub_id, sub_name, dom_id, dom_name) ordenados por dominio y subtema
+        self.subtopics = subtopics
+        self.sub_ids = [row[0] for row in subtopics]
+
+        # Los prerrequisitos pueden pertenecer a otro curso: también llevan bit
+        self.names = names
+        self.bit = {sub_id: i for i, sub_id in enumerate(names)}
+
+        self.prerequisites = {}
+        self.prereq_mask = {sub_id: 0 for sub_id in self.sub_ids}
+        for sub_id, prerequisite_id in edges:
+            self.prerequisites.setdefault(sub_id, set()).add(prerequisite_id)
+            self.prereq_mask[sub_id] |= 1 << self.bit[prerequisite_id]
+
+    def mask(self, sub_ids):
+        mask = 0
+        for sub_id in sub_ids:
+            if sub_id in self.bit:
+                mask |= 1 << self.bit[sub_id]
+        return mask
+
+    def names_in(self, mask):
+        return [name for sub_id, name in self.names.items() if mask >> self.bit[sub_id] & 1]
+
+
+def _build(cou_id):
+    # La versión sale en la misma lectura que los subtemas: el grafo y su versión son coherentes
+    rows = db.session.query(Subtopic.sub_id, Subtopic.sub_name, Domain.dom_id, Domain.dom_name, Course.cou_content_version)\
+        .join(Domain, Subtopic.dom_id == Domain.dom_id)\
+        .join(Course, Course.cou_id == Domain.cou_id)\
+        .filter(Domain.cou_id == cou_id)\
+        .order_by(Domain.dom_id, Subtopic.sub_id)\
+        .all()
+    if rows:
+        version = _remember_version(cou_id, rows[0].cou_content_version)
+    else:
+        version = content_version(cou_id)
+    subtopics = [tuple(row)[:4] for row in rows]
+    sub_ids = [row[0] for row in subtopics]
+
+    edges = db.session.query(SubtopicDependency.sub_id, SubtopicDependency.prerequisite_id, Subtopic.sub_name)\
+        .join(Subtopic, Subtopic.sub_id == SubtopicDependency.prerequisite_id)\
+        .filter(SubtopicDependency.sub_id.in_(sub_ids))\
+        .order_by(SubtopicDependency.prerequisite_id)\
+        .all()
+
+    names = {row[0]: row[1] for row in subtopics}
+    for row in edges:
+        names.setdefault(row.prerequisite_id, row.sub_name)
+
+    return CourseGraph(
+        cou_id,
+        subtopics,
+        names,
+        [(row.sub_id, row.prerequisite_id) for row in edges],
+        version
+    )
+
+
+def _remember_version(cou_id, version):
+    g.setdefault('course_content_versions', {})[cou_id] = version
+    return version
+
+
+def content_version(cou_id):
+    """cou_content_version del curso, memorizada durante la petición."""
+    versions = g.setdefault('course_content_versions', {})
+    if cou_id not in versions:
+        versions[cou_id] = db.session.query(Course.cou_content_version).filter_by(cou_id=cou_id).scalar()
+    return versions[cou_id]
+
+
+def get_course_graph(cou_id):
+    graph = _graphs.get(cou_id)
+    if graph is None or graph.version != content_version(cou_id):
+        graph = _build(cou_id)
+        _graphs.set(cou_id, graph)
+    return graph
+
+
+def get_course_id(coi_id):
+    """cou_id de una instancia de curso (None si no existe)."""
+    cou_id = _instances.get(coi_id)
+    if cou_id is None:
+        cou_id = db.session.query(CourseInstance.cou_id).filter_by(coi_id=coi_id).scalar()
+        if cou_id is not None:
+            _instances.set(coi_id, cou_id)
+    return cou_id
+
+
+def prime_course_ids(rows):
+    """Carga de golpe pares (coi_id, cou_id) ya consultados."""
+    for coi_id, cou_id in rows:
+        _instances.set(coi_id, cou_id)
+
+
+def invalidate_course(cou_id=None):
+    """
+    Descarta el grafo de un curso (o todos si no se sabe cuál cambió) en este
+    worker y olvida la versión leída en la petición; los demás workers lo
+    detectan por cou_content_version.
+    """
+    versions = g.get('course_content_versions')
+    if cou_id is None:
+        _graphs.clear()
+        if versions:
+            versions.clear()
+    else:
+        _graphs.delete(cou_id)
+        if versions:
+            versions.pop(cou_id, None)
+
+
+def cached_courses():
+    return len(_graphs)
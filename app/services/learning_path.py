@@ -0,0 +1,35 @@
+"""
+Ruta de aprendizaje de una matrícula (estado y bloqueo de cada subtema).
+
+Se calcula en memoria con el grafo cacheado del curso y una sola consulta
+al SKS del estudiante. No se cachea por matrícula: comprobar que el SKS no
+cambió costaría la misma consulta, y el cálculo sobre las máscaras del grafo
+es trivial.
+"""
+from app import db
+from app.models.student_knowledge_state_model import StudentKnowledgeState
+from app.services import knowledge_graph
+
+
+def get_topics(enr_id, cou_id):
+    graph = knowledge_graph.get_course_graph(cou_id)
+
+    levels = dict(
+        db.session.query(StudentKnowledgeState.sub_id, StudentKnowledgeState.mastery_level)
+        .filter_by(enr_id=enr_id)
+        .all()
+    )
+    mastered = graph.mask(sub_id for sub_id, level in levels.items() if level == 'dominado')
+
+    topics = []
+    for sub_id, sub_name, _, dom_name in graph.subtopics:
+        missing = graph.prereq_mask[sub_id] & ~mastered
+        topics.append({
+            "id": sub_id,
+            "name": sub_name,
+            "domain_name": dom_name,
+            "status": levels.get(sub_id, 'no_dominado'),
+            "is_locked": bool(missing),
+            "prerequisites": ", ".join(graph.names_in(missing)) or None
+        })
+    return topics
@@ -0,0 +1,57 @@
+"""
+Hash de contraseñas en paralelo para altas masivas.
+
+bcrypt libera el GIL mientras calcula, así que dentro de un worker de
+gunicorn basta un pool de hilos para repartir los hashes entre núcleos (no
+conviene crear procesos ahí). Los comandos de CLI pueden pedir un pool de
+procesos. El resultado es el mismo formato que produce flask_bcrypt ($2b$,
+BCRYPT_LOG_ROUNDS), por lo que el login lo valida igual.
+"""
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+import bcrypt
+from flask import current_app
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds, prefix=b'2b')).decode('utf-8')
+
+
+def generate_password(length=12):
+    return secrets.token_urlsafe(length)[:length]
+
+
+def _workers():
+    return current_app.config.get('PASSWORD_HASH_WORKERS') or min(4, os.cpu_count() or 1)
+
+
+@contextmanager
+def hashing_pool(processes=False):
+    """
+    Pool reutilizable entre lotes. Devuelve una función que recibe una
+    lista de contraseñas y devuelve sus hashes en el mismo orden.
+    """
+    hash_one = partial(_hash, rounds=current_app.config.get('BCRYPT_LOG_ROUNDS', 12))
+    workers = _workers()
+    if workers <= 1:
+        yield lambda passwords: [hash_one(password) for password in passwords]
+        return
+
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor(max_workers=workers) as pool:
+        # chunksize solo lo usa el pool de procesos: menos viajes entre procesos
+        yield lambda passwords: list(pool.map(hash_one, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def hash_passwords(passwords):
+    """Hashes en el mismo orden que `passwords`."""
+    passwords = list(passwords)
+    if not passwords:
+        return []
+    if len(passwords) == 1:
+        return [_hash(passwords[0], current_app.config.get('BCRYPT_LOG_ROUNDS', 12))]
+    with hashing_pool() as hash_many:
+        return hash_many(passwords)
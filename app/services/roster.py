@@ -0,0 +1,247 @@
+"""
+Matrícula masiva de una lista de alumnos en una instancia de curso.
+
+Las reglas de matrícula viven en la función SQL
+public.enroll_student_by_code, la misma que usa POST /api/enrollments/. En
+vez de llamarla una vez por alumno (una petición y un commit cada uno), se
+llama para todo el roster en una sola sentencia sobre unnest(:ids). Si
+alguna fila viola una regla la sentencia entera falla; solo entonces se
+repite fila a fila, cada una en su savepoint, para saber cuál falló y
+matricular al resto.
+
+Opcionalmente crea las cuentas que no existen (hash de contraseñas en
+paralelo e INSERT multi-fila).
+"""
+from flask import current_app
+from marshmallow import ValidationError, validate
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+from app import db
+from app.models.course_instance_model import CourseInstance
+from app.models.enrollment_model import Enrollment
+from app.models.role_model import Role
+from app.models.user_model import User
+from app.services import password_hashing
+
+_ENROLL_ALL = text(
+    "SELECT r.usr_id, public.enroll_student_by_code(r.usr_id, :code) AS enr_id "
+    "FROM unnest(CAST(:ids AS integer[])) WITH ORDINALITY AS r(usr_id, ord) "
+    "ORDER BY r.ord"
+).execution_options(writes=True)
+_ENROLL_ONE = text("SELECT public.enroll_student_by_code(:usr_id, :code)").execution_options(writes=True)
+
+_is_email = validate.Email()
+
+
+class RosterError(ValueError):
+    pass
+
+
+class RosterTooLarge(RosterError):
+    """Hay que crear más cuentas de las permitidas en una petición."""
+
+
+def function_error(e, default="Error al inscribirse"):
+    """Mensaje legible de un RAISE EXCEPTION de la función SQL."""
+    raw_error = str(e.orig) if hasattr(e, 'orig') else str(e)
+    pgcode = getattr(getattr(e, 'orig', None), 'pgcode', None)
+    if pgcode == 'P0001' or "RAISE EXCEPTION" in raw_error or "P0001" in raw_error:
+        return raw_error.split('\n')[0].replace('P0001:', '').strip()
+    return default
+
+
+def _parse(entry):
+    """(usr_id, email, datos de alta) de un elemento del roster."""
+    if isinstance(entry, int) and not isinstance(entry, bool):
+        return entry, None, None
+    if isinstance(entry, str):
+        entry = {'usr_email': entry}
+    if not isinstance(entry, dict):
+        raise RosterError("Cada alumno debe ser un ID, un email o un objeto")
+    if entry.get('usr_id') is not None:
+        if not isinstance(entry['usr_id'], int) or isinstance(entry['usr_id'], bool):
+            raise RosterError("usr_id debe ser entero")
+        return entry['usr_id'], None, None
+
+    email = entry.get('usr_email')
+    if not isinstance(email, str):
+        raise RosterError("Falta usr_id o usr_email")
+    email = email.strip().lower()
+    try:
+        _is_email(email)
+    except ValidationError:
+        raise RosterError("Email inválido")
+    return None, email, entry
+
+
+def _new_account(email, entry):
+    """Fila de users para un alta, o RosterError si faltan datos."""
+    first_name = (entry.get('usr_first_name') or '').strip()
+    last_name = (entry.get('usr_last_name') or '').strip()
+    if not first_name or not last_name:
+        raise RosterError("Usuario no encontrado; para crearlo hacen falta usr_first_name y usr_last_name")
+    return {
+        'usr_first_name': first_name[:50],
+        'usr_last_name': last_name[:50],
+        'usr_email': email,
+        'usr_password': entry.get('usr_password'),
+    }
+
+
+def _create_accounts(accounts):
+    """
+    Inserta las cuentas nuevas en una sentencia. Devuelve
+    {email: (usr_id, contraseña generada o None)}.
+    """
+    rol_id = db.session.scalar(
+        db.select(Role.rol_id).where(Role.rol_name == current_app.config['ROSTER_STUDENT_ROLE'])
+    )
+    if rol_id is None:
+        raise RosterError(f"No existe el rol {current_app.config['ROSTER_STUDENT_ROLE']}")
+
+    generated = {}
+    for account in accounts:
+        if not account['usr_password']:
+            generated[account['usr_email']] = account['usr_password'] = password_hashing.generate_password()
+    hashes = password_hashing.hash_passwords(account['usr_password'] for account in accounts)
+
+    rows = [
+        {**account, 'usr_password': hashed, 'rol_id': rol_id, 'usr_status': 'activo'}
+        for account, hashed in zip(accounts, hashes)
+    ]
+    # Un alta concurrente con el mismo email (sin distinguir mayúsculas; índice
+    # uq_users_email_lower) no tumba el lote: esa fila no vuelve en RETURNING
+    stmt = pg_insert(User).values(rows).on_conflict_do_nothing(index_elements=[func.lower(User.usr_email)])\
+        .returning(User.usr_id, User.usr_email)
+    return {
+        row.usr_email: (row.usr_id, generated.get(row.usr_email))
+        for row in db.session.execute(stmt)
+    }
+
+
+def _enroll(code, usr_ids):
+    """
+    Matricula `usr_ids` con la función SQL. Devuelve ({usr_id: enr_id}, {usr_id: error}).
+    """
+    if not usr_ids:
+        return {}, {}
+    try:
+        with db.session.begin_nested():
+            rows = db.session.execute(_ENROLL_ALL, {'ids': usr_ids, 'code': code}).all()
+        return {row.usr_id: row.enr_id for row in rows}, {}
+    except DBAPIError:
+        pass
+
+    # Alguna fila incumple las reglas: se atribuye el error fila a fila
+    enrolled, errors = {}, {}
+    for usr_id in usr_ids:
+        try:
+            with db.session.begin_nested():
+                enrolled[usr_id] = db.session.execute(_ENROLL_ONE, {'usr_id': usr_id, 'code': code}).scalar()
+        except DBAPIError as e:
+            errors[usr_id] = function_error(e)
+    return enrolled, errors
+
+
+def enroll_roster(coi_id, students, create_missing=False, max_new_accounts=None):
+    """
+    Matricula el roster en la instancia `coi_id` (sin commit). `students` es
+    una lista de IDs, emails u objetos {usr_email, usr_first_name,
+    usr_last_name, usr_password?}. Devuelve un resultado por elemento, en
+    orden, con status enrolled, created_and_enrolled, already_enrolled,
+    duplicate, not_found o error. Con `max_new_accounts` lanza
+    RosterTooLarge, antes de calcular ningún hash, si hay que crear más
+    cuentas.
+    """
+    instance = db.session.get(CourseInstance, coi_id)
+    if instance is None:
+        raise RosterError(f"La instancia {coi_id} no existe")
+
+    results = [None] * len(students)
+    parsed = []
+    for index, entry in enumerate(students):
+        try:
+            parsed.append((index, *_parse(entry)))
+        except RosterError as e:
+            results[index] = {'index': index, 'status': 'error', 'error': str(e)}
+
+    # 1. Resolver IDs y emails en una sola consulta
+    ids = {usr_id for _, usr_id, _, _ in parsed if usr_id is not None}
+    emails = {email for _, _, email, _ in parsed if email is not None}
+    found = {}
+    if ids or emails:
+        users = db.session.execute(
+            db.select(User.usr_id, User.usr_email).where(
+                User.usr_id.in_(ids) | func.lower(User.usr_email).in_(emails)
+            )
+        ).all()
+        found = {row.usr_id: row.usr_id for row in users}
+        found.update({row.usr_email.lower(): row.usr_id for row in users})
+
+    # 2. Altas de las cuentas que faltan
+    accounts = {}
+    for index, usr_id, email, entry in parsed:
+        key = usr_id if usr_id is not None else email
+        if key in found:
+            continue
+        if not create_missing or email is None:
+            results[index] = {'index': index, 'status': 'not_found', 'error': 'Usuario no encontrado'}
+            continue
+        try:
+            accounts.setdefault(email, _new_account(email, entry))
+        except RosterError as e:
+            results[index] = {'index': index, 'status': 'not_found', 'error': str(e)}
+
+    if max_new_accounts is not None and len(accounts) > max_new_accounts:
+        raise RosterTooLarge(f"Máximo {max_new_accounts} cuentas nuevas por petición ({len(accounts)} solicitadas)")
+    created = _create_accounts(list(accounts.values())) if accounts else {}
+    for email, (usr_id, _) in created.items():
+        found[email] = usr_id
+
+    # 3. Quién ya está matriculado y quién se repite en el roster
+    resolved = []
+    for index, usr_id, email, _ in parsed:
+        if results[index] is None:
+            key = usr_id if usr_id is not None else email
+            if key in found:
+                resolved.append((index, found[key], email))
+            else:
+                results[index] = {'index': index, 'status': 'error', 'error': 'El email ya está registrado'}
+
+    already = {}
+    if resolved:
+        already = dict(db.session.execute(
+            db.select(Enrollment.usr_id, Enrollment.enr_id).where(
+                Enrollment.coi_id == coi_id,
+                Enrollment.usr_id.in_({usr_id for _, usr_id, _ in resolved})
+            )
+        ).all())
+
+    pending, seen = [], set()
+    for index, usr_id, email in resolved:
+        if usr_id in already:
+            results[index] = {'index': index, 'status': 'already_enrolled', 'usr_id': usr_id, 'enr_id': already[usr_id]}
+        elif usr_id in seen:
+            results[index] = {'index': index, 'status': 'duplicate', 'usr_id': usr_id}
+        else:
+            seen.add(usr_id)
+            pending.append((index, usr_id, email))
+
+    # 4. Una sentencia para todo el roster
+    enrolled, errors = _enroll(instance.coi_ins_code, [usr_id for _, usr_id, _ in pending])
+    for index, usr_id, email in pending:
+        is_new = email in created and created[email][0] == usr_id
+        if usr_id in errors:
+            result = {'index': index, 'status': 'error', 'usr_id': usr_id, 'error': errors[usr_id]}
+        else:
+            status = 'created_and_enrolled' if is_new else 'enrolled'
+            result = {'index': index, 'status': status, 'usr_id': usr_id, 'enr_id': enrolled[usr_id]}
+        # La cuenta se crea aunque la matrícula falle: la contraseña generada se devuelve igual
+        if is_new:
+            result['created'] = True
+            if created[email][1]:
+                result['temporary_password'] = created[email][1]
+        results[index] = result
+
+    return instance, results
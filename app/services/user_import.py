@@ -0,0 +1,162 @@
+"""
+Alta masiva de usuarios desde un CSV.
+
+El fichero se lee en streaming y se procesa por lotes: se valida cada fila,
+se descartan los emails que ya existen (la lista de emails en minúsculas se
+carga una sola vez) o que se repiten en el propio fichero, se calculan los
+hashes bcrypt en paralelo y cada lote entra con un COPY ... FROM STDIN.
+Nada se confirma hasta el final: el llamante hace commit o rollback.
+
+Columnas: usr_email, usr_first_name, usr_last_name (obligatorias),
+usr_password (si falta se genera una temporal), rol_id o rol_name (por
+defecto ROSTER_STUDENT_ROLE) y usr_status (por defecto 'activo').
+"""
+import csv
+import io
+from flask import current_app
+from marshmallow import ValidationError, validate
+from sqlalchemy import func
+from app import db
+from app.models.role_model import Role
+from app.models.user_model import User
+from app.services import password_hashing
+
+REQUIRED = ('usr_email', 'usr_first_name', 'usr_last_name')
+COPY_COLUMNS = ('usr_first_name', 'usr_last_name', 'usr_email', 'usr_password', 'rol_id', 'usr_status')
+STATUSES = ('activo', 'inactivo', 'pendiente')
+
+_is_email = validate.Email()
+
+
+class UserImportError(ValueError):
+    pass
+
+
+class UserImportTooLarge(UserImportError):
+    """El fichero tiene más cuentas nuevas que `max_rows`."""
+
+
+def read_rows(lines):
+    """(número de línea, fila) de un CSV con cabecera."""
+    reader = csv.DictReader(lines)
+    missing = [column for column in REQUIRED if column not in (reader.fieldnames or ())]
+    if missing:
+        raise UserImportError(f"Faltan columnas en la cabecera: {', '.join(missing)}")
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _text(row, column, max_length):
+    value = (row.get(column) or '').strip()
+    if not value:
+        raise UserImportError(f"{column} es obligatorio")
+    if len(value) > max_length:
+        raise UserImportError(f"{column} supera {max_length} caracteres")
+    return value
+
+
+def _validate(row, roles, default_rol):
+    """Fila para COPY (sin hash todavía) o UserImportError."""
+    email = _text(row, 'usr_email', 120)
+    try:
+        _is_email(email)
+    except ValidationError:
+        raise UserImportError("Email inválido")
+
+    rol_id = default_rol
+    if (row.get('rol_id') or '').strip():
+        try:
+            rol_id = int(row['rol_id'])
+        except ValueError:
+            raise UserImportError("rol_id debe ser entero")
+        if rol_id not in roles.values():
+            raise UserImportError(f"El rol {rol_id} no existe")
+    elif (row.get('rol_name') or '').strip():
+        rol_id = roles.get(row['rol_name'].strip())
+        if rol_id is None:
+            raise UserImportError(f"El rol {row['rol_name'].strip()} no existe")
+    if rol_id is None:
+        raise UserImportError("Falta el rol y no existe el rol por defecto")
+
+    status = (row.get('usr_status') or '').strip() or 'activo'
+    if status not in STATUSES:
+        raise UserImportError(f"usr_status debe ser uno de: {', '.join(STATUSES)}")
+
+    return {
+        'usr_first_name': _text(row, 'usr_first_name', 50),
+        'usr_last_name': _text(row, 'usr_last_name', 50),
+        'usr_email': email,
+        'usr_password': row.get('usr_password') or None,
+        'rol_id': rol_id,
+        'usr_status': status,
+    }
+
+
+def _copy(rows):
+    """COPY del lote por el cursor psycopg2 de la conexión de la sesión."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[column] for column in COPY_COLUMNS])
+    buffer.seek(0)
+
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY users ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def import_users(lines, processes=False, batch_size=None, max_rows=None):
+    """
+    Importa los usuarios de `lines` (sin commit). Devuelve
+    {inserted, duplicates, invalid, errors, credentials}; `credentials`
+    lleva las contraseñas generadas, que no se vuelven a mostrar. Con
+    `max_rows` lanza UserImportTooLarge en cuanto haya más cuentas nuevas
+    (cada una cuesta un hash bcrypt).
+    """
+    batch_size = batch_size or current_app.config['USER_IMPORT_BATCH_SIZE']
+    roles = dict(db.session.execute(db.select(Role.rol_name, Role.rol_id)).all())
+    default_rol = roles.get(current_app.config['ROSTER_STUDENT_ROLE'])
+    # Una sola consulta para la unicidad sin distinguir mayúsculas
+    seen = set(db.session.scalars(db.select(func.lower(User.usr_email))))
+
+    summary = {'inserted': 0, 'duplicates': 0, 'invalid': 0, 'errors': [], 'credentials': []}
+
+    with password_hashing.hashing_pool(processes) as hash_many:
+        def flush(batch):
+            for row in batch:
+                if row['usr_password'] is None:
+                    row['usr_password'] = password_hashing.generate_password()
+                    summary['credentials'].append({'usr_email': row['usr_email'], 'usr_password': row['usr_password']})
+            for row, hashed in zip(batch, hash_many([row['usr_password'] for row in batch])):
+                row['usr_password'] = hashed
+            _copy(batch)
+            summary['inserted'] += len(batch)
+
+        batch = []
+        for line, raw in read_rows(lines):
+            try:
+                row = _validate(raw, roles, default_rol)
+            except UserImportError as e:
+                summary['invalid'] += 1
+                summary['errors'].append({'line': line, 'usr_email': raw.get('usr_email'), 'error': str(e)})
+                continue
+
+            email_lower = row['usr_email'].lower()
+            if email_lower in seen:
+                summary['duplicates'] += 1
+                summary['errors'].append({'line': line, 'usr_email': row['usr_email'], 'error': 'El correo ya está registrado'})
+                continue
+            seen.add(email_lower)
+
+            if max_rows is not None and summary['inserted'] + len(batch) >= max_rows:
+                raise UserImportTooLarge(f"El fichero supera las {max_rows} cuentas nuevas por petición")
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+    return summary
@@ -0,0 +1,155 @@
+"""
+Enrutado de lecturas a réplicas con lectura de las propias escrituras.
+
+Las vistas marcadas con `@replica_read` envían sus SELECT a una de las
+réplicas de SQLALCHEMY_REPLICA_URIS (binds `replica_<n>`). Las escrituras,
+los flush y el texto SQL que no empieza por SELECT/WITH van siempre al
+primario. Un SELECT que escribe a través de una función SQL (p. ej.
+`SELECT public.enroll_student_by_code(...)`) debe marcarse con
+`.execution_options(writes=True)`; por si acaso, el texto que llama a una
+función calificada por esquema tampoco se considera lectura.
+
+Cuando una petición confirma escrituras, ese usuario queda fijado al
+primario durante REPLICA_STICKY_SECONDS. La marca viaja al cliente, que es
+lo único que comparten todos los workers:
+
+- la cabecera `X-DB-Primary-Until` (instante Unix), que el cliente devuelve
+  tal cual en sus siguientes peticiones; es la vía para un frontend en otro
+  origen, que no envía cookies (CORS sin credenciales);
+- la cookie `db_primary_until`, para clientes del mismo origen;
+- y, en el worker que atendió la escritura, la memoria por usuario del JWT.
+
+Los valores que no son un número o que caen más allá de la ventana se
+ignoran, así que un cliente no puede quedarse fijado al primario. La
+respuesta indica la ruta elegida en `X-DB-Route`.
+
+Para probarlo en local basta con poner como réplica la misma URL que el
+primario, o un segundo Postgres.
+"""
+import functools
+import itertools
+import math
+import re
+import time
+from flask import current_app, g, request, has_request_context
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.elements import TextClause
+from app.utils.cache import TTLCache
+
+REPLICA_PREFIX = 'replica_'
+ROUTE_HEADER = 'X-DB-Route'
+STICKY_COOKIE = 'db_primary_until'
+STICKY_HEADER = 'X-DB-Primary-Until'
+
+_READ_TEXT = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+_FUNCTION_CALL = re.compile(r'\b\w+\.\w+\s*\(')
+
+_recent_writers = TTLCache(ttl=60)
+_round_robin = itertools.count()
+
+
+def is_read(clause):
+    if clause is None:
+        return False
+    if getattr(clause, 'get_execution_options', dict)().get('writes'):
+        return False
+    if isinstance(clause, TextClause):
+        return bool(_READ_TEXT.match(clause.text)) and not _FUNCTION_CALL.search(clause.text)
+    return bool(getattr(clause, 'is_select', False))
+
+
+class RoutingSession(Session):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context() and not self._flushing:
+            route = g.get('db_route')
+            if route is not None and is_read(clause):
+                return self._db.engines[route]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _flushed(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _executed(orm_execute_state):
+    if orm_execute_state.execution_options.get('writes') or not is_read(orm_execute_state.statement):
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _committed(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        g.db_wrote = True
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _rolled_back(session):
+    session.info.pop('wrote', None)
+
+
+def _user_id():
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+def _replicas():
+    return sorted(key for key in current_app.config.get('SQLALCHEMY_BINDS', {}) if key.startswith(REPLICA_PREFIX))
+
+
+def _pinned(value, now, window):
+    """True si `value` (cookie o cabecera) es un instante futuro dentro de la ventana."""
+    if not value:
+        return False
+    try:
+        until = float(value)
+    except (TypeError, ValueError):
+        return False
+    return math.isfinite(until) and now < until <= now + window
+
+
+def _is_sticky():
+    now = time.time()
+    window = current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+    if _pinned(request.headers.get(STICKY_HEADER), now, window) or _pinned(request.cookies.get(STICKY_COOKIE), now, window):
+        return True
+    user_id = _user_id()
+    return user_id is not None and user_id in _recent_writers
+
+
+def replica_read(fn):
+    """La vista solo lee: sus SELECT pueden ir a una réplica."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        replicas = _replicas()
+        if replicas and not _is_sticky():
+            g.db_route = replicas[next(_round_robin) % len(replicas)]
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def _after_request(response):
+    response.headers[ROUTE_HEADER] = g.get('db_route') or 'primary'
+
+    if g.get('db_wrote'):
+        window = current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+        user_id = _user_id()
+        if user_id is not None:
+            _recent_writers.set(user_id, True, ttl=window)
+        until = f"{time.time() + window:.3f}"
+        response.headers[STICKY_HEADER] = until
+        response.set_cookie(STICKY_COOKIE, until, max_age=window, httponly=True, samesite='Lax')
+    return response
+
+
+def init_db_routing(app):
+    """Instala la cabecera y la fijación al primario si hay réplicas configuradas."""
+    if any(key.startswith(REPLICA_PREFIX) for key in app.config.get('SQLALCHEMY_BINDS', {})):
+        app.after_request(_after_request)
@@ -0,0 +1,181 @@
+"""
+Claves de idempotencia para endpoints que escriben.
+
+El cliente envía `Idempotency-Key` (p. ej. un UUID por respuesta del
+estudiante). La primera respuesta de cada clave se guarda durante
+IDEMPOTENCY_TTL_SECONDS y los reintentos la reciben tal cual, con
+`Idempotent-Replayed: true`, sin volver a ejecutar la vista. Sin cabecera el
+endpoint se comporta como siempre.
+
+- La clave se asocia al endpoint, al usuario del JWT y al cuerpo de la
+  petición: reutilizarla con otro cuerpo devuelve 422. En endpoints sin JWT
+  se asocia a las matrículas (`enr_id`) del cuerpo, para que un cliente no
+  reciba la respuesta de otro.
+- Mientras la primera petición sigue en curso, un reintento recibe 409.
+  La reserva sin respuesta caduca a los IDEMPOTENCY_LEASE_SECONDS (algo más
+  que el timeout de gunicorn): si el worker muere después de que la vista
+  confirmara la reserva, el siguiente reintento la retoma.
+- Las respuestas 5xx no se guardan, para que el reintento pueda completarse.
+
+El almacén es la tabla `idempotency_key`, compartida por todos los workers.
+La clave se reserva con INSERT ... ON CONFLICT en la transacción de la
+vista: si la vista hace rollback la reserva desaparece con ella, y un
+reintento simultáneo espera al bloqueo de la fila en lugar de ejecutarse a
+la vez. Las claves caducadas se reutilizan en el mismo INSERT.
+"""
+import functools
+import hashlib
+import json
+import random
+import re
+from datetime import timedelta
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app import db
+from app.models.idempotency_key_model import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+REPLAYED_HEADERS = ('Content-Type', 'Location')
+
+_VALID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._:-]{0,127}$')
+
+# Fracción de peticiones que aprovechan para borrar claves caducadas
+_CLEANUP_RATE = 0.01
+
+_table = IdempotencyKey.__table__
+
+
+def _user_id():
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+def _body_enrollments():
+    """enr_id del cuerpo JSON (objeto o lista) o NDJSON."""
+    body = request.get_data(cache=True)
+    try:
+        items = json.loads(body)
+    except ValueError:
+        items = []
+        for line in body.splitlines():
+            try:
+                items.append(json.loads(line.strip().lstrip(b'\x1e')))
+            except ValueError:
+                continue
+    if isinstance(items, dict):
+        items = [items]
+    if not isinstance(items, list):
+        return set()
+    return {str(item.get('enr_id')) for item in items if isinstance(item, dict) and item.get('enr_id') is not None}
+
+
+def _scope():
+    user_id = _user_id()
+    if user_id is not None:
+        return f"user:{user_id}"
+    scope = 'enr:' + ','.join(sorted(_body_enrollments()))
+    if len(scope) > 200:
+        scope = 'enr#' + hashlib.sha256(scope.encode()).hexdigest()
+    return scope
+
+
+def _body_hash():
+    return hashlib.sha256(request.get_data(cache=True)).hexdigest()
+
+
+def _pk(identity):
+    endpoint, scope, key = identity
+    return (_table.c.endpoint == endpoint) & (_table.c.scope == scope) & (_table.c.key == key)
+
+
+def _claim(identity, body_hash, ttl, lease):
+    """
+    Reserva la clave en la transacción actual; también una caducada o una
+    reserva en curso cuyo plazo venció. True si es nuestra.
+    """
+    endpoint, scope, key = identity
+    stmt = pg_insert(_table).values(endpoint=endpoint, scope=scope, key=key, body_hash=body_hash)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[_table.c.endpoint, _table.c.scope, _table.c.key],
+        set_={'body_hash': stmt.excluded.body_hash, 'status_code': None, 'headers': None, 'body': None,
+              'created_at': func.now()},
+        where=(_table.c.created_at < func.now() - timedelta(seconds=ttl))
+        | (_table.c.status_code.is_(None) & (_table.c.created_at < func.now() - timedelta(seconds=lease))),
+    ).returning(_table.c.key)
+    return db.session.execute(stmt).first() is not None
+
+
+def _release(identity):
+    """Anula la reserva tras un error (la vista pudo haberla confirmado con su commit)."""
+    db.session.rollback()
+    db.session.execute(_table.delete().where(_pk(identity), _table.c.status_code.is_(None)))
+    db.session.commit()
+
+
+def _store(identity, response, ttl):
+    headers = [[name, response.headers[name]] for name in REPLAYED_HEADERS if name in response.headers]
+    db.session.execute(
+        _table.update().where(_pk(identity))
+        .values(status_code=response.status_code, headers=headers, body=response.get_data())
+    )
+    if random.random() < _CLEANUP_RATE:
+        db.session.execute(_table.delete().where(_table.c.created_at < func.now() - timedelta(seconds=ttl)))
+    db.session.commit()
+
+
+def _replay(row):
+    response = current_app.response_class(row.body, status=row.status_code)
+    for name, value in row.headers or []:
+        response.headers[name] = value
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(fn):
+    """Repite la primera respuesta de cada Idempotency-Key en lugar de ejecutar la vista."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return fn(*args, **kwargs)
+        if not _VALID.match(key):
+            return jsonify({"error": f"{HEADER} inválida"}), 400
+
+        identity = (request.endpoint, _scope(), key)
+        body_hash = _body_hash()
+        ttl = current_app.config.get('IDEMPOTENCY_TTL_SECONDS')
+        lease = current_app.config.get('IDEMPOTENCY_LEASE_SECONDS')
+
+        # Un reintento simultáneo se bloquea aquí hasta que la primera petición confirma o deshace
+        if not _claim(identity, body_hash, ttl, lease):
+            row = db.session.execute(
+                db.select(_table.c.body_hash, _table.c.status_code, _table.c.headers, _table.c.body)
+                .where(_pk(identity))
+            ).one()
+            db.session.rollback()
+            if row.body_hash != body_hash:
+                return jsonify({"error": f"{HEADER} ya usada con otra petición"}), 422
+            if row.status_code is None:
+                response = jsonify({"error": "La petición original todavía se está procesando"})
+                response.headers['Retry-After'] = '1'
+                return response, 409
+            return _replay(row)
+
+        try:
+            response = make_response(fn(*args, **kwargs))
+        except BaseException:
+            _release(identity)
+            raise
+
+        if response.status_code >= 500 or response.is_streamed:
+            _release(identity)
+        else:
+            _store(identity, response, ttl)
+        return response
+    return wrapper
@@ -0,0 +1,102 @@
+"""
+Punto único de instrumentación de SQL y de Marshmallow.
+
+Métricas, trazas, detector de N+1, log de consultas lentas, perfilado y
+contabilidad de memoria se suscriben aquí en lugar de instalar cada uno sus
+listeners de SQLAlchemy y su parche de `Schema.dump`. Cada sentencia pasa
+por un único par before/after_cursor_execute, que la cronometra una vez
+(el inicio se guarda en el contexto de ejecución, no en una pila de
+`conn.info`), y cada dump por un único envoltorio que solo avisa en el más
+externo (los Nested vuelven a llamar a dump).
+
+- `on_query(after, before=None, error=None)`: `after` recibe los argumentos
+  de after_cursor_execute más la duración en segundos; `before`, los de
+  before_cursor_execute; `error`, el contexto de handle_error.
+- `on_dump(hook)`: `hook(schema, many)` devuelve un context manager que
+  envuelve el dump más externo, o None si no le interesa.
+
+Los hooks se llaman en el orden en que se suscribieron. `reset()` quita los
+listeners, restaura `Schema.dump` y vacía las suscripciones.
+"""
+import contextvars
+import time
+from contextlib import ExitStack
+from marshmallow import Schema
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_before = []
+_after = []
+_errors = []
+_dumps = []
+
+_in_dump = contextvars.ContextVar('in_schema_dump', default=False)
+_original_dump = Schema.dump
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    for hook in _before:
+        hook(conn, cursor, statement, parameters, context, executemany)
+    if context is not None:
+        context._instrumentation_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_instrumentation_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    for hook in _after:
+        hook(conn, cursor, statement, parameters, context, executemany, elapsed)
+
+
+def _handle_error(exception_context):
+    for hook in _errors:
+        hook(exception_context)
+
+
+def _dump(self, obj, *, many=None):
+    if _in_dump.get() or not _dumps:
+        return _original_dump(self, obj, many=many)
+    token = _in_dump.set(True)
+    try:
+        with ExitStack() as stack:
+            for hook in _dumps:
+                manager = hook(self, many)
+                if manager is not None:
+                    stack.enter_context(manager)
+            return _original_dump(self, obj, many=many)
+    finally:
+        _in_dump.reset(token)
+
+
+def _subscribe(hooks, hook):
+    if hook is not None and hook not in hooks:
+        hooks.append(hook)
+
+
+def on_query(after=None, before=None, error=None):
+    """Suscribe hooks a cada sentencia SQL de cualquier Engine."""
+    _subscribe(_after, after)
+    _subscribe(_before, before)
+    _subscribe(_errors, error)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+
+def on_dump(hook):
+    """Suscribe un hook al `Schema.dump` más externo."""
+    _subscribe(_dumps, hook)
+    Schema.dump = _dump
+
+
+def reset():
+    for hooks in (_before, _after, _errors, _dumps):
+        hooks.clear()
+    if event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.remove(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.remove(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.remove(Engine, 'handle_error', _handle_error)
+    Schema.dump = _original_dump
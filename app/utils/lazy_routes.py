@@ -0,0 +1,94 @@
+"""
+Registro de blueprints, inmediato o diferido.
+
+Con LAZY_BLUEPRINTS las reglas se registran a partir de un manifiesto
+(`flask startup manifest`) y cada vista es un `LazyView` que importa su
+módulo de rutas, con sus modelos y esquemas, la primera vez que se llama.
+Así un worker arranca sin importar los 15 módulos de rutas.
+"""
+import json
+import logging
+import os
+from functools import cached_property
+from importlib import import_module
+from flask import Flask
+from werkzeug.utils import import_string
+from app.routes import BLUEPRINTS
+
+logger = logging.getLogger(__name__)
+
+AUTOMATIC_METHODS = {'HEAD', 'OPTIONS'}
+
+
+class LazyView:
+
+    def __init__(self, import_name):
+        self.import_name = import_name
+        self.__module__, self.__name__ = import_name.rsplit('.', 1)
+
+    @cached_property
+    def view(self):
+        return import_string(self.import_name)
+
+    def __call__(self, *args, **kwargs):
+        return self.view(*args, **kwargs)
+
+
+def manifest_path(app):
+    path = app.config.get('ROUTE_MANIFEST_PATH')
+    return os.path.join(app.root_path, path) if path else None
+
+
+def build_manifest():
+    """Importa todos los blueprints y describe sus reglas para el modo diferido."""
+    scratch = Flask(__name__)
+    for module, name, prefix in BLUEPRINTS:
+        scratch.register_blueprint(getattr(import_module(module), name), url_prefix=prefix)
+
+    rules = []
+    for rule in scratch.url_map.iter_rules():
+        if rule.endpoint == 'static':
+            continue
+        view = scratch.view_functions[rule.endpoint]
+        import_name = f"{view.__module__}.{view.__name__}"
+        if import_string(import_name) is not view:
+            raise ValueError(f"{rule.endpoint}: la vista no es accesible como {import_name}")
+        rules.append({
+            'rule': rule.rule,
+            'endpoint': rule.endpoint,
+            'methods': sorted(set(rule.methods) - AUTOMATIC_METHODS),
+            'strict_slashes': rule.strict_slashes,
+            'defaults': rule.defaults,
+            'view': import_name,
+        })
+    return {'blueprints': [list(entry) for entry in BLUEPRINTS], 'rules': rules}
+
+
+def _register_lazy(app, manifest):
+    for entry in manifest['rules']:
+        app.add_url_rule(
+            entry['rule'],
+            endpoint=entry['endpoint'],
+            view_func=LazyView(entry['view']),
+            methods=entry['methods'],
+            strict_slashes=entry['strict_slashes'],
+            defaults=entry['defaults'],
+        )
+    app.extensions['lazy_routes'] = True
+
+
+def register_blueprints(app):
+    if app.config.get('LAZY_BLUEPRINTS'):
+        path = manifest_path(app)
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as fh:
+                manifest = json.load(fh)
+            if manifest['blueprints'] == [list(entry) for entry in BLUEPRINTS]:
+                _register_lazy(app, manifest)
+                return
+            logger.warning("El manifiesto de rutas %s no corresponde a BLUEPRINTS; se registran de inmediato", path)
+        else:
+            logger.warning("LAZY_BLUEPRINTS sin manifiesto de rutas (flask startup manifest); se registran de inmediato")
+
+    for module, name, prefix in BLUEPRINTS:
+        app.register_blueprint(getattr(import_module(module), name), url_prefix=prefix)
@@ -0,0 +1,159 @@
+"""
+Contabilidad de memoria por endpoint con tracemalloc (modo diagnóstico).
+
+Con MEMORY_TRACKING activo se mide el pico de memoria asignada durante cada
+petición y se publica en /metrics. Se guarda una instantánea justo después
+del `Schema.dump` más grande (cuando la lista ORM y los dicts de Marshmallow
+siguen vivos) y, si el pico supera el presupuesto del endpoint
+(MEMORY_BUDGETS, en MiB), se registra un aviso con los sitios que más
+memoria asignaron.
+
+tracemalloc es global al proceso: las cifras solo son fiables con un hilo
+por worker (gunicorn sync) y el modo añade una sobrecarga notable.
+"""
+import logging
+import os
+import tracemalloc
+from contextlib import contextmanager
+from flask import current_app, g, request, has_request_context
+from app.utils import instrumentation
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+MIB = 1024 * 1024
+MEMORY_BUCKETS = tuple(n * MIB for n in (1, 2, 5, 10, 25, 50, 100, 250, 500))
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+peak_memory = registry.histogram(
+    'http_request_memory_peak_bytes', 'Pico de memoria asignada por petición (tracemalloc)', MEMORY_BUCKETS)
+
+
+def parse_budgets(value):
+    """'user_bp.get_all_users=64,enrollment.get_all_enrollments=128' -> {endpoint: bytes}"""
+    budgets = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        endpoint, _, megabytes = item.partition('=')
+        budgets[endpoint.strip()] = float(megabytes) * MIB
+    return budgets
+
+
+def _state():
+    if not has_request_context():
+        return None
+    return g.get('_memory')
+
+
+def _snapshot(state):
+    """Se queda con la instantánea tomada con más memoria en uso."""
+    current, _ = tracemalloc.get_traced_memory()
+    if current > state['snapshot_size']:
+        state['snapshot'] = tracemalloc.take_snapshot()
+        state['snapshot_size'] = current
+
+
+def _start_request():
+    tracemalloc.reset_peak()
+    current, _ = tracemalloc.get_traced_memory()
+    g._memory = {
+        'baseline': current,
+        'before': tracemalloc.take_snapshot(),
+        'snapshot': None,
+        'snapshot_size': -1,
+    }
+
+
+def _snapshot_response(response):
+    state = _state()
+    if state is not None and state['snapshot'] is None:
+        _snapshot(state)
+    return response
+
+
+def _app_frame(traceback):
+    for frame in reversed(traceback):
+        if frame.filename.startswith(_APP_DIR) and not frame.filename.startswith(_UTILS_DIR):
+            return f"{os.path.relpath(frame.filename, os.path.dirname(_APP_DIR))}:{frame.lineno}"
+    return None
+
+
+def top_sites(before, after, limit):
+    """Sitios que más memoria asignaron entre dos instantáneas."""
+    stats = after.filter_traces(_FILTERS).compare_to(before.filter_traces(_FILTERS), 'traceback')
+    lines = []
+    for stat in stats:
+        if stat.size_diff <= 0:
+            continue
+        allocation = stat.traceback[-1]
+        site = f"{allocation.filename}:{allocation.lineno}"
+        origin = _app_frame(stat.traceback)
+        lines.append(
+            f"  {stat.size_diff / MIB:8.2f} MiB {stat.count_diff:+8d} bloques  {site}"
+            + (f"  (desde {origin})" if origin else '')
+        )
+        if len(lines) >= limit:
+            break
+    return lines
+
+
+def _finish_request(exc):
+    state = g.pop('_memory', None)
+    if state is None:
+        return
+
+    _, peak = tracemalloc.get_traced_memory()
+    peak -= state['baseline']
+    endpoint = request.endpoint or 'unmatched'
+    peak_memory.observe((request.blueprint or '', endpoint), peak)
+
+    budgets = current_app.config.get('MEMORY_BUDGETS') or {}
+    budget = budgets.get(endpoint, current_app.config.get('MEMORY_DEFAULT_BUDGET_MB', 0) * MIB)
+    if not budget or peak <= budget:
+        return
+
+    sites = []
+    if state['snapshot'] is not None:
+        sites = top_sites(state['before'], state['snapshot'], current_app.config.get('MEMORY_TOP_SITES', 10))
+    logger.warning(
+        "%s %s (%s) alcanzó un pico de %.1f MiB (presupuesto %.1f MiB). Principales sitios de asignación:\n%s",
+        request.method, request.path, endpoint, peak / MIB, budget / MIB, '\n'.join(sites) or '  (sin instantánea)'
+    )
+
+
+@contextmanager
+def _snapshot_after(state):
+    try:
+        yield
+    finally:
+        _snapshot(state)
+
+
+def _tracked_schema_dump(schema, many):
+    state = _state()
+    return _snapshot_after(state) if state is not None else None
+
+
+def init_memory_accounting(app):
+    """Activa la contabilidad de memoria si MEMORY_TRACKING está habilitado."""
+    if not app.config.get('MEMORY_TRACKING'):
+        return
+
+    if isinstance(app.config.get('MEMORY_BUDGETS'), str):
+        app.config['MEMORY_BUDGETS'] = parse_budgets(app.config['MEMORY_BUDGETS'])
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(app.config.get('MEMORY_TRACE_FRAMES', 15))
+
+    instrumentation.on_dump(_tracked_schema_dump)
+
+    app.before_request(_start_request)
+    app.after_request(_snapshot_response)
+    app.teardown_request(_finish_request)
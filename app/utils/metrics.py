@@ -0,0 +1,250 @@
+"""
+Métricas por blueprint y endpoint en formato de texto de Prometheus.
+
+Registra por petición: latencia, número de sentencias SQL, tiempo en SQL,
+filas devueltas, tiempo de conexión a la base de datos y tiempo de
+serialización (Marshmallow + JSON). Los contadores viven en memoria de cada
+proceso: con varios workers de gunicorn cada uno expone los suyos.
+"""
+import threading
+import time
+from flask import g, request, has_request_context
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.utils import instrumentation
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+LABELS = ('blueprint', 'endpoint')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}'
+
+
+class Histogram:
+
+    def __init__(self, name, documentation, buckets, labels=LABELS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labels = labels
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted(self._series.items())
+            for label_values, (counts, total, count) in items:
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(self.labels, label_values, f'le="{bound}"')
+                    lines.append(f'{self.name}_bucket{labels} {bucket_count}')
+                labels = _format_labels(self.labels, label_values, 'le="+Inf"')
+                lines.append(f'{self.name}_bucket{labels} {count}')
+                labels = _format_labels(self.labels, label_values)
+                lines.append(f'{self.name}_sum{labels} {total}')
+                lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Counter:
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, name, documentation, buckets, labels=LABELS):
+        metric = Histogram(name, documentation, buckets, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels):
+        metric = Counter(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+requests_total = registry.counter(
+    'http_requests_total', 'Peticiones atendidas', LABELS + ('method', 'status'))
+request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Latencia total de la petición', LATENCY_BUCKETS)
+sql_queries = registry.histogram(
+    'http_request_sql_queries', 'Sentencias SQL ejecutadas por petición', COUNT_BUCKETS)
+sql_duration = registry.histogram(
+    'http_request_sql_duration_seconds', 'Tiempo total en SQL por petición', LATENCY_BUCKETS)
+sql_rows = registry.histogram(
+    'http_request_sql_rows', 'Filas devueltas por la base de datos por petición', ROW_BUCKETS)
+db_connect_duration = registry.histogram(
+    'http_request_db_connect_seconds', 'Tiempo esperando conexión a la base de datos', LATENCY_BUCKETS)
+serialization_duration = registry.histogram(
+    'http_request_serialization_seconds', 'Tiempo en Marshmallow y JSON por petición', LATENCY_BUCKETS)
+
+
+def _stats():
+    """Acumuladores de la petición actual (None fuera de una petición)."""
+    if not has_request_context():
+        return None
+    return g.get('_metrics')
+
+
+def _labels():
+    endpoint = request.endpoint or 'unmatched'
+    return (request.blueprint or '', endpoint)
+
+
+def _start_request():
+    g._metrics = {
+        'start': time.perf_counter(),
+        'queries': 0,
+        'sql': 0.0,
+        'rows': 0,
+        'connect': 0.0,
+        'serialize': 0.0,
+        'serialize_depth': 0,
+        'status': 500,
+    }
+
+
+def _capture_status(response):
+    stats = _stats()
+    if stats is not None:
+        stats['status'] = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    stats = _stats()
+    if stats is None:
+        return
+
+    labels = _labels()
+    request_duration.observe(labels, time.perf_counter() - stats['start'])
+    sql_queries.observe(labels, stats['queries'])
+    sql_duration.observe(labels, stats['sql'])
+    sql_rows.observe(labels, stats['rows'])
+    db_connect_duration.observe(labels, stats['connect'])
+    serialization_duration.observe(labels, stats['serialize'])
+    requests_total.inc(labels + (request.method, str(stats['status'])))
+
+
+def _after_query(conn, cursor, statement, parameters, context, executemany, elapsed):
+    stats = _stats()
+    if stats is None:
+        return
+    stats['sql'] += elapsed
+    stats['queries'] += 1
+    if cursor.description is not None and cursor.rowcount > 0:
+        stats['rows'] += cursor.rowcount
+
+
+def _do_connect(dialect, conn_rec, cargs, cparams):
+    stats = _stats()
+    if stats is None:
+        return None
+    start = time.perf_counter()
+    connection = dialect.connect(*cargs, **cparams)
+    stats['connect'] += time.perf_counter() - start
+    return connection
+
+
+class _TimedSerialization:
+    """Mide solo la llamada más externa (un dump puede ocurrir dentro del JSON)."""
+
+    def __enter__(self):
+        self.stats = _stats()
+        if self.stats is not None:
+            self.stats['serialize_depth'] += 1
+            self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        if self.stats is not None:
+            self.stats['serialize_depth'] -= 1
+            if self.stats['serialize_depth'] == 0:
+                self.stats['serialize'] += time.perf_counter() - self.start
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+
+    def dumps(self, obj, **kwargs):
+        with _TimedSerialization():
+            return super().dumps(obj, **kwargs)
+
+
+def _timed_schema_dump(schema, many):
+    return _TimedSerialization()
+
+
+def init_metrics(app):
+    """
+    Activa la instrumentación si METRICS_ENABLED está habilitado; /metrics solo
+    se publica si además hay METRICS_TOKEN.
+    """
+    if not app.config.get('METRICS_ENABLED'):
+        return
+
+    app.json_provider_class = TimedJSONProvider
+    app.json = TimedJSONProvider(app)
+
+    app.before_request(_start_request)
+    app.after_request(_capture_status)
+    app.teardown_request(_finish_request)
+
+    instrumentation.on_query(_after_query)
+    instrumentation.on_dump(_timed_schema_dump)
+    if not event.contains(Engine, 'do_connect', _do_connect):
+        event.listen(Engine, 'do_connect', _do_connect)
+
+    if not app.config.get('METRICS_TOKEN'):
+        return
+    from app.routes.metrics_routes import metrics_bp
+    app.register_blueprint(metrics_bp, url_prefix=app.config.get('METRICS_ROUTE', '/metrics'))
@@ -0,0 +1,168 @@
+"""
+Especificación OpenAPI precalculada.
+
+`flask openapi build` genera el documento una sola vez a partir de los
+docstrings YAML (flasgger), lo valida y lo guarda junto a su versión gzip.
+En ejecución se sirve ese fichero estático con ETag, sin introspección de
+docstrings ni al arrancar ni por petición. Si el fichero no existe y
+SWAGGER_UI está activo, flasgger sigue generándolo en caliente.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+from flask import Response, current_app, request
+
+HTTP_METHODS = ('get', 'put', 'post', 'delete', 'options', 'head', 'patch')
+SPEC_ENDPOINT = 'apispec_1'
+
+_PATH_PARAM = re.compile(r'{([^}]+)}')
+
+
+def spec_path(app):
+    """OPENAPI_SPEC_PATH, relativa al paquete `app` si no es absoluta."""
+    path = app.config.get('OPENAPI_SPEC_PATH')
+    return os.path.join(app.root_path, path) if path else None
+
+
+def build_spec(app):
+    """Genera el documento con flasgger (requiere contexto de aplicación)."""
+    from flasgger import Swagger
+    from app import template
+
+    swag = getattr(app, 'swag', None)
+    if swag is None:
+        swag = Swagger(template=template)
+        swag.init_app(app)
+    swag.apispecs.pop(SPEC_ENDPOINT, None)
+
+    with app.test_request_context():
+        return json.loads(json.dumps(swag.get_apispecs(SPEC_ENDPOINT), default=str))
+
+
+def _resolve(spec, ref):
+    node = spec
+    for part in ref.lstrip('#/').split('/'):
+        if not isinstance(node, dict) or part not in node:
+            return None
+        node = node[part]
+    return node
+
+
+def _refs(node):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == '$ref' and isinstance(value, str):
+                yield value
+            else:
+                yield from _refs(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _refs(item)
+
+
+def validate_spec(spec):
+    """
+    Devuelve (errores, avisos). Los avisos (operaciones sin 'responses',
+    referencias sin definir) no impiden servir el documento.
+    """
+    errors, warnings = [], []
+    if spec.get('swagger') != '2.0' and not str(spec.get('openapi', '')).startswith('3.'):
+        errors.append("Falta la versión 'swagger: 2.0' u 'openapi: 3.x'")
+    for key in ('info', 'paths'):
+        if not spec.get(key):
+            errors.append(f"Falta la sección '{key}'")
+
+    operation_ids = {}
+    for path, operations in (spec.get('paths') or {}).items():
+        declared = set(_PATH_PARAM.findall(path))
+        for method, operation in operations.items():
+            if method not in HTTP_METHODS:
+                continue
+            where = f"{method.upper()} {path}"
+            if not operation.get('responses'):
+                warnings.append(f"{where}: sin 'responses'")
+
+            in_path = set()
+            for param in operation.get('parameters', []):
+                if '$ref' in param:
+                    continue
+                if 'name' not in param or 'in' not in param:
+                    errors.append(f"{where}: parámetro sin 'name' o 'in'")
+                elif param['in'] == 'path':
+                    in_path.add(param['name'])
+                    if not param.get('required'):
+                        errors.append(f"{where}: el parámetro de ruta '{param['name']}' debe ser required")
+            for missing in sorted(in_path - declared):
+                errors.append(f"{where}: el parámetro '{missing}' no aparece en la ruta")
+
+            operation_id = operation.get('operationId')
+            if operation_id:
+                if operation_id in operation_ids:
+                    errors.append(f"{where}: operationId '{operation_id}' repetido en {operation_ids[operation_id]}")
+                operation_ids[operation_id] = where
+
+    for ref in set(_refs(spec)):
+        if ref.startswith('#/') and _resolve(spec, ref) is None:
+            warnings.append(f"Referencia sin resolver: {ref}")
+    return errors, sorted(warnings)
+
+
+def write_spec(spec, path):
+    """Guarda el documento y su versión gzip; devuelve el ETag."""
+    body = json.dumps(spec, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as fh:
+        fh.write(body)
+    with open(path + '.gz', 'wb') as fh:
+        # mtime=0: el mismo documento produce siempre el mismo fichero
+        fh.write(gzip.compress(body, compresslevel=9, mtime=0))
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+class StaticSpec:
+
+    def __init__(self, path):
+        with open(path, 'rb') as fh:
+            self.body = fh.read()
+        self.gzipped = None
+        if os.path.exists(path + '.gz'):
+            with open(path + '.gz', 'rb') as fh:
+                self.gzipped = fh.read()
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+
+    def response(self):
+        if self.etag in request.if_none_match:
+            response = Response(status=304)
+        elif self.gzipped is not None and 'gzip' in request.accept_encodings:
+            response = Response(self.gzipped, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(self.body, mimetype='application/json')
+        response.set_etag(self.etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+
+def _serve_static_spec():
+    return current_app.extensions['openapi_spec'].response()
+
+
+def init_openapi(app):
+    """
+    Sirve el documento precalculado en /apispec_1.json. Con la UI de
+    flasgger activa se reemplaza su vista del documento para que el
+    explorador use el fichero estático.
+    """
+    path = spec_path(app)
+    if not path or not os.path.exists(path):
+        return
+
+    app.extensions['openapi_spec'] = StaticSpec(path)
+    flasgger_endpoint = f'flasgger.{SPEC_ENDPOINT}'
+    if flasgger_endpoint in app.view_functions:
+        app.view_functions[flasgger_endpoint] = _serve_static_spec
+    else:
+        app.add_url_rule(f'/{SPEC_ENDPOINT}.json', 'openapi_spec', _serve_static_spec)
@@ -0,0 +1,94 @@
+"""
+Precalentamiento del proceso antes de atender peticiones.
+
+Con gunicorn en modo preload se ejecuta una sola vez en el master: importa
+todas las vistas (también con LAZY_BLUEPRINTS), configura los mappers,
+llena los grafos de curso y el catálogo de evaluaciones diagnósticas, cierra
+las conexiones y congela el heap del GC. Los workers heredan todo ello y lo
+comparten copy-on-write en lugar de construir cada uno su copia.
+
+Si falla (p. ej. la base no responde durante el despliegue) el estado queda
+en 'skipped' con el error: las cachés se llenan en las primeras peticiones y
+la disponibilidad depende solo de la comprobación de la base en /ready.
+"""
+import gc
+import logging
+import time
+from importlib import import_module
+from sqlalchemy.orm import configure_mappers
+from app import db
+from app.utils.lazy_routes import LazyView
+
+logger = logging.getLogger(__name__)
+
+_state = {'status': 'skipped'}
+
+
+def get_state():
+    return dict(_state)
+
+
+def prewarm(app, freeze=True):
+    _state.update(status='running')
+    start = time.perf_counter()
+    try:
+        for view in app.view_functions.values():
+            if isinstance(view, LazyView):
+                view.view
+
+        import_module('app.models')
+        configure_mappers()
+
+        with app.app_context():
+            try:
+                courses, assessments = _warm_caches(app.config.get('PREWARM_MAX_COURSES', 200))
+            finally:
+                db.session.remove()
+                # Ninguna conexión abierta debe cruzar el fork
+                db.engine.dispose()
+    except Exception as e:
+        # No es fatal: sin precalentar, cada worker llena sus cachés bajo demanda
+        _state.clear()
+        _state.update(status='skipped', error=str(e))
+        logger.exception("Falló el precalentamiento; se continúa sin cachés precargadas")
+        return get_state()
+
+    if freeze:
+        gc.collect()
+        gc.freeze()
+
+    _state.clear()
+    _state.update(
+        status='done',
+        courses=courses,
+        assessments=assessments,
+        duration_ms=round((time.perf_counter() - start) * 1000, 1),
+        frozen_objects=gc.get_freeze_count(),
+        warmed_at=time.time(),
+    )
+    logger.info("Precalentamiento listo: %s", _state)
+    return get_state()
+
+
+def _warm_caches(max_courses):
+    from app.models.course_model import Course
+    from app.models.course_instance_model import CourseInstance
+    from app.models.assessment_model import Assessment
+    from app.services import catalog_cache, knowledge_graph
+
+    cou_ids = [row.cou_id for row in db.session.query(Course.cou_id).order_by(Course.cou_id).limit(max_courses)]
+    for cou_id in cou_ids:
+        knowledge_graph.get_course_graph(cou_id)
+
+    knowledge_graph.prime_course_ids(
+        db.session.query(CourseInstance.coi_id, CourseInstance.cou_id)
+        .filter(CourseInstance.cou_id.in_(cou_ids))
+    )
+
+    assessments = db.session.query(Assessment.asm_id, Assessment.cou_id)\
+        .filter(Assessment.asm_type == 'diagnostico', Assessment.cou_id.in_(cou_ids))\
+        .all()
+    for asm_id, cou_id in assessments:
+        catalog_cache.get_assessment_exercises(asm_id, cou_id)
+
+    return len(cou_ids), len(assessments)
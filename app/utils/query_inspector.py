@@ -0,0 +1,170 @@
+"""
+Detector de N+1 y presupuestos de consultas por petición.
+
+Con QUERY_INSPECTOR en 'warn' o 'raise' cada sentencia SQL se reduce a una
+huella (literales y listas IN colapsados). Cuando la misma huella se repite
+N_PLUS_ONE_THRESHOLD veces en una petición se reporta como N+1 con el
+endpoint y la pila de la aplicación que la originó.
+
+`query_budget(n)` fija el máximo de sentencias de un endpoint y
+`assert_max_queries(n)` permite comprobarlo desde una prueba.
+"""
+import functools
+import logging
+import os
+import re
+import threading
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from flask import current_app, g, request, has_request_context
+from app.utils import instrumentation
+
+logger = logging.getLogger(__name__)
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_THIS_FILE = os.path.abspath(__file__)
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*[^()]+?\s*,)+\s*[^()]+?\s*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAM = re.compile(r'%\(\w+\)s|%s|\?|:\w+')
+_SPACES = re.compile(r'\s+')
+
+_local = threading.local()
+
+
+class NPlusOneError(RuntimeError):
+    pass
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(statement):
+    """Forma de la sentencia sin valores concretos."""
+    shape = _STRING.sub('?', statement)
+    shape = _PARAM.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    shape = _IN_LIST.sub('IN (?)', shape)
+    return _SPACES.sub(' ', shape).strip()
+
+
+def app_stack(limit=8):
+    """Últimos frames de la pila que pertenecen al código de la aplicación."""
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(_APP_DIR) and frame.filename != _THIS_FILE
+    ]
+    return ''.join(traceback.format_list(frames[-limit:]))
+
+
+def _mode():
+    return current_app.config.get('QUERY_INSPECTOR', 'off')
+
+
+def _request_state():
+    if not has_request_context():
+        return None
+    return g.get('_query_inspector')
+
+
+def _start_request():
+    g._query_inspector = {'count': 0, 'shapes': Counter(), 'reported': set()}
+
+
+def _report_n_plus_one(shape, times):
+    message = (
+        f"Posible N+1 en {request.method} {request.path} ({request.endpoint}): "
+        f"{times} sentencias con la forma\n  {shape}\n{app_stack()}"
+    )
+    if _mode() == 'raise':
+        raise NPlusOneError(message)
+    logger.warning(message)
+
+
+def _after_query(conn, cursor, statement, parameters, context, executemany, elapsed):
+    for recorder in getattr(_local, 'recorders', ()):
+        recorder.append(statement)
+
+    state = _request_state()
+    if state is None:
+        return
+
+    state['count'] += 1
+    shape = fingerprint(statement)
+    state['shapes'][shape] += 1
+    times = state['shapes'][shape]
+    if times >= current_app.config.get('N_PLUS_ONE_THRESHOLD', 5) and shape not in state['reported']:
+        state['reported'].add(shape)
+        _report_n_plus_one(shape, times)
+
+
+def _install():
+    instrumentation.on_query(_after_query)
+
+
+def init_query_inspector(app):
+    """Activa el detector si QUERY_INSPECTOR es 'warn' o 'raise'."""
+    if app.config.get('QUERY_INSPECTOR', 'off') not in ('warn', 'raise'):
+        return
+    app.before_request(_start_request)
+    _install()
+
+
+def query_budget(max_queries):
+    """
+    Máximo de sentencias SQL que puede emitir el endpoint decorado.
+    Solo se comprueba con el detector activo; en modo 'raise' la petición
+    falla con QueryBudgetExceeded.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            response = fn(*args, **kwargs)
+            state = _request_state()
+            if state is not None and state['count'] > max_queries:
+                message = (
+                    f"{request.endpoint} emitió {state['count']} sentencias SQL "
+                    f"(presupuesto {max_queries})"
+                )
+                if _mode() == 'raise':
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def count_queries():
+    """Registra las sentencias ejecutadas en el hilo actual dentro del bloque."""
+    _install()
+    recorder = []
+    recorders = getattr(_local, 'recorders', None)
+    if recorders is None:
+        recorders = _local.recorders = []
+    recorders.append(recorder)
+    try:
+        yield recorder
+    finally:
+        recorders.remove(recorder)
+
+
+@contextmanager
+def assert_max_queries(max_queries):
+    """
+    Falla si el bloque ejecuta más de `max_queries` sentencias, p. ej.:
+
+        with assert_max_queries(12):
+            client.post(f'/api/diagnostic/session/{sid}/submit-answer', json=...)
+    """
+    with count_queries() as recorder:
+        yield recorder
+    if len(recorder) > max_queries:
+        repeated = Counter(fingerprint(statement) for statement in recorder).most_common(3)
+        detail = '\n'.join(f"  {times}x {shape}" for shape, times in repeated)
+        raise QueryBudgetExceeded(
+            f"Se ejecutaron {len(recorder)} sentencias SQL (máximo {max_queries}):\n{detail}"
+        )
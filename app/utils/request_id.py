@@ -0,0 +1,37 @@
+"""
+Identificador por petición.
+
+Se respeta el X-Request-ID entrante si tiene un formato razonable (p. ej. el
+que pone el proxy); si no, se genera uno. Se devuelve siempre en la respuesta
+para poder cruzar logs, perfiles y trazas de la misma petición.
+"""
+import re
+import uuid
+from flask import g, request, has_request_context
+
+HEADER = 'X-Request-ID'
+
+_VALID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$')
+
+
+def get_request_id():
+    if not has_request_context():
+        return None
+    return g.get('request_id')
+
+
+def _assign():
+    incoming = request.headers.get(HEADER, '')
+    g.request_id = incoming if _VALID.match(incoming) else uuid.uuid4().hex
+
+
+def _expose(response):
+    request_id = get_request_id()
+    if request_id:
+        response.headers[HEADER] = request_id
+    return response
+
+
+def init_request_id(app):
+    app.before_request(_assign)
+    app.after_request(_expose)
@@ -0,0 +1,114 @@
+from flask import g, abort
+from sqlalchemy import inspect, tuple_
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db
+
+
+class RequestLoader:
+    """
+    Identity map con alcance de petición para búsquedas por llave primaria.
+
+    - Memoriza los objetos cargados para que los helpers de un mismo handler
+      no vuelvan a consultar la misma fila.
+    - Agrupa las llaves encoladas con `queue` en un único `WHERE pk IN (...)`.
+    - `commit(keep=...)` define explícitamente qué modelos sobreviven al commit:
+      sus columnas se restauran como valores confirmados y no se recargan.
+      El resto se expira como siempre (se recargan al accederlos).
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._objects = {}
+        self._pending = {}
+
+    @staticmethod
+    def _key(pk):
+        return pk if isinstance(pk, tuple) else (pk,)
+
+    def queue(self, model, *pks):
+        """Encola llaves para cargarlas en lote con el siguiente `get` del modelo."""
+        pending = self._pending.setdefault(model, set())
+        for pk in pks:
+            if (model, self._key(pk)) not in self._objects:
+                pending.add(self._key(pk))
+
+    def get(self, model, pk):
+        key = self._key(pk)
+        if (model, key) not in self._objects:
+            self.queue(model, pk)
+            self._load(model)
+        return self._objects.get((model, key))
+
+    def get_or_404(self, model, pk):
+        obj = self.get(model, pk)
+        if obj is None:
+            abort(404)
+        return obj
+
+    def get_many(self, model, pks):
+        self.queue(model, *pks)
+        self._load(model)
+        return {pk: self._objects.get((model, self._key(pk))) for pk in pks}
+
+    def prime(self, obj):
+        """Registra un objeto ya cargado por otra consulta."""
+        mapper = inspect(obj).mapper
+        key = tuple(mapper.primary_key_from_instance(obj))
+        self._objects[(mapper.class_, key)] = obj
+        return obj
+
+    def _load(self, model):
+        keys = self._pending.pop(model, set())
+        if not keys:
+            return
+
+        pk_cols = inspect(model).primary_key
+        if len(pk_cols) == 1:
+            criteria = pk_cols[0].in_([k[0] for k in keys])
+        else:
+            criteria = tuple_(*pk_cols).in_(list(keys))
+
+        for obj in self.session.query(model).filter(criteria).all():
+            self.prime(obj)
+
+        # Cacheamos también los faltantes para no repetir la búsqueda
+        for key in keys:
+            self._objects.setdefault((model, key), None)
+
+    def commit(self, keep=()):
+        """
+        Confirma la transacción conservando en memoria las instancias de `keep`.
+        Los valores se toman después del flush, es decir, son los mismos que
+        acaban de escribirse en la base de datos.
+        """
+        self.session.flush()
+
+        snapshots = []
+        for obj in self._objects.values():
+            if obj is None or not isinstance(obj, tuple(keep)):
+                continue
+            state = inspect(obj)
+            if not state.persistent:
+                continue
+            values = {
+                attr.key: state.dict[attr.key]
+                for attr in state.mapper.column_attrs
+                if attr.key in state.dict
+            }
+            snapshots.append((obj, values))
+
+        self.session.commit()
+
+        for obj, values in snapshots:
+            for key, value in values.items():
+                set_committed_value(obj, key, value)
+
+        # Las búsquedas negativas pueden dejar de serlo tras el commit
+        self._objects = {k: o for k, o in self._objects.items() if o is not None}
+
+
+def get_loader():
+    """Devuelve el cargador de la petición actual (lo crea si no existe)."""
+    if 'request_loader' not in g:
+        g.request_loader = RequestLoader(db.session)
+    return g.request_loader
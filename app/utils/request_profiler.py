@@ -0,0 +1,164 @@
+"""
+Perfilado bajo demanda de una petición concreta.
+
+Solo se activa cuando la petición trae `X-Profile-Token` igual a
+PROFILING_TOKEN; el resto de peticiones únicamente pagan la comprobación de
+la cabecera. El resultado se guarda en PROFILING_DIR/<request_id>/:
+
+- stacks.folded: pilas agregadas listas para flamegraph.pl o speedscope
+  (modo 'sample', por defecto).
+- profile.prof: salida de cProfile para pstats/snakeviz (modo 'cprofile',
+  con `X-Profile-Mode: cprofile`).
+- sql.json: cada sentencia con su duración y la línea que la lanzó.
+- summary.json: endpoint, estado y duración total.
+"""
+import cProfile
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from flask import current_app, g, request, has_request_context
+from app.utils import instrumentation
+from app.utils.request_id import get_request_id
+from app.utils.slow_query_log import call_site
+
+TOKEN_HEADER = 'X-Profile-Token'
+MODE_HEADER = 'X-Profile-Mode'
+ID_HEADER = 'X-Profile-Id'
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    if filename.startswith(_ROOT):
+        filename = os.path.relpath(filename, _ROOT)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """Muestrea la pila de un hilo cada `interval` segundos."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='request-profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _profile():
+    if not has_request_context():
+        return None
+    return g.get('_profile')
+
+
+def _start():
+    token = current_app.config.get('PROFILING_TOKEN')
+    supplied = request.headers.get(TOKEN_HEADER)
+    # En bytes: compare_digest no acepta str con caracteres no ASCII
+    if not token or not supplied or not hmac.compare_digest(supplied.encode(), token.encode()):
+        return
+
+    mode = request.headers.get(MODE_HEADER, 'sample')
+    profile = {'mode': mode, 'sql': [], 'start': time.perf_counter()}
+    if mode == 'cprofile':
+        profile['profiler'] = cProfile.Profile()
+        profile['profiler'].enable()
+    else:
+        interval = current_app.config.get('PROFILING_INTERVAL_MS', 5) / 1000
+        profile['profiler'] = StackSampler(threading.get_ident(), interval)
+        profile['profiler'].start()
+    g._profile = profile
+
+
+def _expose(response):
+    profile = _profile()
+    if profile is not None:
+        profile['status'] = response.status_code
+        response.headers[ID_HEADER] = get_request_id()
+    return response
+
+
+def _finish(exc):
+    profile = g.pop('_profile', None)
+    if profile is None:
+        return
+
+    profiler = profile['profiler']
+    if profile['mode'] == 'cprofile':
+        profiler.disable()
+    else:
+        profiler.stop()
+    duration_ms = (time.perf_counter() - profile['start']) * 1000
+
+    output_dir = os.path.join(current_app.config.get('PROFILING_DIR', 'profiles'), get_request_id())
+    os.makedirs(output_dir, exist_ok=True)
+
+    if profile['mode'] == 'cprofile':
+        profiler.dump_stats(os.path.join(output_dir, 'profile.prof'))
+    else:
+        with open(os.path.join(output_dir, 'stacks.folded'), 'w', encoding='utf-8') as fh:
+            fh.write(profiler.folded())
+
+    with open(os.path.join(output_dir, 'sql.json'), 'w', encoding='utf-8') as fh:
+        json.dump(profile['sql'], fh, indent=2, default=str, ensure_ascii=False)
+
+    with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as fh:
+        json.dump({
+            'request_id': get_request_id(),
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': profile.get('status', 500),
+            'mode': profile['mode'],
+            'duration_ms': round(duration_ms, 2),
+            'sql_count': len(profile['sql']),
+            'sql_ms': round(sum(item['duration_ms'] for item in profile['sql']), 2),
+            'error': repr(exc) if exc else None,
+        }, fh, indent=2, ensure_ascii=False)
+
+
+def _after_query(conn, cursor, statement, parameters, context, executemany, elapsed):
+    profile = _profile()
+    if profile is None:
+        return
+    profile['sql'].append({
+        'duration_ms': round(elapsed * 1000, 3),
+        'statement': statement,
+        'executemany': executemany,
+        'rowcount': cursor.rowcount,
+        'call_site': call_site(),
+    })
+
+
+def init_request_profiler(app):
+    """Activa el perfilado bajo demanda si hay PROFILING_TOKEN configurado."""
+    if not app.config.get('PROFILING_TOKEN'):
+        return
+
+    app.before_request(_start)
+    app.after_request(_expose)
+    app.teardown_request(_finish)
+
+    instrumentation.on_query(_after_query)
@@ -0,0 +1,92 @@
+"""
+Comprobación de los objetos de base de datos que el código da por hechos.
+
+Las tablas y restricciones que no crea `db.create_all()` en una base ya
+existente (upserts con ON CONFLICT, tablas auxiliares nuevas) se entregan
+como SQL versionado en sql/migrations/. Cada migración declara aquí qué
+objetos deja creados; `flask startup schema` informa de las que faltan y
+las aplica con --apply, y /ready no da el worker por disponible mientras
+falte alguna.
+"""
+import os
+from sqlalchemy import inspect, text
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'sql', 'migrations')
+
+# migración -> objetos que deja creados: ('table', tabla), ('unique', tabla, restricción),
+# ('index', tabla, índice), ('column', tabla, columna) o ('trigger', tabla, trigger)
+REQUIRED = {
+    '001_sks_sdp_unique.sql': [
+        ('unique', 'student_knowledge_state', 'uq_sks_enrollment_subtopic'),
+        ('unique', 'student_domain_progress', 'uq_sdp_enrollment_domain'),
+    ],
+    '002_attempt_counter.sql': [
+        ('table', 'attempt_counter'),
+    ],
+    '003_idempotency_key.sql': [
+        ('table', 'idempotency_key'),
+    ],
+    '004_course_content_version.sql': [
+        ('column', 'course', 'cou_content_version'),
+    ] + [
+        ('trigger', table, f'trg_{table}_content_version_{event}')
+        for table in ('domain', 'subtopic', 'subtopic_dependency')
+        for event in ('ins', 'upd', 'del')
+    ],
+    '005_catalog_content_version.sql': [
+        ('trigger', table, f'trg_{table}_content_version_{event}')
+        for table in ('exercise', 'assessment_exercise')
+        for event in ('ins', 'upd', 'del')
+    ],
+    '006_users_email_lower_unique.sql': [
+        ('index', 'users', 'uq_users_email_lower'),
+    ],
+}
+
+# Una vez completo el esquema no hace falta volver a inspeccionarlo
+_complete = False
+
+
+def _exists(inspector, tables, triggers, obj):
+    kind, table = obj[0], obj[1]
+    if table not in tables:
+        return False
+    if kind == 'unique':
+        return any(constraint['name'] == obj[2] for constraint in inspector.get_unique_constraints(table))
+    if kind == 'index':
+        return any(index['name'] == obj[2] for index in inspector.get_indexes(table))
+    if kind == 'column':
+        return any(column['name'] == obj[2] for column in inspector.get_columns(table))
+    if kind == 'trigger':
+        return (table, obj[2]) in triggers
+    return True
+
+
+def _triggers(connection):
+    """(tabla, trigger) de todos los triggers de usuario, en una sola consulta."""
+    rows = connection.execute(text(
+        "SELECT c.relname, t.tgname FROM pg_trigger t JOIN pg_class c ON c.oid = t.tgrelid "
+        "WHERE NOT t.tgisinternal AND pg_table_is_visible(c.oid)"
+    ))
+    return {(row.relname, row.tgname) for row in rows}
+
+
+def pending(connection):
+    """Migraciones (en orden) a las que les falta algún objeto."""
+    global _complete
+    if _complete:
+        return []
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+    triggers = _triggers(connection)
+    missing = [
+        name for name, objects in sorted(REQUIRED.items())
+        if not all(_exists(inspector, tables, triggers, obj) for obj in objects)
+    ]
+    _complete = not missing
+    return missing
+
+
+def migration_sql(name):
+    with open(os.path.join(MIGRATIONS_DIR, name), encoding='utf-8') as f:
+        return f.read()
@@ -0,0 +1,161 @@
+"""
+Registro de consultas lentas con atribución a endpoint y línea de código.
+
+Toda sentencia que tarde más de SLOW_QUERY_MS se escribe (una línea JSON) en
+un log rotativo con sus parámetros, el endpoint, el request ID y el primer
+frame de la aplicación que la lanzó. Con SLOW_QUERY_EXPLAIN_RATE > 0 se
+muestrea la peor SELECT de cada petición con EXPLAIN (ANALYZE, BUFFERS) en
+otra conexión y en segundo plano, una vez por forma cada 10 minutos.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import RotatingFileHandler
+from flask import current_app, g, request, has_request_context
+from app.utils import instrumentation
+from app.utils.cache import TTLCache
+from app.utils.query_inspector import fingerprint
+from app.utils.request_id import get_request_id
+
+logger = logging.getLogger('app.slow_query')
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+_MAX_PARAMS_LENGTH = 500
+
+_explained = TTLCache(ttl=600)
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+_settings = {}
+_handler_lock = threading.Lock()
+
+
+def call_site():
+    """Primer frame (desde el más interno) que pertenece a la aplicación."""
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(_APP_DIR) and not frame.filename.startswith(_UTILS_DIR):
+            return f"{os.path.relpath(frame.filename, os.path.dirname(_APP_DIR))}:{frame.lineno} in {frame.name}"
+    return None
+
+
+def _mask(parameters):
+    """Oculta las contraseñas de un dict o de cada dict de una lista (executemany)."""
+    if isinstance(parameters, dict):
+        return {
+            key: '***' if 'password' in str(key).lower() else _mask(value)
+            for key, value in parameters.items()
+        }
+    if isinstance(parameters, list):
+        return [_mask(item) for item in parameters]
+    if isinstance(parameters, tuple):
+        return tuple(_mask(item) for item in parameters)
+    return parameters
+
+
+def _safe_params(parameters):
+    """Parámetros para el log, sin contraseñas y truncados."""
+    text = repr(_mask(parameters))
+    if len(text) > _MAX_PARAMS_LENGTH:
+        text = text[:_MAX_PARAMS_LENGTH] + '...'
+    return text
+
+
+def _write(entry):
+    logger.info(json.dumps(entry, default=str, ensure_ascii=False))
+
+
+def _after_query(conn, cursor, statement, parameters, context, executemany, elapsed):
+    if conn.info.get('slow_query_skip'):
+        return
+
+    elapsed_ms = elapsed * 1000
+    if elapsed_ms < _settings['threshold_ms']:
+        return
+
+    in_request = has_request_context()
+    entry = {
+        'duration_ms': round(elapsed_ms, 2),
+        'statement': statement,
+        'params': _safe_params(parameters),
+        'executemany': executemany,
+        'endpoint': request.endpoint if in_request else None,
+        'path': request.path if in_request else None,
+        'request_id': get_request_id(),
+        'call_site': call_site(),
+    }
+    _write(entry)
+
+    if in_request and not executemany and statement.lstrip()[:6].upper() == 'SELECT':
+        worst = g.get('_slow_select')
+        if worst is None or worst[0] < elapsed_ms:
+            g._slow_select = (elapsed_ms, statement, parameters, entry['request_id'])
+
+
+def _explain(app, statement, parameters, request_id):
+    try:
+        with app.app_context():
+            from app import db
+            with db.engine.connect() as conn:
+                conn.info['slow_query_skip'] = True
+                try:
+                    plan = conn.exec_driver_sql(
+                        'EXPLAIN (ANALYZE, BUFFERS) ' + statement, parameters
+                    ).scalars().all()
+                finally:
+                    # EXPLAIN ANALYZE ejecuta la sentencia: nunca se confirma nada
+                    conn.rollback()
+                    conn.info.pop('slow_query_skip', None)
+        _write({'request_id': request_id, 'statement': statement, 'explain': '\n'.join(plan)})
+    except Exception:
+        logger.exception("No se pudo obtener el plan de una consulta lenta")
+
+
+def _sample_explain(exc):
+    worst = g.pop('_slow_select', None)
+    if worst is None or random.random() >= _settings['explain_rate']:
+        return
+
+    _, statement, parameters, request_id = worst
+    shape = fingerprint(statement)
+    if shape in _explained:
+        return
+    _explained.set(shape, True)
+    app = current_app._get_current_object()
+    _executor.submit(_explain, app, statement, parameters, request_id)
+
+
+def _configure_handler(app):
+    with _handler_lock:
+        if logger.handlers:
+            return
+        path = app.config.get('SLOW_QUERY_LOG_PATH', 'logs/slow_queries.log')
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024),
+            backupCount=app.config.get('SLOW_QUERY_LOG_BACKUPS', 5),
+            encoding='utf-8'
+        )
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+def init_slow_query_log(app):
+    """Activa el registro si SLOW_QUERY_MS es mayor que cero."""
+    threshold_ms = app.config.get('SLOW_QUERY_MS', 0)
+    if threshold_ms <= 0:
+        return
+
+    _settings['threshold_ms'] = threshold_ms
+    _settings['explain_rate'] = app.config.get('SLOW_QUERY_EXPLAIN_RATE', 0.0)
+    _configure_handler(app)
+
+    if _settings['explain_rate'] > 0:
+        app.teardown_request(_sample_explain)
+
+    instrumentation.on_query(_after_query)
@@ -0,0 +1,121 @@
+"""
+Respuestas en streaming (CSV y NDJSON) para exportaciones grandes.
+
+Las filas salen de un cursor de servidor (`yield_per`) y se escriben a la
+respuesta desde un generador, agrupadas en bloques de unos KiB: la memoria
+del worker no depende del número de filas. stream_with_context mantiene el
+contexto de la petición (sesión, g.db_route) mientras se genera el cuerpo.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from flask import Response, current_app, request, stream_with_context
+
+JSON = 'application/json'
+CSV = 'text/csv'
+NDJSON = 'application/x-ndjson'
+FORMATS = {'csv': CSV, 'ndjson': NDJSON}
+
+# Tamaño aproximado de cada bloque que se entrega al servidor WSGI
+CHUNK_BYTES = 64 * 1024
+
+
+def requested_format(default=None):
+    """
+    'csv' o 'ndjson' según ?format= o la cabecera Accept; si no, `default`
+    (None es JSON). Se respetan los q de Accept: el formato solo gana si el
+    cliente lo prefiere a la representación por defecto, que se ofrece
+    primero y se queda con los empates (*/*, sin cabecera).
+    """
+    fmt = request.args.get('format')
+    if fmt in FORMATS:
+        return fmt
+    preferred = FORMATS.get(default, JSON)
+    offers = [preferred] + [mimetype for mimetype in FORMATS.values() if mimetype != preferred]
+    best = request.accept_mimetypes.best_match(offers)
+    for name, mimetype in FORMATS.items():
+        if best == mimetype:
+            return name
+    return default
+
+
+def stream_results(session, statement, params=None, yield_per=None, scalars=False):
+    """
+    Ejecuta `statement` con cursor de servidor y devuelve un iterador de
+    filas (u objetos del modelo con `scalars`). La consulta se lanza ya (los
+    errores saltan antes de empezar a responder); el cursor se cierra al
+    agotar o abandonar el iterador.
+    """
+    yield_per = yield_per or current_app.config['EXPORT_YIELD_PER']
+    result = session.execute(statement, params or {}, execution_options={'yield_per': yield_per})
+    if scalars:
+        result = result.scalars()
+
+    def rows():
+        try:
+            yield from result
+        finally:
+            result.close()
+    return rows()
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} no es serializable")
+
+
+def ndjson_lines(records, dumps=None):
+    dumps = dumps or (lambda record: json.dumps(record, default=_json_default, ensure_ascii=False))
+    for record in records:
+        yield dumps(record) + '\n'
+
+
+def csv_lines(records, columns):
+    """Cabecera y filas CSV; cada registro es una secuencia en el orden de `columns`."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for record in records:
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _chunks(lines):
+    chunk, size = [], 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield ''.join(chunk).encode('utf-8')
+            chunk, size = [], 0
+    if chunk:
+        yield ''.join(chunk).encode('utf-8')
+
+
+def stream_response(lines, fmt, filename=None):
+    """Response en streaming con las líneas ya formateadas de `fmt`."""
+    response = Response(stream_with_context(_chunks(lines)), mimetype=FORMATS[fmt])
+    if filename:
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    # Que un proxy (nginx) no acumule la respuesta entera antes de enviarla
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def ndjson_response(session, statement, schema, yield_per=None):
+    """
+    Listado en NDJSON: recorre la consulta ORM con cursor de servidor y
+    serializa cada objeto con `schema` (sin many=True) al vuelo. Usa el
+    mismo proveedor JSON que jsonify para que cada línea sea igual a un
+    elemento de la respuesta JSON normal.
+    """
+    rows = stream_results(session, statement, yield_per=yield_per, scalars=True)
+    return stream_response(ndjson_lines((schema.dump(row) for row in rows), dumps=current_app.json.dumps), 'ndjson')
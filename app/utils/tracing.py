@@ -0,0 +1,291 @@
+"""
+Trazas por petición con spans al estilo OpenTelemetry.
+
+Cada petición abre un span raíz y, dentro de él, se crean automáticamente
+spans para la verificación del JWT, el hook de auditoría `after_begin`, cada
+sentencia SQL, los commits y la serialización con Marshmallow. El trace ID
+se toma de la cabecera `traceparent` (W3C) si llega y se devuelve en
+`traceparent` y `X-Trace-Id`.
+
+Exportadores: 'memory' (últimos spans en memoria, útil en pruebas) o 'file'
+(una línea JSON por span en TRACING_PATH). Con TRACING='off' `span()` no hace
+nada.
+"""
+import contextvars
+import functools
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from flask import g, request
+from sqlalchemy import event
+from app.utils import instrumentation
+
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+MAX_STATEMENT_LENGTH = 1000
+
+_current = contextvars.ContextVar('current_span', default=None)
+_state = {'exporter': None}
+
+
+class Span:
+    """Campos equivalentes a los de un span de OpenTelemetry."""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_span_id', 'name', 'kind',
+                 'start_time_unix_nano', 'end_time_unix_nano', 'attributes', 'status', 'status_message')
+
+    def __init__(self, name, trace_id, parent_span_id=None, kind='INTERNAL', attributes=None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.kind = kind
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano = None
+        self.attributes = dict(attributes or {})
+        self.status = 'UNSET'
+        self.status_message = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        self.status = 'ERROR'
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        if self.end_time_unix_nano is None:
+            self.end_time_unix_nano = time.time_ns()
+            exporter = _state['exporter']
+            if exporter is not None:
+                exporter.export(self)
+
+    @property
+    def duration_ms(self):
+        end = self.end_time_unix_nano or time.time_ns()
+        return (end - self.start_time_unix_nano) / 1e6
+
+    def to_dict(self):
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_span_id,
+            'name': self.name,
+            'kind': f'SPAN_KIND_{self.kind}',
+            'startTimeUnixNano': self.start_time_unix_nano,
+            'endTimeUnixNano': self.end_time_unix_nano,
+            'attributes': self.attributes,
+            'status': {'code': f'STATUS_CODE_{self.status}', 'message': self.status_message},
+        }
+
+
+class InMemoryExporter:
+
+    def __init__(self, maxlen=10000):
+        self._spans = deque(maxlen=maxlen)
+
+    def export(self, span):
+        self._spans.append(span)
+
+    def get_finished_spans(self, trace_id=None):
+        return [s for s in list(self._spans) if trace_id is None or s.trace_id == trace_id]
+
+    def clear(self):
+        self._spans.clear()
+
+
+class JsonLinesExporter:
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as fh:
+                fh.write(line + '\n')
+
+
+def get_exporter():
+    return _state['exporter']
+
+
+def current_span():
+    return _current.get()
+
+
+def start_span(name, kind='INTERNAL', attributes=None, activate=True):
+    """
+    Abre un span hijo del actual (o uno raíz con un trace nuevo). Con
+    `activate` pasa a ser el span actual; devuelve (span, token).
+    """
+    parent = _current.get()
+    if parent is not None:
+        new = Span(name, parent.trace_id, parent.span_id, kind, attributes)
+    else:
+        new = Span(name, secrets.token_hex(16), None, kind, attributes)
+    token = _current.set(new) if activate else None
+    return new, token
+
+
+def finish_span(new, token=None):
+    new.end()
+    if token is not None:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name, **attributes):
+    if _state['exporter'] is None:
+        yield None
+        return
+
+    new, token = start_span(name, attributes=attributes)
+    try:
+        yield new
+    except Exception as e:
+        new.record_error(e)
+        raise
+    finally:
+        finish_span(new, token)
+
+
+def traced(name):
+    """Decorador: ejecuta la función dentro de un span."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- Petición HTTP ---
+
+def _start_request():
+    match = TRACEPARENT.match(request.headers.get('traceparent', ''))
+    attributes = {
+        'http.request.method': request.method,
+        'url.path': request.path,
+        'http.route': request.url_rule.rule if request.url_rule else None,
+        'flask.endpoint': request.endpoint,
+    }
+    trace_id, parent_span_id = match.groups() if match else (secrets.token_hex(16), None)
+    root = Span(f"{request.method} {request.endpoint}", trace_id, parent_span_id, 'SERVER', attributes)
+    g._trace = (root, _current.set(root))
+
+
+def _expose(response):
+    trace = g.get('_trace')
+    if trace is not None:
+        root = trace[0]
+        root.set_attribute('http.response.status_code', response.status_code)
+        if response.status_code >= 500:
+            root.status = 'ERROR'
+        response.headers['traceparent'] = f"00-{root.trace_id}-{root.span_id}-01"
+        response.headers['X-Trace-Id'] = root.trace_id
+    return response
+
+
+def _finish_request(exc):
+    trace = g.pop('_trace', None)
+    if trace is None:
+        return
+    root, token = trace
+    if exc is not None:
+        root.record_error(exc)
+    finish_span(root, token)
+
+
+# --- SQL ---
+
+def _start_query_span(conn, cursor, statement, parameters, context, executemany):
+    if context is None or _current.get() is None:
+        return
+    context._trace_span, _ = start_span('db.query', 'CLIENT', {
+        'db.system': 'postgresql',
+        'db.statement': statement[:MAX_STATEMENT_LENGTH],
+        'db.executemany': executemany,
+    }, activate=False)
+
+
+def _end_query_span(conn, cursor, statement, parameters, context, executemany, elapsed):
+    new = getattr(context, '_trace_span', None)
+    if new is not None:
+        new.set_attribute('db.rowcount', cursor.rowcount)
+        new.end()
+
+
+def _handle_error(exception_context):
+    new = getattr(exception_context.execution_context, '_trace_span', None)
+    if new is not None:
+        new.record_error(exception_context.original_exception)
+        new.end()
+
+
+def _before_commit(session):
+    if _current.get() is not None:
+        session.info['_trace_commit'] = start_span('db.commit')
+
+
+def _end_commit(session):
+    pending = session.info.pop('_trace_commit', None)
+    if pending is not None:
+        finish_span(*pending)
+
+
+def _end_commit_with_error(session, previous_transaction):
+    pending = session.info.get('_trace_commit')
+    if pending is not None:
+        pending[0].status = 'ERROR'
+        _end_commit(session)
+
+
+# --- Marshmallow y JWT ---
+
+def _serialize_span(schema, many):
+    if _current.get() is None:
+        return None
+    return span(f"serialize {type(schema).__name__}", many=bool(many if many is not None else schema.many))
+
+
+def _wrap_jwt_verification():
+    from flask_jwt_extended import view_decorators
+    original = view_decorators.verify_jwt_in_request
+
+    @functools.wraps(original)
+    def verify_jwt_in_request(*args, **kwargs):
+        with span('jwt.verify'):
+            return original(*args, **kwargs)
+
+    view_decorators.verify_jwt_in_request = verify_jwt_in_request
+
+
+def init_tracing(app, session):
+    """Activa las trazas si TRACING es 'memory' o 'file'."""
+    mode = app.config.get('TRACING', 'off')
+    if mode == 'memory':
+        _state['exporter'] = InMemoryExporter()
+    elif mode == 'file':
+        _state['exporter'] = JsonLinesExporter(app.config.get('TRACING_PATH', 'logs/traces.jsonl'))
+    else:
+        return
+
+    app.before_request(_start_request)
+    app.after_request(_expose)
+    app.teardown_request(_finish_request)
+
+    instrumentation.on_query(_end_query_span, before=_start_query_span, error=_handle_error)
+    instrumentation.on_dump(_serialize_span)
+    if not event.contains(session, 'before_commit', _before_commit):
+        event.listen(session, 'before_commit', _before_commit)
+        event.listen(session, 'after_commit', _end_commit)
+        event.listen(session, 'after_soft_rollback', _end_commit_with_error)
+        _wrap_jwt_verification()
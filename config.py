@@ -1,4 +1,4 @@
-from decouple import config
+from decouple import config, Csv
 from sqlalchemy.pool import NullPool
 
 class Config:
@@ -11,5 +11,102 @@ class Config:
     }
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Réplicas de solo lectura (separadas por comas) para las vistas con @replica_read;
+    # cada una se registra como bind "replica_<n>"
+    SQLALCHEMY_REPLICA_URIS = config("SQLALCHEMY_REPLICA_URIS", default="", cast=Csv())
+    SQLALCHEMY_BINDS = {f"replica_{i}": uri for i, uri in enumerate(SQLALCHEMY_REPLICA_URIS)}
+
+    # Segundos que un usuario lee del primario después de escribir
+    REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", default=5, cast=int)
     SECRET_KEY = config("SECRET_KEY")
-    JWT_SECRET_KEY = config("SECRET_KEY")
\ No newline at end of file
+    JWT_SECRET_KEY = config("SECRET_KEY")
+
+    # Precalcula la siguiente pregunta del diagnóstico para ambos resultados
+    DIAGNOSTIC_PREFETCH = config("DIAGNOSTIC_PREFETCH", default=True, cast=bool)
+
+    # Permite sesiones de diagnóstico con estado en token firmado (sin escrituras por respuesta)
+    DIAGNOSTIC_STATELESS = config("DIAGNOSTIC_STATELESS", default=False, cast=bool)
+    # Segundos de validez de cada token de estado del diagnóstico
+    DIAGNOSTIC_STATE_MAX_AGE = config("DIAGNOSTIC_STATE_MAX_AGE", default=3600, cast=int)
+
+    # Histogramas por endpoint (latencia, SQL, serialización) expuestos en /metrics.
+    # El scraper se autentica con "Authorization: Bearer <METRICS_TOKEN>" (vacío: sin /metrics)
+    METRICS_ENABLED = config("METRICS_ENABLED", default=False, cast=bool)
+    METRICS_ROUTE = config("METRICS_ROUTE", default="/metrics")
+    METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+    # Detector de N+1 y presupuestos de consultas: 'off', 'warn' o 'raise' (desarrollo y pruebas)
+    QUERY_INSPECTOR = config("QUERY_INSPECTOR", default="off")
+    N_PLUS_ONE_THRESHOLD = config("N_PLUS_ONE_THRESHOLD", default=5, cast=int)
+
+    # Log rotativo de consultas lentas (0 desactiva) y muestreo de EXPLAIN (ANALYZE, BUFFERS)
+    SLOW_QUERY_MS = config("SLOW_QUERY_MS", default=200, cast=float)
+    SLOW_QUERY_LOG_PATH = config("SLOW_QUERY_LOG_PATH", default="logs/slow_queries.log")
+    SLOW_QUERY_LOG_MAX_BYTES = config("SLOW_QUERY_LOG_MAX_BYTES", default=10 * 1024 * 1024, cast=int)
+    SLOW_QUERY_LOG_BACKUPS = config("SLOW_QUERY_LOG_BACKUPS", default=5, cast=int)
+    SLOW_QUERY_EXPLAIN_RATE = config("SLOW_QUERY_EXPLAIN_RATE", default=0.0, cast=float)
+
+    # Perfilado de una petición con la cabecera X-Profile-Token (vacío lo desactiva)
+    PROFILING_TOKEN = config("PROFILING_TOKEN", default="")
+    PROFILING_DIR = config("PROFILING_DIR", default="profiles")
+    PROFILING_INTERVAL_MS = config("PROFILING_INTERVAL_MS", default=5, cast=float)
+
+    # Trazas por petición: 'off', 'memory' o 'file' (una línea JSON por span en TRACING_PATH)
+    TRACING = config("TRACING", default="off")
+    TRACING_PATH = config("TRACING_PATH", default="logs/traces.jsonl")
+
+    # Pico de memoria por endpoint con tracemalloc (solo diagnóstico). Presupuestos en MiB:
+    # "user_bp.get_all_users=64,enrollment.get_all_enrollments=128"
+    MEMORY_TRACKING = config("MEMORY_TRACKING", default=False, cast=bool)
+    MEMORY_BUDGETS = config("MEMORY_BUDGETS", default="")
+    MEMORY_DEFAULT_BUDGET_MB = config("MEMORY_DEFAULT_BUDGET_MB", default=0, cast=float)
+    MEMORY_TOP_SITES = config("MEMORY_TOP_SITES", default=10, cast=int)
+    MEMORY_TRACE_FRAMES = config("MEMORY_TRACE_FRAMES", default=15, cast=int)
+
+    # Especificación OpenAPI generada con `flask openapi build`; SWAGGER_UI=False quita la UI
+    # (el documento estático se sigue sirviendo en /apispec_1.json)
+    SWAGGER_UI = config("SWAGGER_UI", default=True, cast=bool)
+    OPENAPI_SPEC_PATH = config("OPENAPI_SPEC_PATH", default="static/openapi.json")
+
+    # Registra los blueprints desde el manifiesto de `flask startup manifest` e importa
+    # cada módulo de rutas en su primera petición
+    LAZY_BLUEPRINTS = config("LAZY_BLUEPRINTS", default=False, cast=bool)
+    ROUTE_MANIFEST_PATH = config("ROUTE_MANIFEST_PATH", default="static/routes.json")
+
+    # Cursos cuyo grafo se precarga al arrancar (gunicorn.conf.py)
+    PREWARM_MAX_COURSES = config("PREWARM_MAX_COURSES", default=200, cast=int)
+
+    # Segundos que se guarda la primera respuesta de cada Idempotency-Key
+    IDEMPOTENCY_TTL_SECONDS = config("IDEMPOTENCY_TTL_SECONDS", default=24 * 3600, cast=int)
+    # Segundos que una petición en curso retiene su clave; por encima de GUNICORN_TIMEOUT
+    # (60 s), para que el reintento de una petición cuyo worker murió no reciba 409
+    IDEMPOTENCY_LEASE_SECONDS = config("IDEMPOTENCY_LEASE_SECONDS", default=90, cast=int)
+
+    # Máximo de intentos por petición en POST /api/exercise-attempts/batch
+    ATTEMPT_BATCH_MAX_ITEMS = config("ATTEMPT_BATCH_MAX_ITEMS", default=500, cast=int)
+
+    # Matrícula masiva: rol de las cuentas que se crean y hilos para el hash bcrypt
+    # (0 = min(4, núcleos))
+    ROSTER_STUDENT_ROLE = config("ROSTER_STUDENT_ROLE", default="estudiante")
+    ROSTER_MAX_STUDENTS = config("ROSTER_MAX_STUDENTS", default=2000, cast=int)
+    # Cuentas creadas por petición con create_missing (un hash bcrypt cada una; ver USER_IMPORT_MAX_ROWS)
+    ROSTER_MAX_NEW_ACCOUNTS = config("ROSTER_MAX_NEW_ACCOUNTS", default=200, cast=int)
+    PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", default=0, cast=int)
+
+    # Alta masiva de usuarios (CLI `flask users import` y POST /api/users/import):
+    # filas por COPY y rol que puede usar el endpoint
+    USER_IMPORT_BATCH_SIZE = config("USER_IMPORT_BATCH_SIZE", default=1000, cast=int)
+    # Cuentas nuevas por petición en el endpoint: cada una es un hash bcrypt (~0,2 s
+    # con BCRYPT_LOG_ROUNDS=12) y todo debe caber en el timeout de gunicorn (60 s)
+    # aunque el worker no disponga de varios núcleos. Más, con la CLI.
+    USER_IMPORT_MAX_ROWS = config("USER_IMPORT_MAX_ROWS", default=200, cast=int)
+    ADMIN_ROLE = config("ADMIN_ROLE", default="admin")
+
+    # Filas por lote del cursor de servidor en las exportaciones en streaming
+    EXPORT_YIELD_PER = config("EXPORT_YIELD_PER", default=1000, cast=int)
+
+    # `flask analytics export`: filas por RecordBatch y margen de la marca de agua
+    # respecto al reloj de la base (transacciones aún sin confirmar)
+    EXPORT_BATCH_ROWS = config("EXPORT_BATCH_ROWS", default=50000, cast=int)
+    EXPORT_WATERMARK_LAG_SECONDS = config("EXPORT_WATERMARK_LAG_SECONDS", default=60, cast=int)
@@ -0,0 +1,24 @@
+import multiprocessing
+from decouple import config as env
+
+wsgi_app = "wsgi:app"
+bind = env("GUNICORN_BIND", default="0.0.0.0:8000")
+workers = env("GUNICORN_WORKERS", default=multiprocessing.cpu_count() * 2 + 1, cast=int)
+timeout = env("GUNICORN_TIMEOUT", default=60, cast=int)
+
+# Carga la app en el master y la precalienta antes de crear los workers,
+# que heredan mappers, cachés y módulos copy-on-write
+preload_app = env("GUNICORN_PRELOAD", default=True, cast=bool)
+
+
+def when_ready(server):
+    if preload_app:
+        from app.utils.prewarm import prewarm
+        prewarm(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    # Sin preload cada worker se precalienta a sí mismo antes de aceptar peticiones
+    if not preload_app:
+        from app.utils.prewarm import prewarm
+        prewarm(worker.wsgi, freeze=False)
@@ -0,0 +1,23 @@
+-- Un estado de conocimiento por (matrícula, subtema) y un progreso por
+-- (matrícula, dominio). finish_diagnostic hace upsert con ON CONFLICT sobre
+-- estas claves. Se conservan las filas más recientes de los duplicados.
+
+DELETE FROM student_knowledge_state a
+USING student_knowledge_state b
+WHERE a.enr_id = b.enr_id AND a.sub_id = b.sub_id AND a.sks_id < b.sks_id;
+
+DELETE FROM student_domain_progress a
+USING student_domain_progress b
+WHERE a.enr_id = b.enr_id AND a.dom_id = b.dom_id AND a.sdp_id < b.sdp_id;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_sks_enrollment_subtopic') THEN
+        ALTER TABLE student_knowledge_state
+            ADD CONSTRAINT uq_sks_enrollment_subtopic UNIQUE (enr_id, sub_id);
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_sdp_enrollment_domain') THEN
+        ALTER TABLE student_domain_progress
+            ADD CONSTRAINT uq_sdp_enrollment_domain UNIQUE (enr_id, dom_id);
+    END IF;
+END $$;
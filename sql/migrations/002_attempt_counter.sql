@@ -0,0 +1,11 @@
+-- Contadores de número de intento (attempt_numbering). Las filas se crean
+-- al primer uso partiendo del máximo existente, así que no hace falta
+-- rellenarla.
+
+CREATE TABLE IF NOT EXISTS attempt_counter (
+    kind VARCHAR(20) NOT NULL,
+    enr_id INTEGER NOT NULL REFERENCES enrollment (enr_id) ON DELETE CASCADE,
+    item_id INTEGER NOT NULL,
+    last_no INTEGER NOT NULL,
+    PRIMARY KEY (kind, enr_id, item_id)
+);
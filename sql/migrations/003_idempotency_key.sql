@@ -0,0 +1,16 @@
+-- Almacén de Idempotency-Key compartido por todos los workers
+-- (app/utils/idempotency.py).
+
+CREATE TABLE IF NOT EXISTS idempotency_key (
+    endpoint VARCHAR(100) NOT NULL,
+    scope VARCHAR(200) NOT NULL,
+    key VARCHAR(128) NOT NULL,
+    body_hash VARCHAR(64) NOT NULL,
+    status_code INTEGER,
+    headers JSONB,
+    body BYTEA,
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+    PRIMARY KEY (endpoint, scope, key)
+);
+
+CREATE INDEX IF NOT EXISTS ix_idempotency_key_created_at ON idempotency_key (created_at);
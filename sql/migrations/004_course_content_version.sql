@@ -0,0 +1,108 @@
+-- Versión del contenido de cada curso (app/services/knowledge_graph.py).
+-- Los workers cachean el grafo de prerrequisitos por (curso, versión): al
+-- cambiar un dominio, subtema o prerrequisito el trigger sube la versión y
+-- todos los workers reconstruyen el grafo en su siguiente lectura. Un
+-- subtema también sube la versión de los cursos que lo tienen como
+-- prerrequisito, porque su nombre aparece en el grafo de esos cursos.
+--
+-- Los triggers son por sentencia, con tablas de transición: una importación
+-- o un clonado que inserta miles de filas sube la versión de cada curso una
+-- sola vez. Postgres no admite tablas de transición en un trigger de varios
+-- eventos, así que hay uno por evento.
+
+ALTER TABLE course ADD COLUMN IF NOT EXISTS cou_content_version INTEGER NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION bump_course_content_version() RETURNS trigger AS $$
+DECLARE
+    cou_ids INTEGER[] := '{}';     -- cursos de los dominios
+    dom_ids INTEGER[] := '{}';     -- dominios de los subtemas
+    sub_ids INTEGER[] := '{}';     -- subtemas con prerrequisitos cambiados
+    prereq_ids INTEGER[] := '{}';  -- subtemas que pueden ser prerrequisito en otros cursos
+BEGIN
+    IF TG_TABLE_NAME = 'domain' THEN
+        IF TG_OP <> 'INSERT' THEN
+            cou_ids := cou_ids || ARRAY(SELECT cou_id FROM old_rows);
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            cou_ids := cou_ids || ARRAY(SELECT cou_id FROM new_rows);
+        END IF;
+    ELSIF TG_TABLE_NAME = 'subtopic' THEN
+        IF TG_OP <> 'INSERT' THEN
+            dom_ids := dom_ids || ARRAY(SELECT dom_id FROM old_rows);
+            prereq_ids := prereq_ids || ARRAY(SELECT sub_id FROM old_rows);
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            dom_ids := dom_ids || ARRAY(SELECT dom_id FROM new_rows);
+            prereq_ids := prereq_ids || ARRAY(SELECT sub_id FROM new_rows);
+        END IF;
+    ELSE
+        IF TG_OP <> 'INSERT' THEN
+            sub_ids := sub_ids || ARRAY(SELECT sub_id FROM old_rows);
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            sub_ids := sub_ids || ARRAY(SELECT sub_id FROM new_rows);
+        END IF;
+    END IF;
+
+    UPDATE course SET cou_content_version = cou_content_version + 1
+    WHERE cou_id IN (
+        SELECT unnest(cou_ids)
+        UNION
+        SELECT d.cou_id FROM domain d WHERE d.dom_id = ANY(dom_ids)
+        UNION
+        SELECT d.cou_id
+        FROM subtopic s
+        JOIN domain d ON d.dom_id = s.dom_id
+        WHERE s.sub_id = ANY(sub_ids)
+        UNION
+        SELECT d.cou_id
+        FROM subtopic_dependency sd
+        JOIN subtopic s ON s.sub_id = sd.sub_id
+        JOIN domain d ON d.dom_id = s.dom_id
+        WHERE sd.prerequisite_id = ANY(prereq_ids)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_domain_content_version ON domain;
+DROP TRIGGER IF EXISTS trg_domain_content_version_ins ON domain;
+DROP TRIGGER IF EXISTS trg_domain_content_version_upd ON domain;
+DROP TRIGGER IF EXISTS trg_domain_content_version_del ON domain;
+CREATE TRIGGER trg_domain_content_version_ins
+    AFTER INSERT ON domain REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_course_content_version();
+CREATE TRIGGER trg_domain_content_version_upd
+    AFTER UPDATE ON domain REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_course_content_version();
+CREATE TRIGGER trg_domain_content_version_del
+    AFTER DELETE ON domain REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_course_content_version();
+
+DROP TRIGGER IF EXISTS trg_subtopic_content_version ON subtopic;
+DROP TRIGGER IF EXISTS trg_subtopic_content_version_ins ON subtopic;
+DROP TRIGGER IF EXISTS trg_subtopic_content_version_upd ON subtopic;
+DROP TRIGGER IF EXISTS trg_subtopic_content_version_del ON subtopic;
+CREATE TRIGGER trg_subtopic_content_version_ins
+    AFTER INSERT ON subtopic REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_course_content_version();
+CREATE TRIGGER trg_subtopic_content_version_upd
+    AFTER UPDATE ON subtopic REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_course_content_version();
+CREATE TRIGGER trg_subtopic_content_version_del
+    AFTER DELETE ON subtopic REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_course_content_version();
+
+DROP TRIGGER IF EXISTS trg_subtopic_dependency_content_version ON subtopic_dependency;
+DROP TRIGGER IF EXISTS trg_subtopic_dependency_content_version_ins ON subtopic_dependency;
+DROP TRIGGER IF EXISTS trg_subtopic_dependency_content_version_upd ON subtopic_dependency;
+DROP TRIGGER IF EXISTS trg_subtopic_dependency_content_version_del ON subtopic_dependency;
+CREATE TRIGGER trg_subtopic_dependency_content_version_ins
+    AFTER INSERT ON subtopic_dependency REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_course_content_version();
+CREATE TRIGGER trg_subtopic_dependency_content_version_upd
+    AFTER UPDATE ON subtopic_dependency REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_course_content_version();
+CREATE TRIGGER trg_subtopic_dependency_content_version_del
+    AFTER DELETE ON subtopic_dependency REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_course_content_version();
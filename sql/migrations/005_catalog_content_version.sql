@@ -0,0 +1,76 @@
+-- Los ejercicios y su asignación a evaluaciones también suben
+-- course.cou_content_version (ver 004): la lista de ejercicios de cada
+-- evaluación que cachean los workers (app/services/catalog_cache.py) se
+-- guarda con esa versión. Un ejercicio sube la versión del curso de su
+-- subtema y la de los cursos de las evaluaciones que lo usan. Como en 004,
+-- triggers por sentencia con tablas de transición.
+
+CREATE OR REPLACE FUNCTION bump_course_catalog_version() RETURNS trigger AS $$
+DECLARE
+    sub_ids INTEGER[] := '{}';  -- subtemas de los ejercicios
+    ex_ids INTEGER[] := '{}';   -- ejercicios que pueden estar en evaluaciones
+    asm_ids INTEGER[] := '{}';  -- evaluaciones con ejercicios asignados o quitados
+BEGIN
+    IF TG_TABLE_NAME = 'exercise' THEN
+        IF TG_OP <> 'INSERT' THEN
+            sub_ids := sub_ids || ARRAY(SELECT sub_id FROM old_rows);
+            ex_ids := ex_ids || ARRAY(SELECT ex_id FROM old_rows);
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            sub_ids := sub_ids || ARRAY(SELECT sub_id FROM new_rows);
+            ex_ids := ex_ids || ARRAY(SELECT ex_id FROM new_rows);
+        END IF;
+    ELSE
+        IF TG_OP <> 'INSERT' THEN
+            asm_ids := asm_ids || ARRAY(SELECT asm_id FROM old_rows);
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            asm_ids := asm_ids || ARRAY(SELECT asm_id FROM new_rows);
+        END IF;
+    END IF;
+
+    UPDATE course SET cou_content_version = cou_content_version + 1
+    WHERE cou_id IN (
+        SELECT d.cou_id
+        FROM subtopic s
+        JOIN domain d ON d.dom_id = s.dom_id
+        WHERE s.sub_id = ANY(sub_ids)
+        UNION
+        SELECT a.cou_id
+        FROM assessment_exercise ae
+        JOIN assessment a ON a.asm_id = ae.asm_id
+        WHERE ae.ex_id = ANY(ex_ids)
+        UNION
+        SELECT a.cou_id FROM assessment a WHERE a.asm_id = ANY(asm_ids)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_exercise_content_version ON exercise;
+DROP TRIGGER IF EXISTS trg_exercise_content_version_ins ON exercise;
+DROP TRIGGER IF EXISTS trg_exercise_content_version_upd ON exercise;
+DROP TRIGGER IF EXISTS trg_exercise_content_version_del ON exercise;
+CREATE TRIGGER trg_exercise_content_version_ins
+    AFTER INSERT ON exercise REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_course_catalog_version();
+CREATE TRIGGER trg_exercise_content_version_upd
+    AFTER UPDATE ON exercise REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_course_catalog_version();
+CREATE TRIGGER trg_exercise_content_version_del
+    AFTER DELETE ON exercise REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_course_catalog_version();
+
+DROP TRIGGER IF EXISTS trg_assessment_exercise_content_version ON assessment_exercise;
+DROP TRIGGER IF EXISTS trg_assessment_exercise_content_version_ins ON assessment_exercise;
+DROP TRIGGER IF EXISTS trg_assessment_exercise_content_version_upd ON assessment_exercise;
+DROP TRIGGER IF EXISTS trg_assessment_exercise_content_version_del ON assessment_exercise;
+CREATE TRIGGER trg_assessment_exercise_content_version_ins
+    AFTER INSERT ON assessment_exercise REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_course_catalog_version();
+CREATE TRIGGER trg_assessment_exercise_content_version_upd
+    AFTER UPDATE ON assessment_exercise REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_course_catalog_version();
+CREATE TRIGGER trg_assessment_exercise_content_version_del
+    AFTER DELETE ON assessment_exercise REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_course_catalog_version();
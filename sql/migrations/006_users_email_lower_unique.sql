@@ -0,0 +1,20 @@
+-- Un email por cuenta sin distinguir mayúsculas. La matrícula masiva
+-- (app/services/roster.py) crea cuentas con INSERT ... ON CONFLICT sobre
+-- lower(usr_email): sin este índice dos rosters simultáneos, o un roster y
+-- un alta manual, podían crear dos cuentas para Ana@x.com y ana@x.com.
+-- Los duplicados existentes se deben fusionar a mano (tienen matrículas).
+
+DO $$
+DECLARE
+    duplicated INTEGER;
+BEGIN
+    SELECT count(*) INTO duplicated
+    FROM (SELECT 1 FROM users GROUP BY lower(usr_email) HAVING count(*) > 1) d;
+    IF duplicated > 0 THEN
+        RAISE EXCEPTION USING MESSAGE = duplicated || ' emails están repetidos con distinta capitalización en users; '
+            'fusiona esas cuentas antes de aplicar 006';
+    END IF;
+END;
+$$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_users_email_lower ON users (lower(usr_email));
@@ -0,0 +1,91 @@
+"""
+Fixtures de las pruebas de integración.
+
+Las vistas usan SQL de PostgreSQL (ON CONFLICT, funciones, triggers), así
+que las pruebas necesitan una base real: TEST_DATABASE_URL debe apuntar a
+una base desechable, que se vacía y se vuelve a crear en cada ejecución.
+Sin ella las pruebas se omiten.
+
+    TEST_DATABASE_URL=postgresql://localhost/app_test python -m pytest
+"""
+import importlib
+import os
+import pkgutil
+import pytest
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+if TEST_DATABASE_URL:
+    # Config lee el entorno al importarse: tiene que quedar listo antes de importar app
+    os.environ['DATABASE_URL'] = TEST_DATABASE_URL
+    os.environ.setdefault('SECRET_KEY', 'test-secret-key-with-at-least-32-bytes')
+    os.environ.setdefault('SQLALCHEMY_REPLICA_URIS', '')
+    # Los presupuestos de @query_budget fallan la petición en vez de solo avisar
+    os.environ['QUERY_INSPECTOR'] = 'raise'
+    # Sin hilos de precálculo que consulten por su cuenta durante las pruebas
+    os.environ['DIAGNOSTIC_PREFETCH'] = 'False'
+
+SEED = """
+    INSERT INTO roles (rol_id, rol_name) VALUES (1, 'admin'), (2, 'estudiante');
+    INSERT INTO users (usr_id, usr_first_name, usr_last_name, usr_email, usr_password, rol_id, usr_status)
+    VALUES (1, 'Ana', 'Docente', 'ana@example.com', 'x', 1, 'activo'),
+           (2, 'Luis', 'Alumno', 'luis@example.com', 'x', 2, 'activo');
+    INSERT INTO course (cou_id, cou_course_name, cou_description, cou_difficulty, cou_visibility, cou_created_by, cou_status)
+    VALUES (1, 'Matemáticas', 'Curso de prueba', 'facil', 'publico', 1, 'publicado');
+    INSERT INTO course_instance (coi_id, cou_id, coi_name, coi_ins_code, coi_created_by, coi_status)
+    VALUES (1, 1, 'Grupo A', 'ABC123', 1, 'activa');
+    INSERT INTO enrollment (enr_id, usr_id, coi_id, enr_status, enr_progress) VALUES (1, 2, 1, 'activo', 0);
+    INSERT INTO domain (dom_id, cou_id, dom_name) VALUES (1, 1, 'Aritmética'), (2, 1, 'Álgebra');
+    INSERT INTO subtopic (sub_id, dom_id, sub_name)
+    VALUES (1, 1, 'Suma'), (2, 1, 'Resta'), (3, 2, 'Ecuaciones'), (4, 2, 'Sistemas');
+    INSERT INTO subtopic_dependency (sub_id, prerequisite_id) VALUES (2, 1), (3, 2), (4, 3);
+    INSERT INTO exercise (ex_id, sub_id, ex_statement, ex_expected_answer, ex_is_active)
+    VALUES (1, 1, '1+1', '2', true), (2, 2, '5-3', '2', true), (3, 3, 'x+1=3', '2', true), (4, 4, 'x=y, x+y=4', '2', true);
+    INSERT INTO assessment (asm_id, cou_id, asm_title, created_by, asm_type, asm_status)
+    VALUES (1, 1, 'Diagnóstico', 1, 'diagnostico', 'publicado');
+    INSERT INTO assessment_exercise (asm_id, ex_id, ase_order_index) VALUES (1, 1, 1), (1, 2, 2), (1, 3, 3), (1, 4, 4);
+"""
+
+
+@pytest.fixture(scope='session')
+def app():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL no está definida")
+
+    from app import create_app, db
+    import app.models
+    from app.utils import schema_check
+
+    # Todos los modelos, para que create_all cree todas las tablas
+    for module in pkgutil.iter_modules(app.models.__path__):
+        importlib.import_module(f'app.models.{module.name}')
+
+    application = create_app()
+    application.config['TESTING'] = True
+    with application.app_context():
+        db.drop_all(bind_key=None)
+        db.create_all(bind_key=None)
+        connection = db.session.connection()
+        for name in sorted(schema_check.REQUIRED):
+            connection.exec_driver_sql(schema_check.migration_sql(name))
+        connection.exec_driver_sql(SEED)
+        db.session.commit()
+    yield application
+    with application.app_context():
+        db.session.remove()
+        # Solo el primario: otras apps de las pruebas pueden haber registrado binds de réplica
+        db.drop_all(bind_key=None)
+
+
+@pytest.fixture
+def client_for(app):
+    """Cliente de pruebas autenticado como `usr_id`."""
+    from flask_jwt_extended import create_access_token
+
+    def make(usr_id):
+        client = app.test_client()
+        with app.app_context():
+            token = create_access_token(identity=str(usr_id))
+        client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        return client
+    return make
@@ -0,0 +1,45 @@
+"""Los triggers de 004/005 suben cou_content_version una vez por sentencia."""
+import pytest
+from sqlalchemy import text
+
+
+@pytest.fixture
+def session(app):
+    from app import db
+
+    with app.app_context():
+        yield db.session
+        db.session.rollback()
+
+
+def _version(session, cou_id=1):
+    return session.execute(text("SELECT cou_content_version FROM course WHERE cou_id = :c"), {'c': cou_id}).scalar()
+
+
+def test_multi_row_insert_bumps_the_version_once(session):
+    before = _version(session)
+    session.execute(text(
+        "INSERT INTO subtopic (sub_id, dom_id, sub_name) VALUES (101, 1, 'a'), (102, 1, 'b'), (103, 2, 'c')"
+    ))
+    assert _version(session) == before + 1
+
+    session.execute(text("INSERT INTO subtopic_dependency (sub_id, prerequisite_id) VALUES (102, 101), (103, 102)"))
+    assert _version(session) == before + 2
+
+    session.execute(text("DELETE FROM subtopic_dependency WHERE sub_id IN (102, 103)"))
+    assert _version(session) == before + 3
+
+
+def test_statement_without_rows_keeps_the_version(session):
+    before = _version(session)
+    session.execute(text("UPDATE exercise SET ex_statement = ex_statement WHERE ex_id = -1"))
+    assert _version(session) == before
+
+
+def test_catalog_changes_bump_the_version(session):
+    before = _version(session)
+    session.execute(text("UPDATE exercise SET ex_is_active = ex_is_active WHERE ex_id IN (1, 2, 3)"))
+    assert _version(session) == before + 1
+
+    session.execute(text("DELETE FROM assessment_exercise WHERE asm_id = 1 AND ex_id = 4"))
+    assert _version(session) == before + 2
@@ -0,0 +1,161 @@
+"""
+Enrutado a réplicas con una réplica local: el bind replica_0 apunta a la
+misma base que el primario, pero es otro Engine, así que se puede comprobar
+a cuál fue cada sentencia.
+"""
+import time
+import pytest
+from sqlalchemy import event
+
+REPORT = '/api/diagnostic/progress-report/1'
+ATTEMPT = {'ex_id': 1, 'enr_id': 1, 'exa_answer': '2', 'exa_is_correct': True}
+
+
+@pytest.fixture(scope='module')
+def replica_app(app):
+    from config import Config
+    from app import create_app, db
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(Config, 'SQLALCHEMY_BINDS', {'replica_0': app.config['SQLALCHEMY_DATABASE_URI']})
+        application = create_app()
+    application.config['TESTING'] = True
+    yield application
+    with application.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client_on(replica_app):
+    from flask_jwt_extended import create_access_token
+    from app.utils import db_routing
+
+    # Cada cliente hace de worker nuevo: sin memoria de escrituras recientes
+    db_routing._recent_writers.clear()
+
+    def make(usr_id):
+        client = replica_app.test_client()
+        with replica_app.app_context():
+            token = create_access_token(identity=str(usr_id))
+        client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        return client
+    return make
+
+
+@pytest.fixture
+def statements(replica_app):
+    """Número de sentencias que recibe cada engine ('primary' o 'replica_0')."""
+    from app import db
+
+    counts = {'primary': 0, 'replica_0': 0}
+    listeners = []
+    with replica_app.app_context():
+        for key, engine in db.engines.items():
+            name = key or 'primary'
+
+            def listener(*args, name=name):
+                counts[name] += 1
+            event.listen(engine, 'before_cursor_execute', listener)
+            listeners.append((engine, listener))
+    yield counts
+    for engine, listener in listeners:
+        event.remove(engine, 'before_cursor_execute', listener)
+
+
+def test_reads_go_to_the_replica(client_on, statements):
+    response = client_on(2).get(REPORT)
+
+    assert response.status_code == 200, response.get_json()
+    assert response.headers['X-DB-Route'] == 'replica_0'
+    assert statements['replica_0'] > 0
+
+
+def test_writer_reads_from_primary_on_the_same_worker(client_on, statements):
+    client = client_on(2)
+    write = client.post('/api/exercise-attempts/', json=ATTEMPT)
+    assert write.status_code == 201, write.get_json()
+    assert float(write.headers['X-DB-Primary-Until']) > time.time()
+
+    statements['replica_0'] = 0
+    response = client.get(REPORT)
+    assert response.headers['X-DB-Route'] == 'primary'
+    assert statements['replica_0'] == 0
+
+
+def test_echoed_header_pins_other_workers(client_on):
+    from app.utils import db_routing
+
+    write = client_on(2).post('/api/exercise-attempts/', json=ATTEMPT)
+    until = write.headers['X-DB-Primary-Until']
+
+    # Otro worker (sin memoria) y un cliente sin cookies, como el frontend con CORS
+    db_routing._recent_writers.clear()
+    response = client_on(2).get(REPORT, headers={'X-DB-Primary-Until': until})
+    assert response.headers['X-DB-Route'] == 'primary'
+
+    response = client_on(2).get(REPORT)
+    assert response.headers['X-DB-Route'] == 'replica_0'
+
+
+@pytest.mark.parametrize('value', ['abc', 'nan', 'inf', '', str(time.time() + 3600), str(time.time() - 10)])
+def test_invalid_or_out_of_window_marks_are_ignored(client_on, value):
+    client = client_on(2)
+    client.set_cookie('db_primary_until', value)
+
+    response = client.get(REPORT, headers={'X-DB-Primary-Until': value})
+    assert response.status_code == 200
+    assert response.headers['X-DB-Route'] == 'replica_0'
+
+
+@pytest.fixture
+def enroll_function(replica_app):
+    """
+    Versión mínima de public.enroll_student_by_code (la real vive en la base
+    de producción) y un alumno sin matricular.
+    """
+    from sqlalchemy import text
+    from app import db
+
+    with replica_app.app_context():
+        db.session.execute(text("""
+            CREATE OR REPLACE FUNCTION public.enroll_student_by_code(p_usr_id integer, p_code text)
+            RETURNS integer AS $$
+                INSERT INTO enrollment (usr_id, coi_id, enr_status, enr_progress)
+                SELECT p_usr_id, coi_id, 'activo', 0 FROM course_instance WHERE coi_ins_code = p_code
+                RETURNING enr_id
+            $$ LANGUAGE sql
+        """))
+        db.session.execute(text("SELECT setval(pg_get_serial_sequence('enrollment', 'enr_id'), (SELECT max(enr_id) FROM enrollment))"))
+        db.session.execute(text("""
+            INSERT INTO users (usr_id, usr_first_name, usr_last_name, usr_email, usr_password, rol_id, usr_status)
+            VALUES (3, 'Eva', 'Nueva', 'eva@example.com', 'x', 2, 'activo')
+        """))
+        db.session.commit()
+    yield
+    with replica_app.app_context():
+        db.session.execute(text("DELETE FROM enrollment WHERE usr_id = 3"))
+        db.session.execute(text("DELETE FROM users WHERE usr_id = 3"))
+        db.session.commit()
+
+
+def test_is_read_rejects_writes_through_sql_functions(app):
+    from sqlalchemy import text
+    from app.utils.db_routing import is_read
+
+    assert is_read(text("SELECT usr_id FROM users"))
+    assert not is_read(text("SELECT public.enroll_student_by_code(:usr_id, :code)"))
+    assert not is_read(text("SELECT 1").execution_options(writes=True))
+
+
+def test_enrollment_through_sql_function_pins_the_primary(client_on, statements, enroll_function):
+    client = client_on(3)
+    write = client.post('/api/enrollments/', json={'coi_ins_code': 'ABC123'})
+    assert write.status_code == 201, write.get_json()
+    assert float(write.headers['X-DB-Primary-Until']) > time.time()
+
+    statements['replica_0'] = 0
+    response = client.get('/api/enrollments/api/course-instance/1/students')
+    assert response.headers['X-DB-Route'] == 'primary'
+    assert statements['replica_0'] == 0
@@ -0,0 +1,50 @@
+"""Un único par de listeners SQL y un único envoltorio de Schema.dump para todos los suscriptores."""
+import pytest
+from marshmallow import Schema, fields
+
+
+class Item(Schema):
+    name = fields.String()
+
+
+class Box(Schema):
+    items = fields.List(fields.Nested(Item))
+
+
+@pytest.fixture
+def instrumentation(app):
+    from app.utils import instrumentation
+
+    saved = [list(hooks) for hooks in (instrumentation._before, instrumentation._after,
+                                       instrumentation._errors, instrumentation._dumps)]
+    yield instrumentation
+    for hooks, previous in zip((instrumentation._before, instrumentation._after,
+                                instrumentation._errors, instrumentation._dumps), saved):
+        hooks[:] = previous
+
+
+def test_query_hooks_share_one_timer(app, instrumentation):
+    from sqlalchemy import text
+    from app import db
+
+    seen = []
+    instrumentation.on_query(lambda *args: seen.append(('a', args[2], args[-1])))
+    instrumentation.on_query(lambda *args: seen.append(('b', args[2], args[-1])))
+    with app.app_context():
+        db.session.execute(text("SELECT 1"))
+        db.session.rollback()
+
+    mine = [entry for entry in seen if entry[1] == 'SELECT 1']
+    assert [name for name, _, _ in mine] == ['a', 'b']
+    assert mine[0][2] == mine[1][2] >= 0
+
+
+def test_dump_hooks_wrap_only_the_outermost_dump(instrumentation):
+    from contextlib import nullcontext
+
+    calls = []
+    instrumentation.on_dump(lambda schema, many: calls.append(type(schema).__name__) or nullcontext())
+
+    result = Box().dump({'items': [{'name': 'a'}, {'name': 'b'}]})
+    assert result == {'items': [{'name': 'a'}, {'name': 'b'}]}
+    assert calls == ['Box']
@@ -0,0 +1,26 @@
+"""Un precalentamiento fallido no deja al worker fuera del balanceador."""
+import pytest
+
+
+@pytest.fixture
+def prewarm_state():
+    from app.utils import prewarm
+
+    saved = prewarm.get_state()
+    yield prewarm
+    prewarm._state.clear()
+    prewarm._state.update(saved)
+
+
+def test_failed_prewarm_is_skipped_and_ready(app, prewarm_state, monkeypatch):
+    def database_down(max_courses):
+        raise RuntimeError("la base no responde")
+    monkeypatch.setattr(prewarm_state, '_warm_caches', database_down)
+
+    state = prewarm_state.prewarm(app, freeze=False)
+    assert state['status'] == 'skipped'
+    assert 'no responde' in state['error']
+
+    response = app.test_client().get('/ready')
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['database'] == 'ok'
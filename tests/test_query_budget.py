@@ -0,0 +1,53 @@
+import pytest
+
+
+@pytest.fixture
+def inspector(app):
+    # Importar app exige DATABASE_URL: solo cuando el fixture `app` no omitió la prueba
+    from app.utils import query_inspector
+    return query_inspector
+
+
+def _pending_question(client):
+    response = client.post('/api/diagnostic/start', json={'asm_id': 1, 'course_instance_id': 1, 'max_questions': 3})
+    assert response.status_code in (200, 201), response.get_json()
+    session_id = response.get_json()['session_id']
+    response = client.get(f'/api/diagnostic/session/{session_id}/next-question')
+    assert response.status_code == 200, response.get_json()
+    return session_id, response.get_json()['exercise']
+
+
+def test_submit_answer_stays_within_budget(client_for, inspector):
+    client = client_for(2)
+    session_id, exercise = _pending_question(client)
+
+    # Mismo presupuesto que @query_budget(16) en submit_answer
+    with inspector.assert_max_queries(16):
+        response = client.post(
+            f'/api/diagnostic/session/{session_id}/submit-answer',
+            json={'exercise_id': exercise['ex_id'], 'user_answer': exercise['ex_expected_answer']}
+        )
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['is_correct'] is True
+
+
+def test_learning_path_stays_within_budget(client_for, inspector):
+    client = client_for(2)
+    # La primera lectura llena las cachés; la segunda es la habitual
+    client.get('/api/diagnostic/course/topics-status/1')
+
+    with inspector.assert_max_queries(6):
+        response = client.get('/api/diagnostic/course/topics-status/1')
+    assert response.status_code == 200, response.get_json()
+
+
+def test_assert_max_queries_fails_over_budget(client_for, inspector):
+    client = client_for(2)
+    session_id, exercise = _pending_question(client)
+
+    with pytest.raises(inspector.QueryBudgetExceeded, match=r'máximo 2'):
+        with inspector.assert_max_queries(2):
+            client.post(
+                f'/api/diagnostic/session/{session_id}/submit-answer',
+                json={'exercise_id': exercise['ex_id'], 'user_answer': 'no'}
+            )
@@ -0,0 +1,33 @@
+"""Altas del roster frente a cuentas que difieren solo en mayúsculas."""
+import pytest
+from sqlalchemy import text
+
+
+@pytest.fixture
+def session(app):
+    from app import db
+
+    with app.app_context():
+        app.config['BCRYPT_LOG_ROUNDS'] = 4
+        yield db.session
+        db.session.rollback()
+
+
+def test_account_with_other_case_is_not_created_twice(session):
+    from app.services import roster
+
+    session.execute(text("""
+        INSERT INTO users (usr_id, usr_first_name, usr_last_name, usr_email, usr_password, rol_id, usr_status)
+        VALUES (50, 'Eva', 'Mayúsculas', 'Eva.Mixta@Example.com', 'x', 2, 'activo')
+    """))
+
+    # Otro roster concurrente ya no la vería en su búsqueda: el ON CONFLICT decide
+    created = roster._create_accounts([{
+        'usr_first_name': 'Eva', 'usr_last_name': 'Mayúsculas',
+        'usr_email': 'eva.mixta@example.com', 'usr_password': 'secreta-123',
+    }])
+
+    assert created == {}
+    assert session.execute(text(
+        "SELECT count(*) FROM users WHERE lower(usr_email) = 'eva.mixta@example.com'"
+    )).scalar() == 1